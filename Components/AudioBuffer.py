@@ -0,0 +1,105 @@
+import os
+import subprocess
+import tempfile
+import numpy as np
+from Components.Cache import cache_key, get_cache
+from Components.Fingerprint import file_fingerprint
+from Components.Media import find_ffmpeg
+from Components.Tracing import span
+
+# Formato único do áudio compartilhado por transcrição, VAD e pontuação
+SAMPLE_RATE = 16000
+
+
+class AudioBuffer:
+    """Áudio PCM 16 bits mono decodificado uma única vez a partir do vídeo.
+
+    samples é um np.int16 (em memória ou memory-mapped de um arquivo .pcm).
+    Os métodos de recorte devolvem vistas, sem copiar os dados.
+    """
+
+    def __init__(self, samples, sample_rate=SAMPLE_RATE, path=None, key=None):
+        self.samples = samples
+        self.sample_rate = sample_rate
+        self.path = path
+        # Identifica o conteúdo (para chaves de cache de estágios seguintes)
+        self.key = key
+
+    def __reduce__(self):
+        # Buffers em disco viajam entre processos só pelo caminho
+        if self.path is not None:
+            return (open_pcm, (self.path, self.sample_rate, self.key))
+        return object.__reduce__(self)
+
+    def __len__(self):
+        return len(self.samples)
+
+    @property
+    def duration(self):
+        return len(self.samples) / self.sample_rate
+
+    def index(self, seconds):
+        return int(min(max(0.0, seconds), self.duration) * self.sample_rate)
+
+    def slice(self, start=None, end=None):
+        """Amostras int16 entre start e end (segundos), como vista."""
+        i0 = 0 if start is None else self.index(start)
+        i1 = len(self.samples) if end is None else self.index(end)
+        return self.samples[i0:i1]
+
+    def pcm_bytes(self, start=None, end=None):
+        """Os mesmos dados como memoryview de bytes PCM (para o webrtcvad)."""
+        return memoryview(np.ascontiguousarray(self.slice(start, end))).cast("B")
+
+    def as_float32(self, start=None, end=None):
+        """Amostras normalizadas em [-1, 1], o formato que o faster-whisper aceita."""
+        return self.slice(start, end).astype(np.float32) / 32768.0
+
+
+def open_pcm(path, sample_rate=SAMPLE_RATE, key=None):
+    """Abre um arquivo PCM s16le memory-mapped."""
+    if os.path.getsize(path) == 0:
+        samples = np.zeros(0, dtype=np.int16)
+    else:
+        samples = np.memmap(path, dtype=np.int16, mode="r")
+    return AudioBuffer(samples, sample_rate, path, key)
+
+
+def decode_audio(video_path, sample_rate=SAMPLE_RATE):
+    """Decodifica o áudio do vídeo para PCM 16 bits mono uma única vez.
+
+    Com o cache ativo o resultado fica em disco (chaveado pelo conteúdo do
+    vídeo) e é aberto memory-mapped; sem cache fica em memória. Retorna None
+    se o FFmpeg não estiver disponível ou a decodificação falhar.
+    """
+    ffmpeg_path = find_ffmpeg()
+    if not ffmpeg_path:
+        print("Aviso: FFmpeg não encontrado. Não é possível decodificar o áudio compartilhado.")
+        return None
+    if not os.path.exists(video_path):
+        print(f"Erro: O arquivo {video_path} não existe.")
+        return None
+
+    key = cache_key("pcm", file_fingerprint(video_path), sample_rate, 1)
+    cache = get_cache()
+    if cache:
+        cached = cache.get(key, ".pcm")
+        if cached:
+            return open_pcm(cached, sample_rate, key)
+
+    cmd = [ffmpeg_path, "-v", "error", "-i", video_path, "-vn",
+           "-ac", "1", "-ar", str(sample_rate), "-f", "s16le", "-acodec", "pcm_s16le"]
+    try:
+        with span("decode_audio", cat="decode"):
+            if cache:
+                fd, tmp_path = tempfile.mkstemp(suffix=".pcm")
+                os.close(fd)
+                subprocess.run(cmd + ["-y", tmp_path], check=True,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+                return open_pcm(cache.put_file(key, tmp_path, ".pcm", move=True), sample_rate, key)
+
+            result = subprocess.run(cmd + ["-"], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            return AudioBuffer(np.frombuffer(result.stdout, dtype=np.int16), sample_rate, key=key)
+    except Exception as e:
+        print(f"Erro ao decodificar o áudio de {video_path}: {e}")
+        return None
@@ -0,0 +1,158 @@
+import json
+import os
+import shutil
+import time
+import uuid
+from Components.Fingerprint import hash_params
+
+# Pasta dos artefatos em cache (vídeos baixados, áudio extraído, transcrições)
+CACHE_DIR = os.getenv("SHORTS_CACHE_DIR", os.path.join("cache", "artifacts"))
+
+# Limite de espaço em disco do cache; os artefatos menos usados saem primeiro
+CACHE_MAX_BYTES = int(float(os.getenv("SHORTS_CACHE_MAX_GB", "20")) * 1024 ** 3)
+
+# Artefatos usados há menos que isto (segundos) nunca são removidos: podem estar em uso
+MIN_EVICT_AGE = 3600
+
+# Desativa o cache (SHORTS_CACHE=0)
+CACHE_ENABLED = os.getenv("SHORTS_CACHE", "1") != "0"
+
+
+def cache_key(stage, *parts):
+    """Chave de um artefato: nome do estágio + entradas + parâmetros."""
+    return hash_params(stage, *parts)
+
+
+class ArtifactCache:
+    """Cache de arquivos endereçado por conteúdo, com remoção LRU por tamanho.
+
+    Cada artefato é um arquivo root/<2 primeiros caracteres>/<chave><sufixo>.
+    A gravação é feita em um arquivo temporário no mesmo diretório e
+    publicada com os.replace (atômico), então processos concorrentes nunca
+    veem um artefato pela metade. O acesso atualiza o mtime, usado como
+    ordem de uso na remoção.
+    """
+
+    def __init__(self, root=None, max_bytes=None, min_evict_age=None):
+        self.root = os.path.abspath(root or CACHE_DIR)
+        self.max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.min_evict_age = MIN_EVICT_AGE if min_evict_age is None else min_evict_age
+
+    def path_for(self, key, suffix=""):
+        return os.path.join(self.root, key[:2], key + suffix)
+
+    def contains(self, path):
+        """O caminho fica dentro deste cache?"""
+        return os.path.abspath(path).startswith(self.root + os.sep)
+
+    def get(self, key, suffix=""):
+        """Caminho do artefato se existir (e marca como usado agora), senão None."""
+        path = self.path_for(key, suffix)
+        if not os.path.exists(path):
+            return None
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return path
+
+    def put_file(self, key, source_path, suffix="", move=False):
+        """Publica um arquivo no cache e devolve o caminho dentro do cache."""
+        path = self.path_for(key, suffix)
+        tmp_path = self._tmp_path(path)
+        if move:
+            shutil.move(source_path, tmp_path)
+        else:
+            shutil.copyfile(source_path, tmp_path)
+        os.replace(tmp_path, path)
+        self.evict()
+        return path
+
+    def put_bytes(self, key, data, suffix=""):
+        """Publica bytes no cache e devolve o caminho dentro do cache."""
+        path = self.path_for(key, suffix)
+        tmp_path = self._tmp_path(path)
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self.evict()
+        return path
+
+    def get_json(self, key, ttl=None):
+        """Valor JSON guardado sob a chave, ou None se ausente ou mais velho que ttl segundos."""
+        path = self.get(key, ".json")
+        if path is None:
+            return None
+        try:
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if ttl is not None and time.time() - entry.get("created", 0) > ttl:
+            return None
+        return entry.get("value")
+
+    def put_json(self, key, value):
+        path = self.path_for(key, ".json")
+        tmp_path = self._tmp_path(path)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"created": time.time(), "value": value}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        self.evict()
+        return path
+
+    def evict(self):
+        """Remove os artefatos usados há mais tempo até caber em max_bytes."""
+        entries = []
+        total = 0
+        now = time.time()
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if ".tmp-" in name:
+                    # Temporários abandonados por processos que morreram
+                    if now - stat.st_mtime > self.min_evict_age:
+                        self._remove(path)
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        if total <= self.max_bytes:
+            return
+        for mtime, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if now - mtime < self.min_evict_age:
+                break
+            if self._remove(path):
+                total -= size
+
+    def _tmp_path(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return f"{path}.tmp-{uuid.uuid4().hex}"
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            # No Windows arquivos abertos por outro processo não podem ser removidos
+            return False
+
+
+_default_cache = None
+
+
+def get_cache():
+    """Cache padrão do projeto, ou None se desativado."""
+    global _default_cache
+    if not CACHE_ENABLED:
+        return None
+    if _default_cache is None:
+        _default_cache = ArtifactCache()
+    return _default_cache
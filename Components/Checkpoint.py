@@ -0,0 +1,88 @@
+import json
+import os
+import time
+from Components.Cache import get_cache
+from Components.Fingerprint import hash_params
+
+# Nome do manifesto gravado na pasta de saída de cada job
+JOB_MANIFEST_NAME = "job.json"
+
+# Versão do formato do manifesto; outra versão é ignorada (o job recomeça)
+JOB_MANIFEST_VERSION = 1
+
+
+def file_state(path):
+    """Tamanho e mtime do arquivo, para notar se ele foi apagado ou trocado depois de gravado.
+
+    Artefatos do cache não mudam depois de publicados e o nome deles é a chave
+    do conteúdo; como cada leitura atualiza o mtime (ordem LRU), para eles
+    valem o tamanho e o nome.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    cache = get_cache()
+    if cache and cache.contains(path):
+        return [stat.st_size, os.path.basename(path)]
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+class JobManifest:
+    """Registro dos estágios concluídos de um job, em <pasta de saída>/job.json.
+
+    Cada estágio guarda o hash das suas entradas, as saídas (valores JSON) e o
+    estado dos arquivos que produziu. Numa nova execução, done() devolve as
+    saídas apenas se as entradas forem as mesmas e os arquivos ainda estiverem
+    lá, sem alteração; caso contrário o estágio é refeito. O arquivo é
+    regravado (de forma atômica) a cada estágio concluído.
+    """
+
+    def __init__(self, path, source=None):
+        self.path = path
+        self.source = source
+        self.stages = {}
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == JOB_MANIFEST_VERSION and data.get("source") == source:
+                self.stages = data.get("stages", {})
+        except (OSError, ValueError):
+            pass
+
+    @classmethod
+    def for_output(cls, output_dir, source):
+        return cls(os.path.join(output_dir, JOB_MANIFEST_NAME), source)
+
+    def done(self, stage, inputs):
+        """Saídas do estágio já concluído com estas entradas, ou None se precisar ser refeito."""
+        entry = self.stages.get(stage)
+        if not entry or entry.get("status") != "done" or entry.get("inputs") != hash_params(inputs):
+            return None
+        for path, state in entry.get("files", {}).items():
+            if file_state(path) != state:
+                return None
+        return entry.get("outputs")
+
+    def complete(self, stage, inputs, outputs=None, files=()):
+        self.stages[stage] = {"status": "done", "inputs": hash_params(inputs), "outputs": outputs,
+                              "files": {path: file_state(path) for path in files},
+                              "finished": time.time()}
+        self.save()
+
+    def fail(self, stage, error=None):
+        self.stages[stage] = {"status": "failed", "error": error, "finished": time.time()}
+        self.save()
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp-{os.getpid()}"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": JOB_MANIFEST_VERSION, "source": self.source, "stages": self.stages},
+                          f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Aviso: Não foi possível gravar o manifesto do job {self.path}: {e}")
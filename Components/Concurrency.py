@@ -0,0 +1,91 @@
+import contextlib
+import os
+import time
+
+# Quantas tarefas podem estar em cada estágio ao mesmo tempo, somando todos os
+# processos que usam a mesma pasta de cache. SHORTS_STAGE_LIMITS sobrescreve,
+# ex.: "download=2,render=8"
+STAGE_LIMITS = {
+    "download": 2,
+    "transcribe": 2,
+    "highlights": 8,
+    "render": max(1, (os.cpu_count() or 1) // 2),
+}
+
+# Pasta dos arquivos de lock de cada vaga
+LOCK_DIR = os.path.join("cache", "locks")
+
+# Intervalo entre as tentativas de pegar uma vaga (segundos)
+POLL_INTERVAL = 0.2
+
+try:
+    import fcntl
+
+    def lock_file(f, blocking=True):
+        """Lock exclusivo do arquivo; sem blocking devolve False se outro processo o tem."""
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            return True
+        except BlockingIOError:
+            return False
+
+    def unlock_file(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+except ImportError:
+    import msvcrt
+
+    def lock_file(f, blocking=True):
+        """Lock exclusivo do arquivo; sem blocking devolve False se outro processo o tem."""
+        f.seek(0)
+        try:
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            if blocking:
+                raise
+            return False
+
+    def unlock_file(f):
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def stage_limits():
+    limits = dict(STAGE_LIMITS)
+    for item in os.getenv("SHORTS_STAGE_LIMITS", "").split(","):
+        if "=" in item:
+            name, value = item.split("=", 1)
+            limits[name.strip()] = max(1, int(value))
+    return limits
+
+
+@contextlib.contextmanager
+def stage_slot(stage):
+    """Espera uma vaga livre do estágio e a ocupa enquanto o bloco executa.
+
+    Cada vaga é um arquivo de lock; o sistema operacional libera o lock se o
+    processo morrer, então vagas nunca ficam presas.
+    """
+    limit = stage_limits().get(stage)
+    if not limit:
+        yield
+        return
+    os.makedirs(LOCK_DIR, exist_ok=True)
+    waited = False
+    while True:
+        for slot in range(limit):
+            f = open(os.path.join(LOCK_DIR, f"{stage}.{slot}.lock"), "a+")
+            if lock_file(f, blocking=False):
+                if waited:
+                    print(f"Vaga de '{stage}' liberada ({slot + 1}/{limit}).")
+                try:
+                    yield
+                finally:
+                    unlock_file(f)
+                    f.close()
+                return
+            f.close()
+        if not waited:
+            print(f"Aguardando vaga de '{stage}' ({limit} em uso)...")
+            waited = True
+        time.sleep(POLL_INTERVAL)
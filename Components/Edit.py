@@ -3,6 +3,25 @@ from moviepy.editor import VideoFileClip
 import subprocess
 import os
 import shutil
+import tempfile
+from Components.Media import find_ffmpeg, probe_duration, probe_keyframes, probe_video_stream
+from Components.Cache import cache_key, get_cache
+from Components.Fingerprint import file_fingerprint
+
+# Como crop_video corta o trecho:
+# - "fast": copia sem recodificar os GOPs inteiros do trecho e recodifica só
+#   as pontas parciais (requer FFmpeg/FFprobe e vídeo H.264)
+# - "reencode": recodifica o trecho inteiro com moviepy
+CUT_MODE = "fast"
+
+def _cache_audio(cache, key, audio_path):
+    if not cache:
+        return audio_path
+    try:
+        return cache.put_file(key, audio_path, ".wav", move=True)
+    except Exception as e:
+        print(f"Aviso: Não foi possível guardar o áudio no cache: {e}")
+        return audio_path
 
 def extractAudio(video_path):
     try:
@@ -10,6 +29,15 @@ def extractAudio(video_path):
             print(f"Erro: O arquivo de vídeo {video_path} não existe.")
             return None
             
+        # Áudio deste mesmo vídeo já extraído antes? Usa a cópia do cache
+        cache = get_cache()
+        key = cache_key("audio", file_fingerprint(video_path), "wav", 44100, 2)
+        if cache:
+            cached = cache.get(key, ".wav")
+            if cached:
+                print(f"Áudio encontrado no cache: {cached}")
+                return cached
+
         print(f"Extraindo áudio de: {video_path}")
         video_clip = VideoFileClip(video_path)
         audio_path = "audio.wav"
@@ -34,7 +62,7 @@ def extractAudio(video_path):
                     ]
                     subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
                     print("Áudio extraído com sucesso usando FFmpeg")
-                    return audio_path
+                    return _cache_audio(cache, key, audio_path)
                 except Exception as e:
                     print(f"Erro ao extrair áudio com FFmpeg: {e}")
                     return None
@@ -46,12 +74,108 @@ def extractAudio(video_path):
         video_clip.audio.write_audiofile(audio_path, verbose=False, logger=None)
         video_clip.close()
         print(f"Áudio extraído para: {audio_path}")
-        return audio_path
+        return _cache_audio(cache, key, audio_path)
     except Exception as e:
         print(f"Erro ao extrair áudio: {e}")
         return None
 
 
+def _run_ffmpeg(cmd):
+    subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+# Segundos decodificados em volta de cada junção para conferir o corte rápido
+JOIN_CHECK_SECONDS = 1.0
+
+def _encode_segment(ffmpeg_path, input_file, output_file, start, duration, video):
+    """Recodifica um trecho curto do vídeo (sem áudio) com os parâmetros do original, em MPEG-TS."""
+    cmd = [ffmpeg_path, "-y", "-ss", f"{start:.6f}", "-i", input_file, "-t", f"{duration:.6f}",
+           "-an", "-c:v", "libx264", "-preset", "veryfast", "-crf", "18"]
+    if video.get("pix_fmt"):
+        cmd += ["-pix_fmt", video["pix_fmt"]]
+    # O perfil precisa ser compatível com o do miolo copiado para o concat funcionar
+    profile = (video.get("profile") or "").lower().replace("constrained ", "")
+    if profile in ("baseline", "main", "high"):
+        cmd += ["-profile:v", profile]
+    _run_ffmpeg(cmd + ["-f", "mpegts", output_file])
+
+def _joins_decode_cleanly(ffmpeg_path, video_file, joins):
+    """Decodifica um trecho em volta de cada junção; False se o decodificador acusar erro."""
+    for join in joins:
+        start = max(0.0, join - JOIN_CHECK_SECONDS)
+        # -xerror encerra com erro no primeiro frame que não decodifica
+        result = subprocess.run([ffmpeg_path, "-v", "error", "-xerror", "-ss", f"{start:.6f}", "-i", video_file,
+                                 "-t", f"{2 * JOIN_CHECK_SECONDS:.6f}", "-map", "0:v:0", "-f", "null", "-"],
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if result.returncode != 0:
+            return False
+    return True
+
+def fast_cut(input_file, output_file, start_time, end_time):
+    """Corta [start_time, end_time) recodificando apenas os GOPs parciais das pontas.
+
+    O miolo alinhado a keyframes é copiado sem recodificar; a cabeça (até o
+    primeiro keyframe) e a cauda (após o último) são recodificadas, e o áudio
+    do trecho é recodificado à parte para evitar falhas nas junções. As partes
+    são gravadas em MPEG-TS (Annex-B, com SPS/PPS no próprio fluxo), porque as
+    pontas recodificadas têm parâmetros diferentes dos GOPs copiados; depois da
+    junção as emendas são decodificadas para conferência.
+    Retorna False se o corte rápido não for possível ou não passar na conferência.
+    """
+    ffmpeg_path = find_ffmpeg()
+    video = probe_video_stream(input_file)
+    if not ffmpeg_path or not video or video.get("codec_name") != "h264":
+        return False
+
+    keyframes = probe_keyframes(input_file, start_time, end_time)
+    if len(keyframes) < 2:
+        # Trecho curto demais para ter um GOP inteiro: recodificar tudo é barato
+        return False
+
+    first_key, last_key = keyframes[0], keyframes[-1]
+    with tempfile.TemporaryDirectory(prefix="cut_") as workdir:
+        parts = []
+        # Cabeça: do início pedido até o primeiro keyframe
+        if first_key - start_time > 0.001:
+            head = os.path.join(workdir, "head.ts")
+            _encode_segment(ffmpeg_path, input_file, head, start_time, first_key - start_time, video)
+            parts.append(head)
+
+        # Miolo: GOPs completos copiados sem recodificar
+        middle = os.path.join(workdir, "middle.ts")
+        _run_ffmpeg([ffmpeg_path, "-y", "-ss", f"{first_key:.6f}", "-i", input_file,
+                     "-t", f"{last_key - first_key:.6f}", "-an", "-c:v", "copy",
+                     "-bsf:v", "h264_mp4toannexb", "-avoid_negative_ts", "make_zero",
+                     "-f", "mpegts", middle])
+        parts.append(middle)
+
+        # Cauda: do último keyframe até o fim pedido
+        if end_time - last_key > 0.001:
+            tail = os.path.join(workdir, "tail.ts")
+            _encode_segment(ffmpeg_path, input_file, tail, last_key, end_time - last_key, video)
+            parts.append(tail)
+
+        concat_list = os.path.join(workdir, "parts.txt")
+        with open(concat_list, "w") as f:
+            for part in parts:
+                f.write(f"file '{part}'\n")
+
+        # Junta o vídeo e adiciona o áudio do mesmo trecho
+        _run_ffmpeg([ffmpeg_path, "-y", "-f", "concat", "-safe", "0", "-i", concat_list,
+                     "-ss", f"{start_time:.6f}", "-t", f"{end_time - start_time:.6f}", "-i", input_file,
+                     "-map", "0:v:0", "-map", "1:a:0?", "-c:v", "copy", "-c:a", "aac",
+                     "-shortest", "-movflags", "+faststart", output_file])
+
+    # Emendas: fim da cabeça e início da cauda, em tempos do clipe
+    joins = []
+    if first_key - start_time > 0.001:
+        joins.append(first_key - start_time)
+    if end_time - last_key > 0.001:
+        joins.append(last_key - start_time)
+    if not _joins_decode_cleanly(ffmpeg_path, output_file, joins):
+        print("Aviso: As junções do corte rápido não decodificaram sem erros.")
+        return False
+    return True
+
 def crop_video(input_file, output_file, start_time, end_time):
     try:
         if not os.path.exists(input_file):
@@ -63,6 +187,21 @@ def crop_video(input_file, output_file, start_time, end_time):
             return False
             
         print(f"Cortando vídeo de {start_time:.2f}s até {end_time:.2f}s...")
+
+        if CUT_MODE == "fast":
+            duration = probe_duration(input_file)
+            if duration is not None:
+                end_time = min(end_time, duration)
+            start_time = max(0, start_time)
+            try:
+                output_dir = os.path.dirname(output_file)
+                if output_dir and not os.path.exists(output_dir):
+                    os.makedirs(output_dir)
+                if fast_cut(input_file, output_file, start_time, end_time):
+                    print(f"Vídeo cortado (modo rápido) salvo em: {output_file}")
+                    return True
+            except Exception as e:
+                print(f"Aviso: Corte rápido falhou ({e}). Recodificando o trecho inteiro...")
         
         with VideoFileClip(input_file) as video:
             # Verificar se os tempos estão dentro da duração do vídeo
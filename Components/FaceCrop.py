@@ -3,19 +3,167 @@ import numpy as np
 import sys
 import os
 import shutil
+import time
 from moviepy.editor import *
-from Components.Speaker import detect_faces_and_speakers, Frames
+from Components.Speaker import detect_faces, draw_faces, primary_face, Frames
+from Components.FaceTracker import create_face_detector
+from Components.FramePipeline import run_frame_pipeline, print_pipeline_stats
+from Components.Render import FFmpegWriter
+from Components.FaceTrack import TrackReplayDetector
+from Components.SpeechTimeline import build_speech_timeline
+from Components.Tracing import ProgressLog, count as trace_count, span
 global Fps
 
-def crop_to_vertical(input_video_path, output_video_path):
+def update_crop_window(face, x_start, x_end, half_width, first_frame):
+    """Move a janela de corte para o centro do rosto ativo, quando necessário."""
+    (x, y, w, h) = face
+    centerX = x+(w//2)
+    if first_frame or (x_start - (centerX - half_width)) <1 :
+        ## IF dif from prev fram is low then no movement is done
+        return x_start, x_end #use prev vals
+    return centerX - half_width, centerX + half_width
+
+def crop_frame(frame, x_start, x_end, original_width, vertical_width, vertical_height, count):
+    """Recorta a faixa vertical do frame, garantindo dimensões consistentes."""
+    # Safely crop the frame
+    if x_start < x_end and x_end <= frame.shape[1]:
+        cropped_frame = frame[:, x_start:x_end]
+        
+        # Check if dimensions are consistent
+        if cropped_frame.shape[1] != vertical_width:
+            # Resize to ensure consistent dimensions
+            cropped_frame = cv2.resize(cropped_frame, (vertical_width, vertical_height))
+        return cropped_frame
+
+    print(f"Aviso: Coordenadas inválidas para corte no frame {count}: x_start={x_start}, x_end={x_end}")
+    # Use default center crop
+    default_x_start = (original_width - vertical_width) // 2
+    default_x_end = default_x_start + vertical_width
+    return frame[:, default_x_start:default_x_end]
+
+class VerticalCropper:
+    """Acompanha o rosto ativo e recorta cada frame no formato 9:16."""
+
+    def __init__(self, original_width, original_height):
+        self.original_width = original_width
+        self.vertical_height = int(original_height)
+        self.vertical_width = int(self.vertical_height * 9 / 16)
+
+        if original_width < self.vertical_width:
+            print(f"Aviso: Largura original do vídeo ({original_width}) é menor que a largura vertical desejada ({self.vertical_width}).")
+            self.vertical_width = original_width
+            print(f"Usando largura ajustada: {self.vertical_width}")
+
+        self.x_start = (original_width - self.vertical_width) // 2
+        self.x_end = self.x_start + self.vertical_width
+        self.half_width = self.vertical_width // 2
+        self.count = 0
+
+    @property
+    def size(self):
+        return (self.vertical_width, self.vertical_height)
+
+    def crop(self, frame, face):
+        """Recorta o frame; face=None mantém a janela anterior."""
+        if face is not None:
+            self.x_start, self.x_end = update_crop_window(face, self.x_start, self.x_end,
+                                                          self.half_width, self.count == 0)
+
+        # Ensure crop region is within video boundaries
+        self.x_start = max(0, self.x_start)
+        self.x_end = min(self.original_width, self.x_end)
+
+        self.count += 1
+        return crop_frame(frame, self.x_start, self.x_end, self.original_width,
+                          self.vertical_width, self.vertical_height, self.count)
+
+def run_vertical_crop(cap, out, cropper, speech, total_frames,
+                      detection_mode=None, threaded=None, debug_out=None, track=None):
+    """Lê até total_frames frames de cap, detecta o rosto ativo e grava o recorte em out.
+
+    Com track (um FaceTrack alinhado ao primeiro frame lido) os rostos vêm do
+    rastro já calculado e o detector não é executado. speech (SpeechTimeline
+    alinhada ao primeiro frame lido, ou None) só é usada nas anotações de debug_out.
+    """
+    Frames.clear()
+    if track is not None:
+        detector = TrackReplayDetector(track)
+    else:
+        detector = create_face_detector(detection_mode)
+    frames_read = 0
+    progress = ProgressLog()
+
+    def read_frame():
+        nonlocal frames_read
+        if frames_read >= total_frames:
+            return None
+        ret, frame = cap.read()
+        if not ret:
+            return None
+        frames_read += 1
+        return frame
+
+    def handle(ready):
+        items = []
+        for frame, faces in ready:
+            Frames.append(primary_face(faces))
+
+            # O quadro anotado é uma cópia: o recorte compartilha memória com o frame
+            debug_frame = None
+            if debug_out is not None:
+                if track is not None:
+                    is_speech = cropper.count < len(track) and bool(track.speech[cropper.count])
+                else:
+                    is_speech = speech is not None and speech.at(cropper.count)
+                debug_frame = draw_faces(frame.copy(), faces, is_speech)
+
+            # Sem rosto no frame, a janela anterior é mantida
+            items.append((cropper.crop(frame, Frames[-1] if faces else None), debug_frame))
+
+            # Progresso no máximo a cada PROGRESS_INTERVAL segundos
+            if progress.due():
+                print(f"Processados {cropper.count}/{total_frames} frames")
+        return items
+
+    def write(item):
+        cropped_frame, debug_frame = item
+        out.write(cropped_frame)
+        if debug_frame is not None:
+            debug_out.write(debug_frame)
+
+    # Use try-except para capturar qualquer erro durante o processamento de frames
+    try:
+        stats = run_frame_pipeline(read_frame,
+                                   lambda frame: handle(detector.push(frame)),
+                                   lambda: handle(detector.flush()),
+                                   write,
+                                   threaded=threaded)
+        print_pipeline_stats(stats)
+        trace_count("frames_rendered", cropper.count)
+        if cropper.count < total_frames:
+            print(f"Aviso: Apenas {cropper.count}/{total_frames} frames puderam ser lidos.")
+
+    except Exception as e:
+        print(f"Erro durante o processamento de frames: {e}")
+
+    return cropper.count
+
+def crop_to_vertical(input_video_path, output_video_path, debug_video_path=None, detection_mode=None,
+                     threaded=None):
+    """Detecta o rosto ativo e grava o corte vertical em uma única decodificação.
+
+    Cada frame é decodificado uma vez e passa por um único detector (DNN); o
+    rastro de rostos fica em Frames. detection_mode escolhe entre detecção em
+    todos os frames ou só em frames-chave (ver FaceTracker.DETECTION_MODE).
+    O vídeo anotado de depuração só é gravado quando debug_video_path é informado.
+    Com threaded (padrão: FramePipeline.PIPELINE_THREADED) decodificação,
+    detecção/corte e codificação rodam em paralelo.
+    """
     try:
         # Verificar se o arquivo de entrada existe
         if not os.path.exists(input_video_path):
             print(f"Erro: O arquivo {input_video_path} não existe.")
             return False
-            
-        detect_faces_and_speakers(input_video_path, "DecOut.mp4")
-        face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
 
         cap = cv2.VideoCapture(input_video_path, cv2.CAP_FFMPEG)
         if not cap.isOpened():
@@ -28,114 +176,32 @@ def crop_to_vertical(input_video_path, output_video_path):
         fps = cap.get(cv2.CAP_PROP_FPS)
         total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
 
-        vertical_height = int(original_height)
-        vertical_width = int(vertical_height * 9 / 16)
-        print(vertical_height, vertical_width)
+        # A fala só é usada nas anotações do vídeo de depuração
+        speech = None
+        if debug_video_path:
+            speech = build_speech_timeline(input_video_path, fps, total_frames)
 
-        if original_width < vertical_width:
-            print(f"Aviso: Largura original do vídeo ({original_width}) é menor que a largura vertical desejada ({vertical_width}).")
-            vertical_width = original_width
-            print(f"Usando largura ajustada: {vertical_width}")
-
-        x_start = (original_width - vertical_width) // 2
-        x_end = x_start + vertical_width
-        print(f"start and end - {x_start} , {x_end}")
-        print(x_end-x_start)
-        half_width = vertical_width // 2
+        cropper = VerticalCropper(original_width, original_height)
+        print(f"start and end - {cropper.x_start} , {cropper.x_end}")
 
         fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out = cv2.VideoWriter(output_video_path, fourcc, fps, (vertical_width, vertical_height))
+        out = cv2.VideoWriter(output_video_path, fourcc, fps, cropper.size)
+        debug_out = None
+        if debug_video_path:
+            debug_out = cv2.VideoWriter(debug_video_path, fourcc, fps, (original_width, original_height))
         global Fps
         Fps = fps
         print(fps)
-        count = 0
-        
-        # Use try-except para capturar qualquer erro durante o processamento de frames
-        try:
-            for _ in range(total_frames):
-                ret, frame = cap.read()
-                if not ret:
-                    print(f"Aviso: Não foi possível ler o frame {count+1}/{total_frames}.")
-                    break
-                    
-                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30))
-                
-                if len(faces) >-1:
-                    if len(faces) == 0:
-                        try:
-                            (x, y, w, h) = Frames[count]
-                        except (IndexError, ValueError) as e:
-                            print(f"Aviso: Erro ao acessar frame {count}: {e}")
-                            (x, y, w, h) = (0, 0, 0, 0)  # Default values
-
-                    try:
-                        #check if face 1 is active
-                        (X, Y, W, H) = Frames[count]
-                    except Exception as e:
-                        try:
-                            (X, Y, W, H) = Frames[count][0]
-                            print(Frames[count][0])
-                        except (IndexError, ValueError) as e:
-                            print(f"Aviso: Erro com detecção de face no frame {count}: {e}")
-                            (X, Y, W, H) = (0, 0, 0, 0)  # Default values
-                    
-                    for f in faces:
-                        x1, y1, w1, h1 = f
-                        center = x1+ w1//2
-                        if center > X and center < X+W:
-                            x = x1
-                            y = y1
-                            w = w1
-                            h = h1
-                            break
-
-                    # print(faces[0])
-                    try:
-                        centerX = x+(w//2)
-                        print(centerX)
-                        print(x_start - (centerX - half_width))
-                        if count == 0 or (x_start - (centerX - half_width)) <1 :
-                            ## IF dif from prev fram is low then no movement is done
-                            pass #use prev vals
-                        else:
-                            x_start = centerX - half_width
-                            x_end = centerX + half_width
-                    except UnboundLocalError:
-                        print(f"Aviso: Erro ao calcular centerX no frame {count} - usando valor padrão")
-                        # Use default values if no face was detected properly
-
-                # Ensure crop region is within video boundaries
-                x_start = max(0, x_start)
-                x_end = min(original_width, x_end)
-
-                count += 1
-                
-                # Safely crop the frame
-                if x_start < x_end and x_end <= frame.shape[1]:
-                    cropped_frame = frame[:, x_start:x_end]
-                    
-                    # Check if dimensions are consistent
-                    if cropped_frame.shape[1] != vertical_width:
-                        print(f"Aviso: Dimensões inconsistentes no frame {count}")
-                        # Resize to ensure consistent dimensions
-                        cropped_frame = cv2.resize(cropped_frame, (vertical_width, vertical_height))
-                    
-                    print(cropped_frame.shape)
-                    out.write(cropped_frame)
-                else:
-                    print(f"Aviso: Coordenadas inválidas para corte no frame {count}: x_start={x_start}, x_end={x_end}")
-                    # Use default center crop
-                    default_x_start = (original_width - vertical_width) // 2
-                    default_x_end = default_x_start + vertical_width
-                    cropped_frame = frame[:, default_x_start:default_x_end]
-                    out.write(cropped_frame)
-                
-        except Exception as e:
-            print(f"Erro durante o processamento de frames: {e}")
+
+        with span("crop_to_vertical", cat="crop") as info:
+            count = run_vertical_crop(cap, out, cropper, speech, total_frames,
+                                      detection_mode, threaded, debug_out)
+            info["frames"] = count
             
         cap.release()
         out.release()
+        if debug_out is not None:
+            debug_out.release()
         print("Cropping complete. The video has been saved to", output_video_path, count)
         return True
         
@@ -143,6 +209,61 @@ def crop_to_vertical(input_video_path, output_video_path):
         print(f"Erro fatal em crop_to_vertical: {e}")
         return False
 
+def render_short(source_video_path, output_video_path, start, end, detection_mode=None,
+                 threaded=None, preset=None, crf=None, track=None):
+    """Gera o short final direto do vídeo original, com uma única codificação.
+
+    Os frames de [start, end) são lidos do vídeo fonte, recortados e enviados a
+    um processo FFmpeg que também copia o áudio do mesmo trecho. Substitui a
+    sequência crop_video -> crop_to_vertical -> combine_videos. Com track
+    (FaceTrack.slice(start, end) da análise do vídeo inteiro) os rostos não
+    são detectados de novo.
+    """
+    try:
+        if not os.path.exists(source_video_path):
+            print(f"Erro: O arquivo {source_video_path} não existe.")
+            return False
+
+        duration = end - start
+
+        cap = cv2.VideoCapture(source_video_path, cv2.CAP_FFMPEG)
+        if not cap.isOpened():
+            print(f"Erro: Não foi possível abrir o vídeo {source_video_path}.")
+            return False
+
+        original_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        original_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        total_frames = int(round(duration * fps))
+        cap.set(cv2.CAP_PROP_POS_MSEC, start * 1000)
+
+        cropper = VerticalCropper(original_width, original_height)
+        out = FFmpegWriter(output_video_path, cropper.size, fps, audio_source=source_video_path,
+                           audio_start=start, duration=duration, preset=preset, crf=crf)
+        if not out.isOpened():
+            cap.release()
+            return False
+        global Fps
+        Fps = fps
+
+        with span("render_short", cat="render", start=start, end=end) as info:
+            started = time.time()
+            count = run_vertical_crop(cap, out, cropper, None, total_frames,
+                                      detection_mode, threaded, track=track)
+
+            cap.release()
+            with span("encode_finish", cat="encode"):
+                released = out.release()
+            info.update(frames=count, fps=round(count / max(time.time() - started, 1e-6), 1))
+        if not released:
+            return False
+        print(f"Short gravado em {output_video_path} ({count} frames)")
+        return count > 0
+
+    except Exception as e:
+        print(f"Erro fatal em render_short: {e}")
+        return False
+
 
 
 def combine_videos(video_with_audio, video_without_audio, output_filename):
@@ -222,8 +343,7 @@ if __name__ == "__main__":
     input_video_path = r'Out.mp4'
     output_video_path = 'Croped_output_video.mp4'
     final_video_path = 'final_video_with_audio.mp4'
-    detect_faces_and_speakers(input_video_path, "DecOut.mp4")
-    crop_to_vertical(input_video_path, output_video_path)
+    crop_to_vertical(input_video_path, output_video_path, debug_video_path="DecOut.mp4")
     combine_videos(input_video_path, output_video_path, final_video_path)
 
 
@@ -0,0 +1,319 @@
+import json
+import os
+import time
+import cv2
+import numpy as np
+from Components import FaceTracker, Speaker
+from Components.Speaker import DEFAULT_FACE
+from Components.FaceTracker import create_face_detector
+from Components.FramePipeline import run_frame_pipeline, print_pipeline_stats
+from Components.Cache import get_cache
+from Components.Fingerprint import file_fingerprint, hash_params
+from Components.SpeechTimeline import build_speech_timeline, vad_settings
+from Components.Tracing import ProgressLog, count as trace_count, span
+
+# Quantos rostos são guardados por frame no rastro
+MAX_FACES = 4
+
+# Índice em disco dos rastros: um par .npy/.json por vídeo e configuração, guardado
+# no cache de artefatos (com o limite de espaço dele); sem cache, nesta pasta
+TRACK_INDEX_DIR = os.path.join("cache", "tracks")
+
+# Muda quando o formato do índice muda, invalidando os arquivos antigos
+TRACK_INDEX_VERSION = 3
+
+# Rastros já calculados nesta execução, por vídeo e configuração do detector
+_TRACKS = {}
+
+
+def track_dtype():
+    return np.dtype([
+        ("frame", np.int32),
+        ("timestamp", np.float64),
+        ("boxes", np.int32, (MAX_FACES, 4)),
+        ("confidence", np.float32, (MAX_FACES,)),
+        ("n_faces", np.uint8),
+        ("speech", np.bool_),
+    ])
+
+
+class FaceTrack:
+    """Rostos e fala de cada frame de um vídeo, indexados pelo tempo do frame.
+
+    boxes tem forma (frames, MAX_FACES, 4) com (x, y, w, h); confidences e
+    n_faces dizem quantas caixas de cada frame são válidas.
+    """
+
+    def __init__(self, fps, width, height, timestamps, boxes, confidences, n_faces, speech,
+                 index_path=None, offset=0):
+        self.fps = fps
+        self.width = width
+        self.height = height
+        self.timestamps = timestamps
+        self.boxes = boxes
+        self.confidences = confidences
+        self.n_faces = n_faces
+        self.speech = speech
+        # Quando o rastro vem do índice em disco, guarda de onde veio
+        self.index_path = index_path
+        self.offset = offset
+
+    def __reduce__(self):
+        # Rastros do índice em disco viajam entre processos só como referência
+        if self.index_path is not None:
+            return (load_track_index, (self.index_path, self.offset, self.offset + len(self)))
+        return object.__reduce__(self)
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def frame_range(self, start, end):
+        """Índices [i0, i1) dos frames com tempo em [start, end)."""
+        i0 = int(np.searchsorted(self.timestamps, start, side="left"))
+        i1 = int(np.searchsorted(self.timestamps, end, side="left"))
+        return i0, i1
+
+    def slice(self, start, end):
+        """Trecho do rastro entre start e end (em segundos), sem copiar os dados."""
+        i0, i1 = self.frame_range(start, end)
+        return FaceTrack(self.fps, self.width, self.height, self.timestamps[i0:i1],
+                         self.boxes[i0:i1], self.confidences[i0:i1], self.n_faces[i0:i1],
+                         self.speech[i0:i1], self.index_path, self.offset + i0)
+
+    def faces_at(self, index):
+        """Rostos do frame no formato do detector: [(x, y, w, h, confiança), ...]."""
+        n = int(self.n_faces[index])
+        return [tuple(int(v) for v in self.boxes[index, i]) + (float(self.confidences[index, i]),)
+                for i in range(n)]
+
+    def primary_face(self, index):
+        if self.n_faces[index] == 0:
+            return DEFAULT_FACE
+        return tuple(int(v) for v in self.boxes[index, 0])
+
+    def to_frames(self):
+        """Lista no formato de Speaker.Frames (um rosto por frame)."""
+        return [self.primary_face(i) for i in range(len(self))]
+
+
+def track_index_key(video_path, detection_mode=None):
+    """Chave do índice: conteúdo do vídeo + configuração que altera o resultado."""
+    mode = detection_mode or FaceTracker.DETECTION_MODE
+    settings = {
+        "version": TRACK_INDEX_VERSION,
+        "model": os.path.basename(Speaker.model_path),
+        "confidence": Speaker.CONFIDENCE_THRESHOLD,
+        "max_faces": MAX_FACES,
+        "mode": mode,
+        # A fala de cada frame também fica no índice
+        "vad": vad_settings(),
+    }
+    if mode != "dense":
+        settings.update(interval=FaceTracker.DETECTION_INTERVAL,
+                        min_track_score=FaceTracker.MIN_TRACK_SCORE)
+    return hash_params(file_fingerprint(video_path), settings)
+
+
+def save_track_index(track, key, index_dir=None):
+    """Grava o rastro como .npy (registros por frame) + .json (metadados).
+
+    Os arquivos são escritos com nome temporário e renomeados; o .json é o
+    último, então um índice só é considerado válido quando está completo.
+    """
+    base = index_base(key, index_dir)
+    os.makedirs(os.path.dirname(base), exist_ok=True)
+    n = len(track)
+    records = np.zeros(n, dtype=track_dtype())
+    records["frame"] = np.arange(n, dtype=np.int32)
+    records["timestamp"] = track.timestamps
+    records["boxes"] = track.boxes
+    records["confidence"] = track.confidences
+    records["n_faces"] = track.n_faces
+    records["speech"] = track.speech
+
+    tmp_suffix = f".tmp-{os.getpid()}"
+    with open(base + ".npy" + tmp_suffix, "wb") as f:
+        np.save(f, records)
+    os.replace(base + ".npy" + tmp_suffix, base + ".npy")
+
+    meta = {"fps": track.fps, "width": track.width, "height": track.height,
+            "frames": n, "version": TRACK_INDEX_VERSION}
+    with open(base + ".json" + tmp_suffix, "w") as f:
+        json.dump(meta, f)
+    os.replace(base + ".json" + tmp_suffix, base + ".json")
+    cache = get_cache() if index_dir is None else None
+    if cache:
+        cache.evict()
+    return base + ".npy"
+
+
+def load_track_index(index_path, start_frame=0, end_frame=None):
+    """Abre o índice em modo memory-mapped, sem ler os dados para a memória."""
+    with open(os.path.splitext(index_path)[0] + ".json") as f:
+        meta = json.load(f)
+    records = np.load(index_path, mmap_mode="r")[start_frame:end_frame]
+    return FaceTrack(meta["fps"], meta["width"], meta["height"], records["timestamp"],
+                     records["boxes"], records["confidence"], records["n_faces"],
+                     records["speech"], index_path, start_frame)
+
+
+def index_base(key, index_dir=None):
+    """Caminho (sem extensão) do índice: no cache de artefatos ou em index_dir/TRACK_INDEX_DIR."""
+    cache = get_cache() if index_dir is None else None
+    if cache:
+        return os.path.splitext(cache.path_for(key, ".npy"))[0]
+    return os.path.abspath(os.path.join(index_dir or TRACK_INDEX_DIR, key))
+
+
+def find_track_index(key, index_dir=None):
+    base = index_base(key, index_dir)
+    if not (os.path.exists(base + ".json") and os.path.exists(base + ".npy")):
+        return None
+    cache = get_cache() if index_dir is None else None
+    if cache:
+        # Marca o par como usado agora (ordem da remoção LRU)
+        cache.get(key, ".json")
+        cache.get(key, ".npy")
+    return base + ".npy"
+
+
+def cached_track(video_path, detection_mode=None):
+    """Rastro do vídeo se já houver um índice em disco, sem analisar nada; senão None."""
+    try:
+        index_path = find_track_index(track_index_key(video_path, detection_mode))
+        return load_track_index(index_path) if index_path else None
+    except Exception:
+        return None
+
+
+class FaceTrackBuilder:
+    """Acumula os resultados do detector frame a frame e monta um FaceTrack."""
+
+    def __init__(self, fps, width, height):
+        self.fps = fps
+        self.width = width
+        self.height = height
+        self.rows = []
+
+    def append(self, faces, is_speech):
+        self.rows.append((faces[:MAX_FACES], bool(is_speech)))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def build(self):
+        n = len(self.rows)
+        boxes = np.zeros((n, MAX_FACES, 4), dtype=np.int32)
+        confidences = np.zeros((n, MAX_FACES), dtype=np.float32)
+        n_faces = np.zeros(n, dtype=np.uint8)
+        speech = np.zeros(n, dtype=bool)
+        for i, (faces, is_speech) in enumerate(self.rows):
+            n_faces[i] = len(faces)
+            speech[i] = is_speech
+            for j, (x, y, w, h, confidence) in enumerate(faces):
+                boxes[i, j] = (x, y, w, h)
+                confidences[i, j] = confidence
+        timestamps = np.arange(n, dtype=np.float64) / (self.fps or 30.0)
+        return FaceTrack(self.fps, self.width, self.height, timestamps, boxes, confidences,
+                         n_faces, speech)
+
+
+class TrackReplayDetector:
+    """Devolve os rostos de um FaceTrack já calculado, com a interface push/flush dos detectores."""
+
+    def __init__(self, track):
+        self.track = track
+        self.frame_count = 0
+
+    def push(self, frame):
+        index = self.frame_count
+        self.frame_count += 1
+        if index >= len(self.track):
+            return [(frame, [])]
+        return [(frame, self.track.faces_at(index))]
+
+    def flush(self):
+        return []
+
+
+def analyze_video(video_path, detection_mode=None, threaded=None, audio=None):
+    """Detecta rostos e fala em todos os frames do vídeo e devolve um FaceTrack.
+
+    O resultado fica no índice em disco (no cache de artefatos), chaveado pelo
+    conteúdo do vídeo e pela configuração do detector; execuções seguintes e
+    processos paralelos o abrem memory-mapped em vez de detectar de novo.
+    audio é o AudioBuffer já decodificado do vídeo, se houver.
+    """
+    try:
+        stat = os.stat(video_path)
+    except OSError:
+        print(f"Erro: O arquivo {video_path} não existe.")
+        return None
+
+    key = (os.path.abspath(video_path), stat.st_size, stat.st_mtime, detection_mode)
+    if key in _TRACKS:
+        return _TRACKS[key]
+
+    try:
+        index_key = track_index_key(video_path, detection_mode)
+        index_path = find_track_index(index_key)
+        if index_path:
+            try:
+                track = load_track_index(index_path)
+                print(f"Rastro de rostos carregado do índice: {index_path}")
+                _TRACKS[key] = track
+                return track
+            except Exception as e:
+                print(f"Aviso: Índice {index_path} inválido ({e}). Analisando de novo.")
+
+        cap = cv2.VideoCapture(video_path, cv2.CAP_FFMPEG)
+        if not cap.isOpened():
+            print(f"Erro: Não foi possível abrir o vídeo {video_path}.")
+            return None
+
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        speech = build_speech_timeline(video_path, fps, audio=audio)
+        builder = FaceTrackBuilder(fps, width, height)
+        detector = create_face_detector(detection_mode)
+
+        def read_frame():
+            ret, frame = cap.read()
+            return frame if ret else None
+
+        progress = ProgressLog()
+
+        def handle(ready):
+            for frame, faces in ready:
+                builder.append(faces, speech.at(len(builder)))
+                if progress.due():
+                    print(f"Analisados {len(builder)}/{total_frames} frames")
+            return []
+
+        print(f"Analisando rostos e fala em {video_path}...")
+        with span("detect", cat="detect", detection_mode=detection_mode) as info:
+            started = time.time()
+            stats = run_frame_pipeline(read_frame,
+                                       lambda frame: handle(detector.push(frame)),
+                                       lambda: handle(detector.flush()),
+                                       None,
+                                       threaded=threaded)
+            info.update(frames=len(builder), fps=round(len(builder) / max(time.time() - started, 1e-6), 1))
+        print_pipeline_stats(stats)
+        trace_count("frames_analyzed", len(builder))
+        cap.release()
+
+        track = builder.build()
+        print(f"Análise concluída: {len(track)} frames.")
+        try:
+            track = load_track_index(save_track_index(track, index_key))
+        except Exception as e:
+            print(f"Aviso: Não foi possível gravar o índice do rastro: {e}")
+        _TRACKS[key] = track
+        return track
+
+    except Exception as e:
+        print(f"Erro em analyze_video: {e}")
+        return None
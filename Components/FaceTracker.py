@@ -0,0 +1,233 @@
+import cv2
+import numpy as np
+from Components.Speaker import detect_faces, detect_faces_batch
+
+# Modo de detecção de rostos usado pelo corte vertical:
+# - "dense": roda o DNN em todos os frames (mais lento, mais preciso)
+# - "track": roda o DNN a cada DETECTION_INTERVAL frames e rastreia entre eles
+# - "interpolate": roda o DNN a cada DETECTION_INTERVAL frames e interpola as caixas
+DETECTION_MODE = "dense"
+
+# Número de frames entre duas detecções completas nos modos esparsos
+DETECTION_INTERVAL = 10
+
+# Abaixo desta similaridade o rastreador desiste e o DNN roda de novo
+MIN_TRACK_SCORE = 0.6
+
+# Quantos frames são enviados juntos ao DNN no modo "dense" (1 desativa o lote)
+DETECTION_BATCH_SIZE = 8
+
+# Tamanho (em pixels) do rosto reduzido usado como modelo no rastreamento
+TRACK_TEMPLATE_SIZE = 32
+
+
+def safe_detect(frame, frame_count):
+    """Roda o detector DNN sem interromper o processamento em caso de erro."""
+    try:
+        return detect_faces(frame)
+    except Exception as e:
+        print(f"Erro ao processar detecções no frame {frame_count}: {e}")
+        return []
+
+
+class DenseFaceDetector:
+    """Roda o detector em todos os frames."""
+
+    def __init__(self):
+        self.frame_count = 0
+
+    def push(self, frame):
+        faces = safe_detect(frame, self.frame_count)
+        self.frame_count += 1
+        return [(frame, faces)]
+
+    def flush(self):
+        return []
+
+
+class BatchedFaceDetector:
+    """Roda o detector em todos os frames, agrupando-os em lotes para o DNN.
+
+    Os frames ficam retidos até completar o lote; o resultado por frame é o
+    mesmo de DenseFaceDetector.
+    """
+
+    def __init__(self, batch_size=DETECTION_BATCH_SIZE):
+        self.batch_size = max(1, int(batch_size))
+        self.frame_count = 0
+        self.pending = []
+
+    def push(self, frame):
+        self.pending.append(frame)
+        if len(self.pending) < self.batch_size:
+            return []
+        return self.flush()
+
+    def flush(self):
+        frames, self.pending = self.pending, []
+        if not frames:
+            return []
+        try:
+            results = detect_faces_batch(frames)
+        except Exception as e:
+            print(f"Erro na detecção em lote a partir do frame {self.frame_count}: {e}")
+            results = [safe_detect(frame, self.frame_count + i) for i, frame in enumerate(frames)]
+        self.frame_count += len(frames)
+        return list(zip(frames, results))
+
+
+class SparseFaceDetector:
+    """Roda o detector só em frames-chave e preenche os frames intermediários.
+
+    push() recebe os frames em ordem e devolve a lista de (frame, rostos) já
+    resolvidos, também em ordem. No modo "track" cada frame sai imediatamente;
+    no modo "interpolate" os frames ficam retidos até o próximo frame-chave.
+    flush() devolve o que ainda estiver retido no fim do vídeo.
+    """
+
+    def __init__(self, mode="track", interval=DETECTION_INTERVAL, min_track_score=MIN_TRACK_SCORE):
+        if mode not in ("track", "interpolate"):
+            raise ValueError(f"Modo de detecção inválido: {mode}")
+        self.mode = mode
+        self.interval = max(1, int(interval))
+        self.min_track_score = min_track_score
+        self.frame_count = 0
+        self.since_detection = 0
+        self.faces = []
+        self.templates = []
+        self.pending = []
+        self.detections = 0
+
+    def push(self, frame):
+        if self.mode == "track":
+            return [(frame, self._track(frame))]
+        return self._interpolate(frame)
+
+    def flush(self):
+        ready = [(frame, list(self.faces)) for frame in self.pending]
+        self.pending = []
+        return ready
+
+    def _detect(self, frame):
+        self.faces = safe_detect(frame, self.frame_count)
+        self.since_detection = 0
+        self.detections += 1
+        return self.faces
+
+    def _track(self, frame):
+        try:
+            if self.frame_count == 0 or self.since_detection >= self.interval:
+                faces = self._detect(frame)
+                self.templates = [(make_template(frame, face), face[4]) for face in faces]
+            else:
+                faces = self._follow(frame)
+                if faces is None:
+                    faces = self._detect(frame)
+                    self.templates = [(make_template(frame, face), face[4]) for face in faces]
+                else:
+                    self.faces = faces
+        finally:
+            self.since_detection += 1
+            self.frame_count += 1
+        return faces
+
+    def _follow(self, frame):
+        """Localiza cada rosto perto da posição anterior; None se perder algum."""
+        faces = []
+        for face, (template, confidence) in zip(self.faces, self.templates):
+            if template is None:
+                return None
+            moved = match_template(frame, face, template)
+            if moved is None or moved[1] < self.min_track_score:
+                return None
+            (x, y, w, h, _) = face
+            (dx, dy), score = moved
+            # A confiança cai junto com a similaridade ao frame-chave
+            faces.append((x + dx, y + dy, w, h, confidence * score))
+        return faces
+
+    def _interpolate(self, frame):
+        self.frame_count += 1
+        if self.frame_count == 1:
+            self._detect(frame)
+            return [(frame, self.faces)]
+
+        if len(self.pending) + 1 < self.interval:
+            self.pending.append(frame)
+            return []
+
+        previous = self.faces
+        current = self._detect(frame)
+        total = len(self.pending) + 1
+        ready = []
+        for i, pending_frame in enumerate(self.pending, start=1):
+            ready.append((pending_frame, interpolate_faces(previous, current, i / total)))
+        ready.append((frame, current))
+        self.pending = []
+        return ready
+
+
+def make_template(frame, face):
+    """Recorta o rosto em tons de cinza e reduzido para o rastreamento."""
+    (x, y, w, h, _) = face
+    scale = track_scale(w, h)
+    x0, y0 = max(0, x), max(0, y)
+    patch = frame[y0:y + h, x0:x + w]
+    if patch.size == 0:
+        return None
+    gray = cv2.cvtColor(patch, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+
+def match_template(frame, face, template):
+    """Procura o modelo do rosto numa vizinhança da caixa anterior.
+
+    Retorna ((dx, dy), similaridade) em pixels do frame original.
+    """
+    (x, y, w, h, _) = face
+    scale = track_scale(w, h)
+    frame_h, frame_w = frame.shape[:2]
+    # Janela de busca: a caixa anterior expandida em metade do seu tamanho
+    sx0, sy0 = max(0, x - w // 2), max(0, y - h // 2)
+    sx1, sy1 = min(frame_w, x + w + w // 2), min(frame_h, y + h + h // 2)
+    region = frame[sy0:sy1, sx0:sx1]
+    if region.size == 0:
+        return None
+    gray = cv2.cvtColor(region, cv2.COLOR_BGR2GRAY)
+    gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    if gray.shape[0] < template.shape[0] or gray.shape[1] < template.shape[1]:
+        return None
+    result = cv2.matchTemplate(gray, template, cv2.TM_CCOEFF_NORMED)
+    _, score, _, (bx, by) = cv2.minMaxLoc(result)
+    dx = int(round(bx / scale)) + sx0 - max(0, x)
+    dy = int(round(by / scale)) + sy0 - max(0, y)
+    return (dx, dy), float(score)
+
+
+def track_scale(w, h):
+    return min(1.0, TRACK_TEMPLATE_SIZE / max(1, w, h))
+
+
+def interpolate_faces(previous, current, t):
+    """Interpola linearmente as caixas entre dois frames-chave (0 <= t <= 1)."""
+    if len(previous) != len(current):
+        # Sem correspondência entre os rostos, usa o frame-chave mais próximo
+        return list(previous if t < 0.5 else current)
+    faces = []
+    for a, b in zip(previous, current):
+        box = (1 - t) * np.array(a[:4], dtype=float) + t * np.array(b[:4], dtype=float)
+        (x, y, w, h) = box.round().astype(int)
+        faces.append((x, y, w, h, min(a[4], b[4])))
+    return faces
+
+
+def create_face_detector(mode=None, interval=None, batch_size=None):
+    """Cria o detector configurado (DETECTION_MODE / DETECTION_INTERVAL / DETECTION_BATCH_SIZE)."""
+    mode = mode or DETECTION_MODE
+    interval = interval or DETECTION_INTERVAL
+    batch_size = batch_size or DETECTION_BATCH_SIZE
+    if mode == "dense" or interval <= 1:
+        if batch_size > 1:
+            return BatchedFaceDetector(batch_size)
+        return DenseFaceDetector()
+    return SparseFaceDetector(mode, interval)
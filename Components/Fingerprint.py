@@ -0,0 +1,35 @@
+import hashlib
+import json
+import os
+
+# Tamanho e quantidade de blocos lidos para a impressão digital de arquivos grandes
+SAMPLE_BLOCK_SIZE = 1024 * 1024
+SAMPLE_BLOCKS = 16
+
+
+def file_fingerprint(path, block_size=SAMPLE_BLOCK_SIZE, blocks=SAMPLE_BLOCKS):
+    """Hash do conteúdo do arquivo, estável entre execuções e cópias.
+
+    Arquivos pequenos são lidos inteiros. Nos grandes o hash cobre o tamanho e
+    blocos distribuídos uniformemente (incluindo início e fim), o que basta
+    para distinguir vídeos e custa milissegundos mesmo em arquivos de vários GB.
+    """
+    size = os.path.getsize(path)
+    digest = hashlib.sha256()
+    digest.update(str(size).encode())
+    with open(path, "rb") as f:
+        if size <= block_size * blocks:
+            for chunk in iter(lambda: f.read(block_size), b""):
+                digest.update(chunk)
+        else:
+            step = (size - block_size) // (blocks - 1)
+            for i in range(blocks):
+                f.seek(i * step)
+                digest.update(f.read(block_size))
+    return digest.hexdigest()
+
+
+def hash_params(*parts):
+    """Hash de parâmetros serializáveis em JSON (ordem das chaves normalizada)."""
+    data = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
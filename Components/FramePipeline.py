@@ -0,0 +1,195 @@
+import queue
+import threading
+import time
+from Components.Tracing import span
+
+# Executa decodificação, detecção/corte e codificação em threads separadas
+PIPELINE_THREADED = True
+
+# Capacidade de cada fila entre estágios (limita a memória usada por frames)
+QUEUE_SIZE = 32
+
+_END = object()
+
+
+class QueueStats:
+    """Amostras de ocupação de uma fila, coletadas a cada item consumido."""
+
+    def __init__(self, name, capacity):
+        self.name = name
+        self.capacity = capacity
+        self.samples = 0
+        self.total = 0
+        self.peak = 0
+
+    def sample(self, q):
+        size = q.qsize()
+        self.samples += 1
+        self.total += size
+        self.peak = max(self.peak, size)
+
+    @property
+    def average(self):
+        return self.total / self.samples if self.samples else 0.0
+
+    def as_dict(self):
+        return {"capacity": self.capacity, "average": round(self.average, 2), "peak": self.peak}
+
+
+class PipelineStopped(Exception):
+    pass
+
+
+def _put(q, item, stop):
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            continue
+    raise PipelineStopped()
+
+
+def _get(q, stop, stats):
+    while not stop.is_set():
+        try:
+            item = q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+        stats.sample(q)
+        return item
+    raise PipelineStopped()
+
+
+def _run_serial(read_frame, process, finish, write, busy):
+    while True:
+        t0 = time.perf_counter()
+        frame = read_frame()
+        t1 = time.perf_counter()
+        busy["decode"] += t1 - t0
+        if frame is None:
+            break
+        items = process(frame)
+        t2 = time.perf_counter()
+        busy["process"] += t2 - t1
+        for item in items:
+            write(item)
+        busy["encode"] += time.perf_counter() - t2
+    t0 = time.perf_counter()
+    items = finish()
+    t1 = time.perf_counter()
+    for item in items:
+        write(item)
+    busy["process"] += t1 - t0
+    busy["encode"] += time.perf_counter() - t1
+
+
+def run_frame_pipeline(read_frame, process, finish, write, threaded=None, queue_size=None):
+    """Executa decodificação -> processamento -> codificação de frames.
+
+    read_frame() devolve o próximo frame ou None no fim; process(frame) e
+    finish() devolvem listas de itens prontos para write(item). No modo em
+    threads os estágios se comunicam por filas limitadas e a função devolve
+    a ocupação média/máxima de cada fila e o tempo ocupado de cada estágio.
+    Cada estágio também vira um span no trace da execução.
+    """
+    threaded = PIPELINE_THREADED if threaded is None else threaded
+    queue_size = queue_size or QUEUE_SIZE
+    busy = {"decode": 0.0, "process": 0.0, "encode": 0.0}
+
+    if not threaded:
+        with span("frames", cat="pipeline") as info:
+            _run_serial(read_frame, process, finish, write, busy)
+            info.update(busy)
+        return {"busy_seconds": {k: round(v, 3) for k, v in busy.items()}}
+
+    decoded = queue.Queue(maxsize=queue_size)
+    processed = queue.Queue(maxsize=queue_size)
+    decoded_stats = QueueStats("decode->process", queue_size)
+    processed_stats = QueueStats("process->encode", queue_size)
+    stop = threading.Event()
+    errors = []
+
+    def decoder():
+        try:
+            with span("decode", cat="pipeline") as info:
+                while True:
+                    t0 = time.perf_counter()
+                    frame = read_frame()
+                    busy["decode"] += time.perf_counter() - t0
+                    if frame is None:
+                        break
+                    _put(decoded, frame, stop)
+                _put(decoded, _END, stop)
+                info["busy_seconds"] = round(busy["decode"], 3)
+        except PipelineStopped:
+            pass
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+
+    def encoder():
+        try:
+            with span("encode", cat="pipeline") as info:
+                while True:
+                    item = _get(processed, stop, processed_stats)
+                    if item is _END:
+                        break
+                    t0 = time.perf_counter()
+                    write(item)
+                    busy["encode"] += time.perf_counter() - t0
+                info["busy_seconds"] = round(busy["encode"], 3)
+        except PipelineStopped:
+            pass
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+
+    threads = [threading.Thread(target=decoder, name="decoder", daemon=True),
+               threading.Thread(target=encoder, name="encoder", daemon=True)]
+    for thread in threads:
+        thread.start()
+
+    # O estágio de detecção/corte roda na thread atual
+    try:
+        with span("process", cat="pipeline") as info:
+            while True:
+                frame = _get(decoded, stop, decoded_stats)
+                t0 = time.perf_counter()
+                items = finish() if frame is _END else process(frame)
+                busy["process"] += time.perf_counter() - t0
+                for item in items:
+                    _put(processed, item, stop)
+                if frame is _END:
+                    break
+            _put(processed, _END, stop)
+            info["busy_seconds"] = round(busy["process"], 3)
+    except PipelineStopped:
+        pass
+    except Exception as e:
+        errors.append(e)
+        stop.set()
+
+    for thread in threads:
+        thread.join()
+
+    if errors:
+        raise errors[0]
+
+    return {
+        "busy_seconds": {k: round(v, 3) for k, v in busy.items()},
+        "queues": {s.name: s.as_dict() for s in (decoded_stats, processed_stats)},
+    }
+
+
+def print_pipeline_stats(stats):
+    """Mostra o tempo de cada estágio e a ocupação das filas."""
+    busy = stats.get("busy_seconds", {})
+    print("Tempo ocupado por estágio: " + ", ".join(f"{k} {v:.1f}s" for k, v in busy.items()))
+    for name, q in stats.get("queues", {}).items():
+        print(f"Fila {name}: média {q['average']:.1f}/{q['capacity']}, pico {q['peak']}")
+    if stats.get("queues"):
+        # Fila cheia antes de um estágio indica que ele é o gargalo; o tempo ocupado confirma
+        bottleneck = max(busy, key=busy.get) if busy else None
+        if bottleneck:
+            print(f"Provável gargalo: {bottleneck}")
@@ -1,13 +1,41 @@
-import openai
 from dotenv import load_dotenv
+import asyncio
 import os
 import json
 import re
 import sys
-import time
+import hashlib
+from Components.Cache import ArtifactCache, cache_key
+from Components.OpenAIClient import get_openai_client
 
 load_dotenv()
 
+# Modelo principal e alternativo para identificar destaques
+PRIMARY_MODEL = "gpt-4o-2024-05-13"
+FALLBACK_MODEL = "gpt-3.5-turbo"
+# Chave de cache dos destaques de janelas respondidas por mais de um modelo
+MIXED_MODELS = "mixed"
+TEMPERATURE = 0.7
+
+# Cache das respostas já processadas (mesma transcrição, prompt, modelo e parâmetros)
+LLM_CACHE_DIR = os.path.join("cache", "llm")
+LLM_CACHE_MAX_BYTES = 200 * 1024 * 1024
+LLM_CACHE_TTL = 7 * 24 * 3600  # segundos
+LLM_CACHE_ENABLED = os.getenv("SHORTS_CACHE", "1") != "0"
+
+# Como os destaques são escolhidos: "single" (uma chamada com a transcrição
+# inteira), "windowed" (janelas em paralelo + chamada final de ranqueamento)
+# ou "auto" (janelas só quando a transcrição passa de WINDOWED_MIN_SECONDS)
+HIGHLIGHT_MODE = "auto"
+WINDOWED_MIN_SECONDS = 30 * 60
+
+# Janelas do modo "windowed": duração, sobreposição (para não cortar um
+# destaque na borda), candidatos pedidos por janela e chamadas simultâneas
+WINDOW_SECONDS = 10 * 60
+WINDOW_OVERLAP = 60
+CANDIDATES_PER_WINDOW = 3
+WINDOW_CONCURRENCY = 16
+
 # Carregar a chave API do arquivo .env
 api_key = os.getenv("OPENAI_API")
 
@@ -148,23 +176,288 @@ User = """
 """
 
 
-def GetMultipleHighlights(Transcription, num_clips=1, max_retries=3):
-    """Obtém múltiplos destaques da transcrição."""
-    print(f"Identificando {num_clips} destaques da transcrição...")
-    
+def normalize_transcript(Transcription):
+    """Remove diferenças irrelevantes (espaços, linhas vazias) antes de calcular o hash."""
+    lines = (" ".join(line.split()) for line in Transcription.splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def highlights_cache_key(Transcription, system_prompt, model):
+    transcript_hash = hashlib.sha256(normalize_transcript(Transcription).encode("utf-8")).hexdigest()
+    return cache_key("highlights", transcript_hash, system_prompt, model, {"temperature": TEMPERATURE})
+
+
+_llm_cache = None
+
+
+def get_llm_cache():
+    global _llm_cache
+    if not LLM_CACHE_ENABLED:
+        return None
+    if _llm_cache is None:
+        _llm_cache = ArtifactCache(LLM_CACHE_DIR, LLM_CACHE_MAX_BYTES, min_evict_age=0)
+    return _llm_cache
+
+
+def cached_highlights(Transcription, system_prompt):
+    """Destaques já obtidos para esta transcrição e prompt, com qualquer dos modelos."""
+    cache = get_llm_cache()
+    if not cache:
+        return None
+    for model in (PRIMARY_MODEL, FALLBACK_MODEL, MIXED_MODELS):
+        cached = cache.get_json(highlights_cache_key(Transcription, system_prompt, model), LLM_CACHE_TTL)
+        if cached:
+            print(f"Destaques encontrados no cache ({model}).")
+            return [tuple(clip) for clip in cached]
+    return None
+
+
+def store_highlights(Transcription, system_prompt, model, highlights):
+    cache = get_llm_cache()
+    if not cache:
+        return
+    # "modelo1+modelo2" (janelas com modelos diferentes) fica sob uma chave só
+    if model not in (PRIMARY_MODEL, FALLBACK_MODEL):
+        model = MIXED_MODELS
+    try:
+        cache.put_json(highlights_cache_key(Transcription, system_prompt, model),
+                       [list(clip) for clip in highlights])
+    except Exception as e:
+        print(f"Aviso: Não foi possível guardar os destaques no cache: {e}")
+
+
+# Linha da transcrição enviada ao LLM: "início - fim: texto"
+TRANSCRIPT_LINE = re.compile(r"\s*([\d.]+)\s*-\s*([\d.]+)\s*:\s*(.*)")
+
+
+def parse_transcript(Transcription):
+    """Linhas "início - fim: texto" da transcrição como [(início, fim, texto)]."""
+    segments = []
+    for line in Transcription.splitlines():
+        match = TRANSCRIPT_LINE.match(line)
+        if match:
+            segments.append((float(match.group(1)), float(match.group(2)), match.group(3)))
+    return segments
+
+
+def transcript_windows(segments, window_seconds=None, overlap=None):
+    """Agrupa os segmentos em janelas de tempo sobrepostas; devolve o texto de cada janela."""
+    window_seconds = window_seconds or WINDOW_SECONDS
+    overlap = WINDOW_OVERLAP if overlap is None else overlap
+    if not segments:
+        return []
+    step = max(1.0, window_seconds - overlap)
+    last_end = segments[-1][1]
+    windows = []
+    window_start = segments[0][0]
+    while True:
+        window_end = window_start + window_seconds
+        lines = [f"{start} - {end}: {text}" for start, end, text in segments
+                 if start < window_end and end > window_start]
+        if lines:
+            windows.append("\n".join(lines))
+        if window_end >= last_end:
+            return windows
+        window_start += step
+
+
+def create_window_prompt(num_candidates):
+    return f"""
+Você recebe um trecho de uma transcrição longa, com os tempos de início e fim de cada fala. Identifique até {num_candidates} partes deste trecho que podem ser convertidas em shorts de menos de 1 minuto, e dê a cada uma uma nota de 1 a 10 para o quanto ela é interessante e envolvente por si só.
+
+Siga este formato e retorne em JSON válido:
+[
+  {{
+    "start": "Tempo de início do clipe em segundos",
+    "content": "Texto do destaque",
+    "end": "Tempo de fim do clipe em segundos",
+    "score": "Nota de 1 a 10"
+  }}
+]
+
+Se nada no trecho servir como short, retorne []. RETORNE APENAS O JSON VÁLIDO. Nenhuma explicação adicional.
+"""
+
+
+def create_reduce_prompt(num_clips):
+    return f"""
+Você recebe uma lista de candidatos a shorts de um vídeo longo, um por linha, no formato "início - fim (nota): conteúdo". Escolha EXATAMENTE {num_clips} candidatos (ou todos, se houver menos) que formem os melhores shorts: distintos entre si, interessantes e independentes. Mantenha os tempos de início e fim dos candidatos escolhidos.
+
+Siga este formato e retorne em JSON válido:
+[
+  {{
+    "start": "Tempo de início do clipe em segundos",
+    "content": "Texto do destaque",
+    "end": "Tempo de fim do clipe em segundos"
+  }}
+]
+
+RETORNE APENAS O JSON VÁLIDO. Nenhuma explicação adicional.
+"""
+
+
+def extract_candidates(json_string):
+    """Candidatos [(início, fim, conteúdo, nota)] de uma resposta de janela."""
+    json_string = json_string.replace("```json", "").replace("```", "").strip()
+    json_match = re.search(r'\[.*\]', json_string, re.DOTALL)
+    if json_match:
+        json_string = json_match.group(0)
+    try:
+        data = json.loads(json_string)
+    except ValueError as e:
+        print(f"Aviso: Resposta de janela inválida: {e}")
+        return []
+
+    candidates = []
+    for clip in data if isinstance(data, list) else []:
+        try:
+            start_time = float(clip["start"])
+            end_time = min(float(clip["end"]), start_time + 60)
+            score = float(clip.get("score", 0) or 0)
+        except (KeyError, TypeError, ValueError):
+            continue
+        if start_time < end_time:
+            candidates.append((start_time, end_time, clip.get("content", ""), score))
+    return candidates
+
+
+def merge_candidates(candidates):
+    """Remove candidatos repetidos pelas janelas sobrepostas (mais da metade em comum), mantendo a maior nota."""
+    kept = []
+    for candidate in sorted(candidates, key=lambda c: c[3], reverse=True):
+        start, end = candidate[0], candidate[1]
+        duplicate = any(min(end, k[1]) - max(start, k[0]) > 0.5 * min(end - start, k[1] - k[0])
+                        for k in kept)
+        if not duplicate:
+            kept.append(candidate)
+    return kept
+
+
+def top_candidates(candidates, num_clips):
+    """Ranqueamento sem LLM: as maiores notas, como tuplas (início, fim, conteúdo)."""
+    highlights = [(int(start), int(end), content) for start, end, content, score in candidates[:num_clips]]
+    highlights.sort(key=lambda x: x[0])
+    return highlights
+
+
+async def complete_async(client, system_prompt, user_content, semaphore):
+    """Uma chamada de chat (modelo principal, depois o alternativo); devolve (modelo, texto)."""
+    async with semaphore:
+        for model in (PRIMARY_MODEL, FALLBACK_MODEL):
+            try:
+                content = await client.chat(model, [
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_content},
+                ], TEMPERATURE)
+                return model, content
+            except Exception as e:
+                print(f"Erro ao usar {model}: {e}")
+    return None, None
+
+
+async def map_reduce_highlights(client, windows, num_clips):
+    semaphore = asyncio.Semaphore(WINDOW_CONCURRENCY)
+    # Map: todas as janelas ao mesmo tempo; a latência é a da janela mais lenta
+    window_prompt = create_window_prompt(CANDIDATES_PER_WINDOW)
+    responses = await asyncio.gather(*(complete_async(client, window_prompt, window, semaphore)
+                                       for window in windows))
+    candidates = []
+    window_models = []
+    for index, (model, content) in enumerate(responses):
+        if content is None:
+            print(f"Aviso: A janela {index + 1}/{len(windows)} falhou e foi ignorada.")
+            continue
+        candidates.extend(extract_candidates(content))
+        if model not in window_models:
+            window_models.append(model)
+    # Modelo(s) que de fato responderam as janelas (o reserva entra se o principal falhar)
+    window_model = "+".join(window_models)
+    candidates = merge_candidates(candidates)
+    print(f"{len(candidates)} candidatos encontrados em {len(windows)} janelas.")
+    if len(candidates) <= num_clips:
+        return window_model, top_candidates(candidates, num_clips)
+
+    # Reduce: só os candidatos, bem menor que a transcrição
+    listing = "\n".join(f"{start:.2f} - {end:.2f} ({score:g}): {' '.join(content.split())}"
+                         for start, end, content, score in candidates)
+    model, content = await complete_async(client, create_reduce_prompt(num_clips), listing, semaphore)
+    highlights = extract_times(content, multiple=True)[:num_clips] if content else []
+    if not highlights:
+        print("Aviso: Ranqueamento final falhou. Usando as maiores notas das janelas.")
+        return window_model, top_candidates(candidates, num_clips)
+    return model, highlights
+
+
+def GetHighlightsWindowed(Transcription, num_clips=1):
+    """Destaques de transcrições longas em map-reduce.
+
+    A transcrição é dividida em janelas de WINDOW_SECONDS com WINDOW_OVERLAP
+    de sobreposição; cada janela propõe candidatos com nota em chamadas
+    simultâneas e uma chamada final, só com os candidatos, escolhe os num_clips.
+    """
+    windows = transcript_windows(parse_transcript(Transcription))
+    if not windows:
+        print("Erro: Transcrição sem linhas com tempos válidos.")
+        return []
+
+    cache_prompt = json.dumps([create_window_prompt(CANDIDATES_PER_WINDOW), create_reduce_prompt(num_clips),
+                               WINDOW_SECONDS, WINDOW_OVERLAP])
+    highlights = cached_highlights(Transcription, cache_prompt)
+    if highlights:
+        return highlights
+
     if not api_key:
         print("Erro: Chave da API OpenAI não configurada.")
         return []
+
+    print(f"Analisando {len(windows)} janelas da transcrição em paralelo...")
+    client = get_openai_client()
+    model, highlights = client.run(map_reduce_highlights(client, windows, num_clips))
+    if highlights:
+        print(f"Total de {len(highlights)} destaques identificados:")
+        for i, (start, end, content) in enumerate(highlights):
+            print(f"  Clip {i+1}: {start}s até {end}s (duração: {end-start}s)")
+        store_highlights(Transcription, cache_prompt, model, highlights)
+    return highlights
+
+
+def uses_windowed_mode(Transcription):
+    if HIGHLIGHT_MODE != "auto":
+        return HIGHLIGHT_MODE == "windowed"
+    segments = parse_transcript(Transcription)
+    return bool(segments) and segments[-1][1] - segments[0][0] > WINDOWED_MIN_SECONDS
+
+
+def GetMultipleHighlights(Transcription, num_clips=1, max_retries=3):
+    """Obtém múltiplos destaques da transcrição."""
+    print(f"Identificando {num_clips} destaques da transcrição...")
         
     if not Transcription or len(Transcription.strip()) < 10:
         print("Erro: Transcrição muito curta ou vazia.")
         return []
     
-    # Criar cliente OpenAI com a nova sintaxe
-    client = openai.OpenAI(api_key=api_key)
-    
+    # Transcrições longas vão por janelas em paralelo
+    if uses_windowed_mode(Transcription):
+        return GetHighlightsWindowed(Transcription, num_clips)
+
     # Criar o prompt baseado no número de clipes
     system_prompt = create_prompt(num_clips)
+
+    # Mesma transcrição e prompt já respondidos antes? Dispensa a chamada à API
+    highlights = cached_highlights(Transcription, system_prompt)
+    if highlights:
+        return highlights
+    
+    if not api_key:
+        print("Erro: Chave da API OpenAI não configurada.")
+        return []
+    
+    # Cliente compartilhado: novas tentativas com espera e limite de taxa ficam nele
+    client = get_openai_client()
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": Transcription},
+    ]
     
     for attempt in range(max_retries):
         try:
@@ -172,30 +465,17 @@ def GetMultipleHighlights(Transcription, num_clips=1, max_retries=3):
             
             # Tentar primeiro com gpt-4o
             try:
-                response = client.chat.completions.create(
-                    model="gpt-4o-2024-05-13",
-                    temperature=0.7,
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": Transcription},
-                    ]
-                )
+                model = PRIMARY_MODEL
+                json_string = client.chat_sync(model, messages, TEMPERATURE)
             except Exception as e:
                 print(f"Erro ao usar gpt-4o: {e}")
                 print("Tentando com modelo alternativo gpt-3.5-turbo...")
                 
                 # Fallback para gpt-3.5-turbo se gpt-4o falhar
-                response = client.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    temperature=0.7,
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": Transcription},
-                    ]
-                )
+                model = FALLBACK_MODEL
+                json_string = client.chat_sync(model, messages, TEMPERATURE)
 
             # Obter a resposta e processar o JSON
-            json_string = response.choices[0].message.content
             print("Resposta recebida da API.")
             
             # Extrair os tempos
@@ -203,7 +483,6 @@ def GetMultipleHighlights(Transcription, num_clips=1, max_retries=3):
             
             if not highlights:
                 print(f"Aviso: Não foi possível extrair tempos válidos. Tentativa {attempt+1}/{max_retries}")
-                time.sleep(2)  # Esperar antes de tentar novamente
                 continue
                 
             if len(highlights) < num_clips:
@@ -213,19 +492,17 @@ def GetMultipleHighlights(Transcription, num_clips=1, max_retries=3):
             print(f"Total de {len(highlights)} destaques identificados:")
             for i, (start, end, content) in enumerate(highlights):
                 print(f"  Clip {i+1}: {start}s até {end}s (duração: {end-start}s)")
+
+            store_highlights(Transcription, system_prompt, model, highlights)
             
             return highlights
             
         except Exception as e:
             print(f"Erro durante a chamada da API: {e}")
-            print(f"Tentativa {attempt+1}/{max_retries} falhou. Tentando novamente em 3 segundos...")
-            time.sleep(3)
+            print(f"Tentativa {attempt+1}/{max_retries} falhou.")
     
-    # Se todas as tentativas falharam, perguntar ao usuário se deseja tentar novamente
-    print("Todas as tentativas automáticas falharam.")
-    Ask = input("Deseja tentar novamente? (s/n): ").lower()
-    if Ask == "s":
-        return GetMultipleHighlights(Transcription, num_clips, max_retries)
+    # Sem interação: quem chamou decide o que fazer (ex.: usar a pontuação local)
+    print("Todas as tentativas falharam.")
     return []
 
 
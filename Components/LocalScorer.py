@@ -0,0 +1,169 @@
+import re
+import numpy as np
+
+# Duração dos clipes candidatos (segundos)
+MIN_CLIP_SECONDS = 15
+MAX_CLIP_SECONDS = 60
+
+# Peso de cada sinal na nota final (os sinais são padronizados antes da soma)
+SIGNAL_WEIGHTS = {
+    "speech": 1.0,     # palavras por segundo
+    "loudness": 0.7,   # energia média do áudio
+    "peaks": 0.5,      # pico de energia (risos, aplausos, ênfase)
+    "faces": 0.8,      # fração do tempo com rosto na tela
+    "salience": 1.0,   # palavras raras no vídeo (TF-IDF)
+}
+
+WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def per_second(values_at, starts, ends, n_seconds):
+    """Espalha um valor por segmento uniformemente pelos segundos que ele cobre."""
+    grid = np.zeros(n_seconds + 1, dtype=np.float64)
+    first = np.clip(starts.astype(np.int64), 0, n_seconds)
+    last = np.clip(np.ceil(ends).astype(np.int64), 0, n_seconds)
+    spans = np.maximum(last - first, 1)
+    rate = values_at / spans
+    # Soma de diferenças: +rate no primeiro segundo, -rate depois do último
+    np.add.at(grid, first, rate)
+    np.add.at(grid, np.minimum(first + spans, n_seconds), -rate)
+    return np.cumsum(grid)[:n_seconds]
+
+
+def audio_energy(audio, n_seconds, block_seconds=600):
+    """Energia RMS (dB) de cada segundo do AudioBuffer, lida em blocos."""
+    energy = np.full(n_seconds, -90.0)
+    rate = audio.sample_rate
+    available = min(n_seconds, len(audio) // rate)
+    for first in range(0, available, block_seconds):
+        last = min(available, first + block_seconds)
+        block = np.asarray(audio.samples[first * rate:last * rate], dtype=np.float32) / 32768.0
+        rms = np.sqrt(np.mean(block.reshape(last - first, rate) ** 2, axis=1))
+        energy[first:last] = 20 * np.log10(np.maximum(rms, 1e-5))
+    return energy
+
+
+def face_presence(track, n_seconds):
+    """Fração dos frames de cada segundo com pelo menos um rosto."""
+    seconds = np.clip(np.asarray(track.timestamps).astype(np.int64), 0, n_seconds - 1)
+    with_face = (np.asarray(track.n_faces) > 0).astype(np.float64)
+    counts = np.bincount(seconds, minlength=n_seconds)
+    hits = np.bincount(seconds, weights=with_face, minlength=n_seconds)
+    return hits / np.maximum(counts, 1)
+
+
+def segment_salience(texts):
+    """Nota TF-IDF de cada segmento: média do IDF das suas palavras (segmento = documento)."""
+    vocabulary = {}
+    doc_ids, word_ids = [], []
+    for index, text in enumerate(texts):
+        for word in WORD_PATTERN.findall(text.lower()):
+            doc_ids.append(index)
+            word_ids.append(vocabulary.setdefault(word, len(vocabulary)))
+    if not word_ids:
+        return np.zeros(len(texts))
+    doc_ids = np.array(doc_ids)
+    word_ids = np.array(word_ids)
+
+    # Em quantos segmentos cada palavra aparece
+    pairs = np.unique(doc_ids * len(vocabulary) + word_ids)
+    df = np.bincount(pairs % len(vocabulary), minlength=len(vocabulary))
+    idf = np.log((1 + len(texts)) / (1 + df)) + 1
+    totals = np.bincount(doc_ids, weights=idf[word_ids], minlength=len(texts))
+    counts = np.bincount(doc_ids, minlength=len(texts))
+    return totals / np.maximum(counts, 1)
+
+
+def standardize(values):
+    std = values.std()
+    return (values - values.mean()) / std if std > 0 else np.zeros_like(values)
+
+
+def window_sums(per_second_values, first, last):
+    cumsum = np.concatenate(([0.0], np.cumsum(per_second_values)))
+    return cumsum[last] - cumsum[first]
+
+
+def candidate_windows(starts, ends, min_seconds=None, max_seconds=None):
+    """Candidatos que começam no início de um segmento e terminam no fim de outro, até max_seconds."""
+    min_seconds = min_seconds or MIN_CLIP_SECONDS
+    max_seconds = max_seconds or MAX_CLIP_SECONDS
+    # Último segmento que termina dentro do limite, para cada segmento inicial
+    last = np.searchsorted(ends, starts + max_seconds, side="right") - 1
+    first = np.arange(len(starts))
+    valid = (last >= first) & (ends[np.maximum(last, 0)] - starts >= min_seconds)
+    return first[valid], last[valid]
+
+
+def score_windows(transcriptions, audio=None, track=None):
+    """Nota de cada janela candidata; devolve (primeiro segmento, último segmento, nota, sinais)."""
+    texts = [text for text, start, end in transcriptions]
+    starts = np.array([start for text, start, end in transcriptions], dtype=np.float64)
+    ends = np.array([end for text, start, end in transcriptions], dtype=np.float64)
+    first, last = candidate_windows(starts, ends)
+    if len(first) == 0:
+        return first, last, np.zeros(0), {}
+
+    n_seconds = int(np.ceil(ends.max())) + 1
+    words = np.array([len(WORD_PATTERN.findall(text)) for text in texts], dtype=np.float64)
+    window_first = starts[first].astype(np.int64)
+    window_last = np.minimum(np.ceil(ends[last]).astype(np.int64), n_seconds)
+    durations = np.maximum(window_last - window_first, 1)
+
+    signals = {"speech": window_sums(per_second(words, starts, ends, n_seconds),
+                                     window_first, window_last) / durations}
+
+    # Salience: média das notas dos segmentos da janela
+    salience = np.concatenate(([0.0], np.cumsum(segment_salience(texts))))
+    signals["salience"] = (salience[last + 1] - salience[first]) / (last - first + 1)
+
+    if audio is not None and len(audio):
+        energy = audio_energy(audio, n_seconds)
+        signals["loudness"] = window_sums(energy, window_first, window_last) / durations
+        # Pico: maior energia de um segundo dentro da janela (máximo em janelas de até MAX_CLIP_SECONDS)
+        padded = np.concatenate((energy, np.full(MAX_CLIP_SECONDS + 1, -90.0)))
+        windows = np.lib.stride_tricks.sliding_window_view(padded, MAX_CLIP_SECONDS + 1)
+        offsets = np.arange(MAX_CLIP_SECONDS + 1)
+        inside = offsets[None, :] < durations[:, None]
+        signals["peaks"] = np.where(inside, windows[window_first], -90.0).max(axis=1)
+
+    if track is not None and len(track):
+        signals["faces"] = window_sums(face_presence(track, n_seconds),
+                                       window_first, window_last) / durations
+
+    score = sum(SIGNAL_WEIGHTS[name] * standardize(values) for name, values in signals.items())
+    return first, last, score, signals
+
+
+def LocalHighlights(transcriptions, num_clips=1, audio=None, track=None):
+    """Escolhe destaques sem rede, no formato de extract_times: [(início, fim, conteúdo)].
+
+    transcriptions é a lista [texto, início, fim] da transcrição; audio (o
+    AudioBuffer da fonte) e track (o FaceTrack do vídeo inteiro) acrescentam
+    os sinais de volume e de rostos quando disponíveis.
+    """
+    if not transcriptions:
+        return []
+    first, last, score, signals = score_windows(transcriptions, audio, track)
+    if len(score) == 0:
+        print("Aviso: Transcrição curta demais para gerar candidatos.")
+        return []
+
+    starts = np.array([start for text, start, end in transcriptions], dtype=np.float64)
+    ends = np.array([end for text, start, end in transcriptions], dtype=np.float64)
+
+    # Melhores notas primeiro, sem sobreposição entre os clipes escolhidos
+    chosen = []
+    for index in np.argsort(-score):
+        start, end = starts[first[index]], ends[last[index]]
+        if all(end <= s or start >= e for s, e, _ in chosen):
+            content = " ".join(text.strip() for text, _, _ in transcriptions[first[index]:last[index] + 1])
+            chosen.append((start, end, content))
+            if len(chosen) == num_clips:
+                break
+
+    print(f"Pontuação local: {len(score)} candidatos, sinais: {', '.join(signals)}")
+    highlights = [(int(start), min(int(np.ceil(end)), int(start) + MAX_CLIP_SECONDS), content)
+                  for start, end, content in chosen]
+    highlights.sort(key=lambda x: x[0])
+    return highlights
@@ -0,0 +1,83 @@
+import json
+import shutil
+import subprocess
+
+
+def find_ffmpeg():
+    """Caminho do executável do FFmpeg ou None se não estiver no PATH."""
+    return shutil.which('ffmpeg')
+
+
+def find_ffprobe():
+    """Caminho do executável do FFprobe ou None se não estiver no PATH."""
+    return shutil.which('ffprobe')
+
+
+def probe_streams(path):
+    """Lista os streams do arquivo (formato JSON do ffprobe) ou [] se falhar."""
+    ffprobe_path = find_ffprobe()
+    if not ffprobe_path:
+        return []
+    cmd = [ffprobe_path, "-v", "error", "-show_entries",
+           "stream=index,codec_type,codec_name,width,height,r_frame_rate,pix_fmt,profile",
+           "-of", "json", path]
+    try:
+        result = subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        return json.loads(result.stdout).get("streams", [])
+    except Exception as e:
+        print(f"Erro ao inspecionar {path} com ffprobe: {e}")
+        return []
+
+
+def probe_video_stream(path):
+    """Dados do primeiro stream de vídeo (codec, dimensões, pix_fmt), ou None."""
+    for stream in probe_streams(path):
+        if stream.get("codec_type") == "video":
+            return stream
+    return None
+
+
+def probe_keyframes(path, start, end):
+    """Instantes (em segundos) dos keyframes de vídeo entre start e end.
+
+    Lê apenas os pacotes (sem decodificar) a partir do keyframe anterior a start.
+    """
+    ffprobe_path = find_ffprobe()
+    if not ffprobe_path:
+        return []
+    cmd = [ffprobe_path, "-v", "error", "-select_streams", "v:0",
+           "-read_intervals", f"{max(0.0, start):.3f}%{end:.3f}",
+           "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", path]
+    try:
+        result = subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except Exception as e:
+        print(f"Erro ao localizar keyframes em {path}: {e}")
+        return []
+
+    keyframes = []
+    for line in result.stdout.decode(errors="replace").splitlines():
+        fields = line.strip().split(",")
+        if len(fields) < 2 or "K" not in fields[1]:
+            continue
+        try:
+            pts = float(fields[0])
+        except ValueError:
+            continue
+        if start <= pts <= end:
+            keyframes.append(pts)
+    return sorted(set(keyframes))
+
+
+def probe_duration(path):
+    """Duração do arquivo em segundos, ou None se não for possível ler."""
+    ffprobe_path = find_ffprobe()
+    if not ffprobe_path:
+        return None
+    cmd = [ffprobe_path, "-v", "error", "-show_entries", "format=duration",
+           "-of", "csv=p=0", path]
+    try:
+        result = subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        return float(result.stdout.decode().strip())
+    except Exception as e:
+        print(f"Erro ao ler a duração de {path}: {e}")
+        return None
@@ -0,0 +1,200 @@
+import asyncio
+import contextlib
+import json
+import os
+import random
+import threading
+import time
+import httpx
+import openai
+from dotenv import load_dotenv
+from Components.Concurrency import lock_file, unlock_file
+from Components.Tracing import count as trace_count, span
+
+load_dotenv()
+
+# Chave e endereço da API (OPENAI_BASE_URL permite apontar para um servidor local de teste)
+api_key = os.getenv("OPENAI_API")
+API_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+
+# Conexões HTTP mantidas abertas e reaproveitadas entre as chamadas
+MAX_CONNECTIONS = 20
+REQUEST_TIMEOUT = 120  # segundos
+
+# Novas tentativas com espera exponencial e aleatória (jitter) em 429, 5xx e falhas de rede
+MAX_RETRIES = 6
+BACKOFF_BASE = 1.0  # segundos
+BACKOFF_MAX = 60.0
+
+# Limites da conta, divididos entre todas as tarefas e processos que usam a mesma pasta de cache
+REQUESTS_PER_MINUTE = int(os.getenv("OPENAI_RPM", "500"))
+TOKENS_PER_MINUTE = int(os.getenv("OPENAI_TPM", "30000"))
+RATE_LIMIT_FILE = os.path.join("cache", "openai_rate.json")
+
+# Tokens reservados para a resposta de cada chamada de chat
+COMPLETION_TOKENS_ESTIMATE = 1000
+
+
+class RateLimitExceeded(Exception):
+    """As novas tentativas se esgotaram (a API continua recusando por limite ou erro temporário)."""
+
+
+class SharedRateLimiter:
+    """Limite de requisições e tokens por minuto compartilhado entre processos.
+
+    Usa o algoritmo GCRA: o arquivo de estado guarda, para requisições e para
+    tokens, o instante teórico em que a cota volta a estar livre. Cada
+    chamada avança esses instantes sob um lock de arquivo; se eles passarem
+    de uma janela de rajada à frente do relógio, a chamada espera.
+    """
+
+    def __init__(self, path=None, requests_per_minute=None, tokens_per_minute=None, burst_seconds=1.0):
+        self.path = os.path.abspath(path or RATE_LIMIT_FILE)
+        self.request_interval = 60.0 / (requests_per_minute or REQUESTS_PER_MINUTE)
+        self.token_interval = 60.0 / (tokens_per_minute or TOKENS_PER_MINUTE)
+        self.burst_seconds = burst_seconds
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def _state(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._lock, open(self.path, "a+") as f:
+            lock_file(f)
+            try:
+                f.seek(0)
+                try:
+                    state = json.loads(f.read() or "{}")
+                except ValueError:
+                    state = {}
+                yield state
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(state))
+                f.flush()
+            finally:
+                unlock_file(f)
+
+    def reserve(self, tokens=0):
+        """Reserva uma requisição com tokens; devolve quantos segundos esperar antes de enviá-la."""
+        now = time.time()
+        with self._state() as state:
+            request_tat = max(state.get("requests", 0.0), now)
+            token_tat = max(state.get("tokens", 0.0), now)
+            # Um pedido maior que a rajada toda só precisa que a cota esteja livre agora
+            wait = max(request_tat - now - self.burst_seconds,
+                       min(token_tat - now, token_tat + tokens * self.token_interval - now - 60.0), 0.0)
+            if wait > 0:
+                return wait
+            state["requests"] = request_tat + self.request_interval
+            state["tokens"] = token_tat + tokens * self.token_interval
+        return 0.0
+
+    async def acquire(self, tokens=0):
+        while True:
+            wait = self.reserve(tokens)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+
+def backoff_delay(attempt, error=None):
+    """Espera antes da tentativa attempt + 1: Retry-After do servidor ou exponencial com jitter."""
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), BACKOFF_MAX)
+        except ValueError:
+            pass
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError,
+                    openai.InternalServerError)
+
+
+class OpenAIClient:
+    """Cliente assíncrono único do processo, em um event loop próprio em segundo plano.
+
+    Chamadas síncronas (de qualquer thread) e assíncronas usam o mesmo pool
+    de conexões, o mesmo limite de taxa e a mesma política de novas tentativas.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="openai-client", daemon=True)
+        self.thread.start()
+        self.limiter = SharedRateLimiter()
+        self.client = self.run(self._create_client())
+
+    async def _create_client(self):
+        http_client = httpx.AsyncClient(
+            timeout=REQUEST_TIMEOUT,
+            limits=httpx.Limits(max_connections=MAX_CONNECTIONS,
+                                max_keepalive_connections=MAX_CONNECTIONS),
+        )
+        # As novas tentativas ficam por nossa conta (com o limite de taxa compartilhado)
+        return openai.AsyncOpenAI(api_key=api_key, base_url=API_BASE_URL, max_retries=0,
+                                  http_client=http_client)
+
+    def run(self, coroutine):
+        """Executa a corrotina no loop do cliente e espera o resultado (para código síncrono)."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    async def call(self, request, tokens=0, name="api"):
+        """Executa request() respeitando o limite de taxa, com novas tentativas nos erros temporários."""
+        for attempt in range(MAX_RETRIES + 1):
+            with span(f"api.{name}.wait", cat="api", concurrent=True):
+                await self.limiter.acquire(tokens)
+            try:
+                trace_count("api_calls")
+                with span(f"api.{name}", cat="api", concurrent=True, attempt=attempt, tokens=tokens):
+                    return await request()
+            except RETRYABLE_ERRORS as e:
+                trace_count("api_retries")
+                if attempt == MAX_RETRIES:
+                    raise RateLimitExceeded(f"{type(e).__name__} após {MAX_RETRIES + 1} tentativas: {e}") from e
+                delay = backoff_delay(attempt, e)
+                print(f"Aviso: {type(e).__name__} na API OpenAI. Nova tentativa em {delay:.1f}s "
+                      f"({attempt + 1}/{MAX_RETRIES}).")
+                await asyncio.sleep(delay)
+
+    async def chat(self, model, messages, temperature=None):
+        """Texto da resposta de uma chamada de chat."""
+        from Components.TranscriptCompactor import count_tokens
+        tokens = sum(count_tokens(m["content"]) for m in messages) + COMPLETION_TOKENS_ESTIMATE
+        kwargs = {} if temperature is None else {"temperature": temperature}
+        trace_count("tokens_sent", tokens - COMPLETION_TOKENS_ESTIMATE)
+        response = await self.call(lambda: self.client.chat.completions.create(
+            model=model, messages=messages, **kwargs), tokens, "chat")
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            trace_count("tokens_received", usage.completion_tokens or 0)
+        return response.choices[0].message.content
+
+    async def transcribe(self, model, file, response_format="verbose_json"):
+        if isinstance(file, tuple):
+            trace_count("bytes_uploaded", len(file[1]))
+        return await self.call(lambda: self.client.audio.transcriptions.create(
+            model=model, file=file, response_format=response_format), name="transcribe")
+
+    def chat_sync(self, model, messages, temperature=None):
+        return self.run(self.chat(model, messages, temperature))
+
+    def transcribe_sync(self, model, file, response_format="verbose_json"):
+        return self.run(self.transcribe(model, file, response_format))
+
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def get_openai_client():
+    """Cliente compartilhado deste processo (recriado após um fork)."""
+    global _client, _client_pid
+    with _client_lock:
+        if _client is None or _client_pid != os.getpid():
+            _client = OpenAIClient()
+            _client_pid = os.getpid()
+        return _client
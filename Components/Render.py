@@ -0,0 +1,122 @@
+import subprocess
+import tempfile
+import numpy as np
+from Components.Media import find_ffmpeg, probe_streams
+
+# Como os shorts são gravados:
+# - "ffmpeg": os frames recortados vão direto para um único processo FFmpeg
+#   (libx264) que também copia o áudio do trecho; sem arquivos intermediários
+# - "legacy": corte com moviepy, corte vertical em mp4v e combinação com moviepy
+RENDER_BACKEND = "ffmpeg"
+
+# Parâmetros do libx264 para o render final
+VIDEO_PRESET = "medium"
+VIDEO_CRF = 23
+
+# Perfis de render escolhidos por tarefa (modo em lote): parâmetros do libx264
+# e modo de detecção de rostos (ver FaceTracker.DETECTION_MODE)
+RENDER_PROFILES = {
+    "fast": {"preset": "veryfast", "crf": 26, "detection_mode": "track"},
+    "default": {"preset": VIDEO_PRESET, "crf": VIDEO_CRF, "detection_mode": None},
+    "quality": {"preset": "slow", "crf": 20, "detection_mode": "dense"},
+}
+
+# Codecs de áudio que podem ser copiados sem recodificar para um .mp4
+MP4_AUDIO_CODECS = ("aac", "mp3")
+
+_probe_warned = False
+
+
+class FFmpegWriter:
+    """Recebe frames BGR e os codifica com um único processo FFmpeg.
+
+    Tem a mesma interface de cv2.VideoWriter (write/release/isOpened). Se
+    audio_source for informado, o áudio do intervalo [audio_start,
+    audio_start + duration) é multiplexado na mesma chamada, copiado sem
+    recodificar quando o codec permite. Se o ffprobe não estiver disponível
+    (ou falhar), o áudio, se houver, é recodificado em AAC.
+    """
+
+    def __init__(self, output_path, size, fps, audio_source=None, audio_start=0.0,
+                 duration=None, preset=None, crf=None):
+        self.output_path = output_path
+        self.width, self.height = size
+        self.stderr = tempfile.TemporaryFile()
+        self.proc = None
+
+        ffmpeg_path = find_ffmpeg()
+        if not ffmpeg_path:
+            print("Erro: FFmpeg não encontrado. Não é possível usar o render direto.")
+            return
+
+        cmd = [ffmpeg_path, "-y", "-loglevel", "error",
+               "-f", "rawvideo", "-pix_fmt", "bgr24",
+               "-s", f"{self.width}x{self.height}", "-r", f"{fps}",
+               "-i", "-"]
+
+        streams = probe_streams(audio_source) if audio_source else []
+        audio_codec = next((stream.get("codec_name") for stream in streams
+                            if stream.get("codec_type") == "audio"), None)
+        # Sem ffprobe não dá para saber o codec (nem se há áudio): recodifica o que houver
+        probe_failed = bool(audio_source) and not streams
+        if probe_failed:
+            global _probe_warned
+            if not _probe_warned:
+                print("Aviso: Não foi possível inspecionar o áudio com o ffprobe. "
+                      "O áudio dos shorts será recodificado em AAC.")
+                _probe_warned = True
+        if audio_codec or probe_failed:
+            cmd += ["-ss", f"{audio_start:.3f}"]
+            if duration:
+                cmd += ["-t", f"{duration:.3f}"]
+            cmd += ["-i", audio_source]
+
+        cmd += ["-map", "0:v:0",
+                # libx264 com yuv420p exige largura e altura pares
+                "-vf", "crop=trunc(iw/2)*2:trunc(ih/2)*2",
+                "-c:v", "libx264", "-preset", preset or VIDEO_PRESET,
+                "-crf", str(crf if crf is not None else VIDEO_CRF),
+                "-pix_fmt", "yuv420p"]
+
+        if audio_codec or probe_failed:
+            # "?" deixa o vídeo sem áudio, em vez de falhar, se a fonte não tiver áudio
+            cmd += ["-map", "1:a:0?" if probe_failed else "1:a:0"]
+            if audio_codec in MP4_AUDIO_CODECS:
+                cmd += ["-c:a", "copy"]
+            else:
+                cmd += ["-c:a", "aac", "-b:a", "192k"]
+            cmd += ["-shortest"]
+
+        cmd += ["-movflags", "+faststart", output_path]
+
+        try:
+            self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=self.stderr)
+        except Exception as e:
+            print(f"Erro ao iniciar o FFmpeg: {e}")
+            self.proc = None
+
+    def isOpened(self):
+        return self.proc is not None and self.proc.poll() is None
+
+    def write(self, frame):
+        if self.proc is None:
+            return
+        # Recortes são vistas não contíguas do frame original
+        self.proc.stdin.write(np.ascontiguousarray(frame))
+
+    def release(self):
+        """Fecha a entrada do FFmpeg e espera o fim da codificação; True se deu certo."""
+        if self.proc is None:
+            return False
+        try:
+            self.proc.stdin.close()
+        except Exception:
+            pass
+        returncode = self.proc.wait()
+        self.proc = None
+        if returncode != 0:
+            self.stderr.seek(0)
+            message = self.stderr.read().decode(errors="replace").strip()
+            print(f"Erro no FFmpeg ao gravar {self.output_path}: {message}")
+        self.stderr.close()
+        return returncode == 0
@@ -0,0 +1,212 @@
+import io
+import numpy as np
+from Components import Speaker
+from Components.AudioBuffer import decode_audio
+from Components.Cache import cache_key, get_cache
+
+# Duração de cada bloco analisado pelo VAD (o webrtcvad aceita 10, 20 ou 30 ms)
+VAD_FRAME_MS = 30
+
+# Quantos segundos de áudio são lidos por vez ao percorrer o buffer
+VAD_BLOCK_SECONDS = 60
+
+# Sem o webrtcvad, um bloco é fala se a energia dele passar do ruído de fundo
+# (percentil ENERGY_FLOOR_PERCENTILE da energia dos blocos) por ENERGY_MARGIN_DB,
+# e nunca abaixo de ENERGY_MIN_DB (dBFS)
+ENERGY_FLOOR_PERCENTILE = 10
+ENERGY_MARGIN_DB = 12.0
+ENERGY_MIN_DB = -50.0
+
+# Linhas do tempo já calculadas nesta execução, por conteúdo do áudio
+_FLAGS = {}
+
+_energy_fallback_warned = False
+
+
+def vad_settings(frame_ms=VAD_FRAME_MS):
+    """Tudo o que altera as flags de fala (entra nas chaves de cache de quem as guarda)."""
+    if Speaker.WEBRTCVAD_AVAILABLE:
+        return {"backend": "webrtcvad", "aggressiveness": Speaker.VAD_AGGRESSIVENESS, "frame_ms": frame_ms}
+    return {"backend": "energy", "floor_percentile": ENERGY_FLOOR_PERCENTILE,
+            "margin_db": ENERGY_MARGIN_DB, "min_db": ENERGY_MIN_DB, "frame_ms": frame_ms}
+
+
+def energy_flags(audio, frame_size, n_frames, block_seconds=VAD_BLOCK_SECONDS):
+    """Fala por energia (usado sem o webrtcvad): blocos bem acima do ruído de fundo."""
+    energy = np.empty(n_frames, dtype=np.float64)
+    frames_per_block = max(1, int(block_seconds * audio.sample_rate / frame_size))
+    for first in range(0, n_frames, frames_per_block):
+        last = min(n_frames, first + frames_per_block)
+        block = np.asarray(audio.samples[first * frame_size:last * frame_size], dtype=np.float32) / 32768.0
+        rms = np.sqrt(np.mean(block.reshape(last - first, frame_size) ** 2, axis=1))
+        energy[first:last] = 20 * np.log10(np.maximum(rms, 1e-5))
+    threshold = max(np.percentile(energy, ENERGY_FLOOR_PERCENTILE) + ENERGY_MARGIN_DB, ENERGY_MIN_DB)
+    return energy > threshold
+
+
+def vad_flags(audio, frame_ms=VAD_FRAME_MS, block_seconds=VAD_BLOCK_SECONDS):
+    """Roda o VAD sobre o AudioBuffer e devolve um bool por bloco de frame_ms.
+
+    Sem o webrtcvad a fala é estimada pela energia de cada bloco (energy_flags).
+
+    O áudio é percorrido em trechos de block_seconds; cada bloco do VAD é uma
+    vista do buffer (memory-mapped), então o áudio nunca é copiado inteiro.
+    """
+    frame_size = int(audio.sample_rate * frame_ms / 1000)
+    n_frames = len(audio) // frame_size
+    flags = np.zeros(n_frames, dtype=bool)
+    if n_frames == 0:
+        return flags
+    if not Speaker.WEBRTCVAD_AVAILABLE:
+        global _energy_fallback_warned
+        if not _energy_fallback_warned:
+            print("Aviso: webrtcvad indisponível. Fala detectada pela energia do áudio.")
+            _energy_fallback_warned = True
+        return energy_flags(audio, frame_size, n_frames, block_seconds)
+
+    frames_per_block = max(1, int(block_seconds * 1000 / frame_ms))
+    for first in range(0, n_frames, frames_per_block):
+        last = min(n_frames, first + frames_per_block)
+        block = np.ascontiguousarray(audio.samples[first * frame_size:last * frame_size])
+        pcm = memoryview(block).cast("B")
+        step = frame_size * 2
+        for i in range(last - first):
+            flags[first + i] = Speaker.voice_activity_detection(pcm[i * step:(i + 1) * step],
+                                                                audio.sample_rate)
+    return flags
+
+
+def source_vad_flags(audio, frame_ms=VAD_FRAME_MS):
+    """Flags do VAD do áudio inteiro, calculadas uma vez por fonte (memória + cache em disco)."""
+    # Sem audio.key (ex.: trechos de chunk_source) não há como saber se é o mesmo áudio
+    key = cache_key("speech", audio.key, vad_settings(frame_ms)) if audio.key else None
+    if key in _FLAGS:
+        return _FLAGS[key]
+
+    cache = get_cache() if key else None
+    cached = cache.get(key, ".npy") if cache else None
+    if cached:
+        try:
+            flags = np.load(cached)
+            _FLAGS[key] = flags
+            return flags
+        except Exception as e:
+            print(f"Aviso: Linha do tempo de fala inválida no cache ({e}). Calculando de novo.")
+
+    flags = vad_flags(audio, frame_ms)
+    if cache:
+        try:
+            data = io.BytesIO()
+            np.save(data, flags)
+            cache.put_bytes(key, data.getvalue(), ".npy")
+        except Exception as e:
+            print(f"Aviso: Não foi possível guardar a linha do tempo de fala no cache: {e}")
+    if key:
+        _FLAGS[key] = flags
+    return flags
+
+
+class SpeechTimeline:
+    """Fala por frame de vídeo, no relógio dos frames (frame i começa em i / fps).
+
+    speech[i] diz se o centro do frame i cai em um bloco com voz. A soma
+    acumulada permite obter a fração de fala de qualquer intervalo em O(1).
+    """
+
+    def __init__(self, fps, speech):
+        self.fps = fps or 30.0
+        self.speech = speech
+        self._cumsum = np.concatenate(([0], np.cumsum(speech, dtype=np.int64)))
+
+    def __len__(self):
+        return len(self.speech)
+
+    def frame_index(self, seconds):
+        return int(min(max(0, round(seconds * self.fps)), len(self.speech)))
+
+    def at(self, frame_index):
+        """Há voz no frame? Frames além do fim do áudio contam como silêncio."""
+        if 0 <= frame_index < len(self.speech):
+            return bool(self.speech[frame_index])
+        return False
+
+    def at_time(self, seconds):
+        return self.at(self.frame_index(seconds))
+
+    def frame_ratio(self, first, last):
+        """Fração dos frames [first, last) com voz."""
+        first = min(max(0, first), len(self.speech))
+        last = min(max(first, last), len(self.speech))
+        if last == first:
+            return 0.0
+        return float(self._cumsum[last] - self._cumsum[first]) / (last - first)
+
+    def ratio(self, start, end):
+        """Fração do intervalo [start, end) (em segundos) com voz."""
+        return self.frame_ratio(self.frame_index(start), self.frame_index(end))
+
+    def slice(self, start, end):
+        """Trecho [start, end) com o frame de start como frame 0."""
+        first = self.frame_index(start)
+        return SpeechTimeline(self.fps, self.speech[first:self.frame_index(end)])
+
+
+def resample_flags(flags, fps, n_frames, frame_ms=VAD_FRAME_MS, offset=0.0):
+    """Leva as flags do VAD para o relógio dos frames de vídeo (vetorizado)."""
+    centers = offset + (np.arange(n_frames, dtype=np.float64) + 0.5) / (fps or 30.0)
+    indices = (centers * 1000.0 / frame_ms).astype(np.int64)
+    speech = np.zeros(n_frames, dtype=bool)
+    valid = indices < len(flags)
+    speech[valid] = flags[indices[valid]]
+    return speech
+
+
+def build_speech_timeline(video_path, fps, n_frames=None, audio=None, start=0.0):
+    """Linha do tempo de fala dos n_frames frames do vídeo a partir de start (segundos).
+
+    audio é o AudioBuffer já decodificado do vídeo, se houver. Sem n_frames a
+    linha do tempo cobre todo o áudio. Sem áudio ela é só silêncio.
+    """
+    if audio is None:
+        audio = decode_audio(video_path)
+    if audio is None:
+        print("Aviso: Áudio indisponível. Continuando sem análise de fala.")
+        return SpeechTimeline(fps, np.zeros(n_frames or 0, dtype=bool))
+    if n_frames is None:
+        n_frames = int(np.ceil(max(0.0, audio.duration - start) * (fps or 30.0)))
+    flags = source_vad_flags(audio)
+    return SpeechTimeline(fps, resample_flags(flags, fps, n_frames, offset=start))
+
+
+def silence_split_points(flags, chunk_seconds, frame_ms=VAD_FRAME_MS, search_seconds=None):
+    """Pontos (em segundos) que dividem o áudio em trechos de ~chunk_seconds.
+
+    Perto de cada limite (até search_seconds, padrão chunk_seconds / 4, para
+    cada lado) o corte vai para o meio da pausa mais longa, para não partir
+    palavras; sem pausa na janela, corta no próprio limite.
+    """
+    per_chunk = max(1, int(chunk_seconds * 1000 / frame_ms))
+    search = int((search_seconds if search_seconds is not None else chunk_seconds / 4) * 1000 / frame_ms)
+    n = len(flags)
+
+    # Início e fim de cada sequência de blocos sem voz
+    silent = np.concatenate(([0], (~np.asarray(flags, dtype=bool)).astype(np.int8), [0]))
+    edges = np.flatnonzero(np.diff(silent))
+    starts, ends = edges[::2], edges[1::2]
+
+    points = []
+    position = 0
+    while n - position > per_chunk:
+        target = position + per_chunk
+        lo, hi = target - search, min(n, target + search)
+        overlap = (ends > lo) & (starts < hi)
+        cut = target
+        if overlap.any():
+            s = np.maximum(starts[overlap], lo)
+            e = np.minimum(ends[overlap], hi)
+            best = int(np.argmax(e - s))
+            cut = int(s[best] + e[best]) // 2
+        cut = max(cut, position + 1)
+        points.append(cut * frame_ms / 1000.0)
+        position = cut
+    return points
@@ -0,0 +1,238 @@
+import contextlib
+import itertools
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Grava um relatório de tempos por execução (SHORTS_TRACE=0 desativa)
+TRACE_ENABLED = os.getenv("SHORTS_TRACE", "1") != "0"
+
+# Pasta dos relatórios, no formato Chrome trace (abra em chrome://tracing ou ui.perfetto.dev)
+TRACE_DIR = os.path.join("cache", "traces")
+
+# Intervalo mínimo entre mensagens de progresso dos laços quentes (segundos)
+PROGRESS_INTERVAL = 5.0
+
+# Pasta da execução atual; os processos de trabalho a herdam e gravam nela os seus eventos
+_RUN_ENV = "SHORTS_TRACE_RUN"
+
+
+def peak_rss_mb(children=False):
+    """Pico de memória residente deste processo (ou dos filhos já encerrados), em MB."""
+    if resource is not None:
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+        # ru_maxrss é em KB no Linux e em bytes no macOS
+        return round(usage.ru_maxrss / (1024 ** 2 if sys.platform == "darwin" else 1024), 1)
+    if children:
+        return None
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return round(getattr(info, "peak_wset", info.rss) / 1024 ** 2, 1)
+    except Exception:
+        return None
+
+
+class ProgressLog:
+    """Limita as mensagens de progresso de um laço quente a uma a cada interval segundos."""
+
+    def __init__(self, interval=None):
+        self.interval = PROGRESS_INTERVAL if interval is None else interval
+        self.last = time.monotonic()
+
+    def due(self):
+        now = time.monotonic()
+        if now - self.last < self.interval:
+            return False
+        self.last = now
+        return True
+
+
+class Tracer:
+    """Spans e contadores de um processo, exportados como um Chrome trace.
+
+    Cada span vira um evento "X" (início e duração na thread que o abriu);
+    spans concorrentes no mesmo event loop (chamadas à API) viram pares "b"/"e"
+    em faixas próprias. Em processos de trabalho os eventos são gravados na
+    pasta da execução quando cada span de nível mais alto termina, e o
+    processo principal os junta em export().
+    """
+
+    def __init__(self, run_dir=None, owner=False):
+        self.pid = os.getpid()
+        self.run_dir = run_dir
+        self.owner = owner
+        self.started = time.time()
+        self.events = []
+        self.counters = {}
+        self._pending_counters = {}
+        self._threads = set()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._ids = itertools.count(1)
+
+    def _thread_event(self):
+        tid = threading.get_ident()
+        if tid not in self._threads:
+            self._threads.add(tid)
+            self.events.append({"ph": "M", "name": "thread_name", "pid": self.pid, "tid": tid,
+                                "args": {"name": threading.current_thread().name}})
+        return tid
+
+    @contextlib.contextmanager
+    def span(self, name, cat="stage", concurrent=False, **args):
+        """Mede o bloco; o dicionário devolvido aceita argumentos extras (ex.: frames)."""
+        if not TRACE_ENABLED:
+            yield args
+            return
+        depth = getattr(self._local, "depth", 0)
+        if not concurrent:
+            self._local.depth = depth + 1
+        start = time.time()
+        try:
+            yield args
+        finally:
+            end = time.time()
+            with self._lock:
+                tid = self._thread_event()
+                if concurrent:
+                    span_id = next(self._ids)
+                    base = {"name": name, "cat": cat, "pid": self.pid, "tid": tid, "id": span_id}
+                    self.events.append(dict(base, ph="b", ts=start * 1e6, args=args))
+                    self.events.append(dict(base, ph="e", ts=end * 1e6))
+                else:
+                    self.events.append({"ph": "X", "name": name, "cat": cat, "pid": self.pid, "tid": tid,
+                                        "ts": start * 1e6, "dur": (end - start) * 1e6, "args": args})
+            if not concurrent:
+                self._local.depth = depth
+                if depth == 0 and self.run_dir and not self.owner:
+                    self.flush()
+
+    def count(self, name, value=1):
+        if not TRACE_ENABLED:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+            self._pending_counters[name] = self._pending_counters.get(name, 0) + value
+            self.events.append({"ph": "C", "name": name, "pid": self.pid, "tid": 0,
+                                "ts": time.time() * 1e6, "args": {name: self.counters[name]}})
+
+    def flush(self):
+        """Grava os eventos pendentes na pasta da execução (processos de trabalho)."""
+        with self._lock:
+            events, self.events = self.events, []
+            counters, self._pending_counters = self._pending_counters, {}
+            self._threads.clear()
+        if not events and not counters:
+            return
+        try:
+            os.makedirs(self.run_dir, exist_ok=True)
+            with open(os.path.join(self.run_dir, f"{self.pid}.jsonl"), "a", encoding="utf-8") as f:
+                f.write(json.dumps({"events": events, "counters": counters,
+                                    "peak_rss_mb": peak_rss_mb()}) + "\n")
+        except OSError as e:
+            print(f"Aviso: Não foi possível gravar os eventos do trace: {e}")
+
+    def collect(self):
+        """Eventos, contadores e picos de memória deste processo e dos processos de trabalho."""
+        with self._lock:
+            events = list(self.events)
+            counters = dict(self.counters)
+        peaks = {"main": peak_rss_mb(), "children": peak_rss_mb(children=True)}
+        if self.run_dir and os.path.isdir(self.run_dir):
+            for name in sorted(os.listdir(self.run_dir)):
+                try:
+                    with open(os.path.join(self.run_dir, name), encoding="utf-8") as f:
+                        lines = f.read().splitlines()
+                except OSError:
+                    continue
+                for line in lines:
+                    try:
+                        part = json.loads(line)
+                    except ValueError:
+                        continue
+                    events.extend(part["events"])
+                    for counter, value in part["counters"].items():
+                        counters[counter] = counters.get(counter, 0) + value
+                    worker = f"worker {os.path.splitext(name)[0]}"
+                    peaks[worker] = max(peaks.get(worker) or 0, part.get("peak_rss_mb") or 0)
+        return events, counters, peaks
+
+    def export(self, path):
+        """Grava o Chrome trace da execução e devolve o resumo (stages, counters, peak_rss_mb)."""
+        events, counters, peaks = self.collect()
+        stages = {}
+        for event in events:
+            if event["ph"] == "X" and event.get("cat") == "stage":
+                stages[event["name"]] = round(stages.get(event["name"], 0) + event["dur"] / 1e6, 3)
+        summary = {"seconds": round(time.time() - self.started, 3), "stages": stages,
+                   "counters": counters, "peak_rss_mb": peaks}
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"traceEvents": events, "displayTimeUnit": "ms", "otherData": summary}, f)
+            if self.run_dir:
+                shutil.rmtree(self.run_dir, ignore_errors=True)
+        except OSError as e:
+            print(f"Aviso: Não foi possível gravar o trace {path}: {e}")
+        return summary
+
+
+_tracer = None
+
+
+def get_tracer():
+    """Tracer deste processo (um novo após um fork, ligado à execução herdada)."""
+    global _tracer
+    if _tracer is None or _tracer.pid != os.getpid():
+        _tracer = Tracer(os.getenv(_RUN_ENV))
+    return _tracer
+
+
+def span(name, cat="stage", concurrent=False, **args):
+    return get_tracer().span(name, cat, concurrent, **args)
+
+
+def count(name, value=1):
+    get_tracer().count(name, value)
+
+
+def start_run():
+    """Começa o trace de uma execução; processos criados depois gravam os eventos nela."""
+    global _tracer
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}_{os.getpid()}"
+    run_dir = os.path.abspath(os.path.join(TRACE_DIR, name + ".parts"))
+    os.environ[_RUN_ENV] = run_dir
+    _tracer = Tracer(run_dir, owner=True)
+    return os.path.join(TRACE_DIR, name + ".json")
+
+
+def finish_run(path):
+    """Exporta o trace iniciado por start_run e mostra um resumo."""
+    if not TRACE_ENABLED:
+        return None
+    summary = get_tracer().export(path)
+    print_trace_summary(summary)
+    print(f"Trace da execução gravado em: {path}")
+    return summary
+
+
+def print_trace_summary(summary):
+    if summary["stages"]:
+        print("Tempo por estágio: " + ", ".join(f"{name} {seconds:.1f}s"
+                                                for name, seconds in summary["stages"].items()))
+    counters = summary["counters"]
+    if counters:
+        print("Contadores: " + ", ".join(f"{name} {value:,.0f}" if value >= 100 else f"{name} {value:g}"
+                                         for name, value in sorted(counters.items())))
+    peaks = {name: mb for name, mb in summary["peak_rss_mb"].items() if mb}
+    if peaks:
+        print("Pico de memória: " + ", ".join(f"{name} {mb:.0f} MB" for name, mb in peaks.items()))
@@ -0,0 +1,147 @@
+import re
+import numpy as np
+
+# tiktoken é opcional: sem ele os tokens são estimados (~4 caracteres por token)
+try:
+    import tiktoken
+    try:
+        _encoding = tiktoken.get_encoding("o200k_base")
+    except Exception:
+        _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _encoding = None
+
+# Orçamento de tokens da transcrição enviada ao LLM
+PROMPT_TOKEN_BUDGET = 60000
+
+# Segmentos vizinhos são unidos até o bloco ter pelo menos esta duração (segundos);
+# se a transcrição não couber no orçamento, o valor é dobrado até MAX_BLOCK_SECONDS
+MIN_BLOCK_SECONDS = 5
+MAX_BLOCK_SECONDS = 120
+
+# Pausas maiores que isto (segundos) não são unidas em um bloco
+MAX_MERGE_GAP = 2.0
+
+# Hesitações removidas do texto (palavras isoladas, sem diferenciar maiúsculas). Só entram
+# sons que não são palavras: "um", "eh", "hum", "ah" têm sentido em português e ficam
+FILLER_WORDS = ("uh", "uhm", "umm", "erm", "hmm", "mm", "hã", "ahn")
+FILLER_PATTERN = re.compile(r"(?<!\w)(?:%s)(?!\w)[,.]?" % "|".join(map(re.escape, FILLER_WORDS)),
+                            re.IGNORECASE)
+
+
+def count_tokens(text):
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+def format_transcript(transcriptions):
+    """Formato original, sem compactação (usado para comparar o tamanho)."""
+    return "".join(f"{start} - {end}: {text}\n" for text, start, end in transcriptions)
+
+
+def strip_filler(text):
+    return " ".join(FILLER_PATTERN.sub("", text).split())
+
+
+def merge_segments(transcriptions, min_seconds, max_gap=MAX_MERGE_GAP, max_seconds=MAX_BLOCK_SECONDS):
+    """Une segmentos vizinhos curtos em blocos [(início, fim, texto)] com os tempos exatos.
+
+    Uma união nunca gera bloco maior que max_seconds (o LLM precisa escolher
+    início e fim dentro de um destaque de até 60 s).
+    """
+    blocks = []
+    for text, start, end in transcriptions:
+        text = strip_filler(text)
+        if not text:
+            continue
+        if blocks:
+            block_start, block_end, block_text = blocks[-1]
+            if (block_end - block_start < min_seconds and start - block_end <= max_gap
+                    and end - block_start <= max_seconds):
+                blocks[-1] = (block_start, end, f"{block_text} {text}")
+                continue
+        blocks.append((start, end, text))
+    return blocks
+
+
+class CompactTranscript:
+    """Transcrição compactada para o prompt, com o caminho de volta aos tempos exatos.
+
+    text tem uma linha "início - fim: texto" por bloco, com tempos em segundos
+    inteiros; starts/ends guardam os tempos exatos dos mesmos blocos.
+    """
+
+    def __init__(self, blocks, tokens_before):
+        self.starts = np.array([b[0] for b in blocks], dtype=np.float64)
+        self.ends = np.array([b[1] for b in blocks], dtype=np.float64)
+        self.text = "".join(f"{int(start)} - {int(np.ceil(end))}: {text}\n" for start, end, text in blocks)
+        self.tokens_before = tokens_before
+        self.tokens = count_tokens(self.text)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def to_source_times(self, start, end):
+        """Leva tempos lidos do prompt às bordas exatas dos blocos.
+
+        Um tempo a menos de 1 s (o erro do arredondamento) de uma borda vira o
+        tempo exato dela; os demais ficam como estão.
+        """
+        exact_start, exact_end = float(start), float(end)
+        if len(self):
+            nearest = int(np.argmin(np.abs(self.starts - start)))
+            if abs(self.starts[nearest] - start) <= 1.0:
+                exact_start = float(self.starts[nearest])
+            nearest = int(np.argmin(np.abs(self.ends - end)))
+            if abs(self.ends[nearest] - end) <= 1.0:
+                exact_end = float(self.ends[nearest])
+        if exact_end <= exact_start:
+            return float(start), float(end)
+        # Mantém o limite de 60 segundos dos shorts
+        return exact_start, min(exact_end, exact_start + 60)
+
+    def map_highlights(self, highlights):
+        return [self.to_source_times(start, end) + (content,) for start, end, content in highlights]
+
+    def report(self):
+        saved = 1 - self.tokens / self.tokens_before if self.tokens_before else 0.0
+        method = "tiktoken" if _encoding is not None else "estimativa"
+        print(f"Transcrição compactada: {self.tokens_before} -> {self.tokens} tokens "
+              f"({saved:.0%} a menos, {method}), {len(self)} blocos")
+
+
+def shorten_blocks(blocks, ratio):
+    """Mantém só a fração ratio das palavras de cada bloco (o início de cada fala)."""
+    shortened = []
+    for start, end, text in blocks:
+        words = text.split()
+        keep = max(8, int(len(words) * ratio))
+        shortened.append((start, end, " ".join(words[:keep]) + (" ..." if keep < len(words) else "")))
+    return shortened
+
+
+def compact_transcript(transcriptions, token_budget=None):
+    """Monta a transcrição do prompt dentro de token_budget (padrão PROMPT_TOKEN_BUDGET).
+
+    Remove hesitações, une segmentos curtos e arredonda os tempos; se ainda
+    não couber, une blocos cada vez maiores e, por fim, encurta o texto dos blocos.
+    """
+    token_budget = token_budget or PROMPT_TOKEN_BUDGET
+    tokens_before = count_tokens(format_transcript(transcriptions))
+    min_seconds = MIN_BLOCK_SECONDS
+    while True:
+        blocks = merge_segments(transcriptions, min_seconds)
+        compact = CompactTranscript(blocks, tokens_before)
+        if compact.tokens <= token_budget or min_seconds >= MAX_BLOCK_SECONDS:
+            break
+        min_seconds = min(min_seconds * 2, MAX_BLOCK_SECONDS)
+    ratio = 1.0
+    while compact.tokens > token_budget and ratio > 0.05:
+        ratio *= 0.9 * token_budget / compact.tokens
+        compact = CompactTranscript(shorten_blocks(blocks, ratio), tokens_before)
+    if compact.tokens > token_budget:
+        print(f"Aviso: A transcrição compactada ({compact.tokens} tokens) ainda passa do orçamento "
+              f"de {token_budget} tokens.")
+    compact.report()
+    return compact
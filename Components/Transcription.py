@@ -1,9 +1,20 @@
 from faster_whisper import WhisperModel
+from faster_whisper import decode_audio as whisper_decode_audio
 import torch
 import os
 import sys
-import openai
+from Components.OpenAIClient import get_openai_client
 from dotenv import load_dotenv
+from Components.Cache import cache_key, get_cache
+from Components.Fingerprint import file_fingerprint
+from Components.AudioBuffer import AudioBuffer, decode_audio
+from Components.Media import find_ffmpeg
+from Components.SpeechTimeline import silence_split_points, source_vad_flags
+from Components.Tracing import count as trace_count, span
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import json
+import subprocess
+import numpy as np
 
 # Carregar variáveis de ambiente
 load_dotenv()
@@ -15,165 +26,477 @@ api_key = os.getenv("OPENAI_API")
 # "local" para faster-whisper local ou "api" para OpenAI API
 TRANSCRIPTION_METHOD = "api"  # Mude para "api"
 
-def transcribeAudio(audio_path):
+# Modelos usados por cada método (entram na chave do cache de transcrições)
+API_MODEL = "whisper-1"
+
+# Limite de tamanho de arquivo da API (25 MB), com folga
+API_MAX_UPLOAD_BYTES = 24 * 1024 * 1024
+
+# Formato compacto usado no envio: a fala em 16 kHz mono cabe bem em 32 kbps
+API_AUDIO_FORMAT = "ogg"
+API_AUDIO_BITRATE = "32k"
+API_AUDIO_CODECS = {
+    "ogg": ["-c:a", "libopus", "-application", "voip"],
+    "mp3": ["-c:a", "libmp3lame"],
+}
+
+# Duração máxima de cada trecho enviado e quantos trechos são enviados ao mesmo tempo
+API_CHUNK_SECONDS = 600
+API_CONCURRENCY = 4
+LOCAL_MODEL_SIZE = "tiny.en"
+
+# Tipo de cálculo do modelo local ("int8", "int8_float16", "float16", "float32");
+# None escolhe int8 em CPU e float16 em GPU
+LOCAL_COMPUTE_TYPE = None
+
+# Processos usados na transcrição local em CPU (1 desativa a divisão em trechos)
+TRANSCRIBE_WORKERS = max(1, (os.cpu_count() or 1) // 4)
+
+# Duração aproximada de cada trecho enviado a um processo (segundos)
+CHUNK_SECONDS = 120
+
+# Logs JSONL das transcrições em andamento (permitem retomar após uma queda)
+TRANSCRIPT_LOG_DIR = os.path.join("cache", "transcripts")
+
+# Modelos já carregados neste processo e pool de processos de transcrição
+_WHISPER_MODELS = {}
+_TRANSCRIBE_POOL = None
+
+def audio_fingerprint(audio):
+    """Identidade do conteúdo do áudio (AudioBuffer ou caminho de arquivo)."""
+    if isinstance(audio, AudioBuffer):
+        return audio.key
+    return file_fingerprint(audio)
+
+def transcript_key(audio_path, method=None):
+    """Chave da transcrição: conteúdo do áudio + método e modelo usados."""
+    method = method or TRANSCRIPTION_METHOD
+    return cache_key("transcript", audio_fingerprint(audio_path), method,
+                     API_MODEL if method == "api" else LOCAL_MODEL_SIZE,
+                     None if method == "api" else local_compute_type(local_device()))
+
+def fallback_marker(start):
+    """Linha do log que marca a passagem da API para a transcrição local em start (segundos)."""
+    return json.dumps({"fallback": start}) + "\n"
+
+def read_transcript_log(log_path):
+    """Segmentos já gravados no log e o início da transcrição local (ou None).
+
+    Uma última linha incompleta (queda no meio da escrita) é ignorada.
+    """
+    segments = []
+    fallback_start = None
+    if not os.path.exists(log_path):
+        return segments, fallback_start
+    with open(log_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+                if isinstance(entry, dict):
+                    fallback_start = float(entry["fallback"])
+                    continue
+                text, start, end = entry
+            except (ValueError, KeyError, TypeError):
+                break
+            segments.append([text, start, end])
+    return segments, fallback_start
+
+def write_transcript_log(log_path, segments, fallback_start=None):
+    tmp_path = f"{log_path}.tmp{os.getpid()}"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        if fallback_start is not None:
+            f.write(fallback_marker(fallback_start))
+        for segment in segments:
+            f.write(json.dumps(segment, ensure_ascii=False) + "\n")
+    os.replace(tmp_path, log_path)
+
+def iter_transcription(audio_path, log_dir=None, info=None):
+    """Gera os segmentos [texto, início, fim] à medida que são transcritos.
+
+    Cada segmento é acrescentado a um log JSONL em TRANSCRIPT_LOG_DIR (chaveado
+    pelo conteúdo do áudio e pela configuração) assim que chega. Se uma
+    execução anterior parou no meio, os segmentos do log são devolvidos primeiro
+    e a transcrição continua do fim do último. Terminada, a transcrição vai
+    para o cache de artefatos e o log é apagado. Se a API falhou e a
+    transcrição foi feita localmente, ela é guardada sob a chave da
+    transcrição local (ou não é guardada, se misturar API e local), para que
+    as próximas execuções tentem a API de novo. A passagem para o modelo
+    local fica marcada no log, e uma transcrição retomada depois dela
+    continua localmente. info (um dicionário), se dado, recebe em "method"
+    quem de fato transcreveu: "api", "local" ou "mixed".
+    """
+    info = {} if info is None else info
+    key = transcript_key(audio_path)
+
+    # Mesmo áudio já transcrito com a mesma configuração? Usa o cache
+    cache = get_cache()
+    if cache:
+        cached = cache.get_json(key)
+        if cached:
+            print(f"Transcrição encontrada no cache ({len(cached)} segmentos)")
+            info["method"] = TRANSCRIPTION_METHOD
+            for segment in cached:
+                yield list(segment)
+            return
+
+    log_dir = log_dir or TRANSCRIPT_LOG_DIR
+    os.makedirs(log_dir, exist_ok=True)
+    log_path = os.path.join(log_dir, key + ".jsonl")
+    segments, fallback_start = read_transcript_log(log_path)
+    resume_at = segments[-1][2] if segments else 0.0
+    if segments:
+        print(f"Retomando a transcrição em {resume_at:.1f}s ({len(segments)} segmentos já no log)")
+    # Regrava só as linhas válidas antes de voltar a acrescentar
+    write_transcript_log(log_path, segments, fallback_start)
+    for segment in list(segments):
+        yield segment
+
+    print("Iniciando transcrição do áudio...")
+    print("Este processo pode levar alguns minutos dependendo do tamanho do arquivo.")
+
+    # Método 1: Usar a API OpenAI Whisper (mais precisa, requer conexão com internet)
+    fallback = {} if fallback_start is None else {"start": fallback_start}
+    if TRANSCRIPTION_METHOD == "api" and fallback:
+        # A execução anterior já tinha passado para o modelo local
+        print("Continuando a transcrição local iniciada na execução anterior...")
+        source = iter_local_transcription(audio_path, resume_at)
+    elif TRANSCRIPTION_METHOD == "api":
+        source = iter_api_with_fallback(audio_path, resume_at, fallback)
+
+    # Método 2: Usar faster-whisper localmente (sem requisito de internet)
+    else:
+        source = iter_local_transcription(audio_path, resume_at)
+
+    marked = bool(fallback)
+    with open(log_path, "a", encoding="utf-8") as log:
+        for segment in source:
+            if fallback and not marked:
+                log.write(fallback_marker(fallback["start"]))
+                marked = True
+            log.write(json.dumps(segment, ensure_ascii=False) + "\n")
+            log.flush()
+            segments.append(segment)
+            yield segment
+
+    if "start" not in fallback:
+        info["method"] = TRANSCRIPTION_METHOD
+    else:
+        info["method"] = "local" if fallback["start"] == 0.0 else "mixed"
+    if cache and segments:
+        try:
+            if "start" not in fallback:
+                cache.put_json(key, segments)
+            elif fallback["start"] == 0.0:
+                # Tudo foi transcrito localmente: vale como transcrição local
+                cache.put_json(transcript_key(audio_path, "local"), segments)
+            else:
+                print("Aviso: Transcrição mistura API e modelo local; não foi guardada no cache.")
+        except Exception as e:
+            print(f"Aviso: Não foi possível guardar a transcrição no cache: {e}")
+    # Transcrição concluída: o log não serve mais (com ou sem cache)
+    try:
+        os.remove(log_path)
+    except OSError:
+        pass
+
+def transcribeAudio(audio_path, info=None):
+    """Transcreve o áudio, dado como caminho de arquivo ou AudioBuffer (16 kHz mono).
+
+    Versão que devolve a lista completa de iter_transcription (info, se dado,
+    recebe o método usado, como lá).
+    """
     try:
-        if not os.path.exists(audio_path):
+        if not isinstance(audio_path, AudioBuffer) and not os.path.exists(audio_path):
             print(f"Erro: O arquivo de áudio {audio_path} não existe.")
             return []
-            
-        print("Iniciando transcrição do áudio...")
-        print("Este processo pode levar alguns minutos dependendo do tamanho do arquivo.")
-        
-        # Método 1: Usar a API OpenAI Whisper (mais precisa, requer conexão com internet)
-        if TRANSCRIPTION_METHOD == "api":
-            return transcribe_with_openai_api(audio_path)
-        
-        # Método 2: Usar faster-whisper localmente (sem requisito de internet)
-        else:
-            return transcribe_locally(audio_path)
+
+        transcriptions = []
+        for segment in iter_transcription(audio_path, info=info):
+            transcriptions.append(segment)
+            if len(transcriptions) % 50 == 0:
+                print(f"{len(transcriptions)} segmentos transcritos (até {segment[2]:.0f}s)")
+        return transcriptions
             
     except Exception as e:
         print(f"Erro de transcrição: {e}")
         return []
 
-def transcribe_with_openai_api(audio_path):
-    """Transcreve áudio usando a API OpenAI Whisper"""
+def encode_for_upload(audio, start, end):
+    """Codifica o trecho [start, end) do AudioBuffer no formato compacto de envio (bytes)."""
+    ffmpeg_path = find_ffmpeg()
+    if not ffmpeg_path:
+        raise RuntimeError("FFmpeg não encontrado")
+    cmd = [ffmpeg_path, "-v", "error", "-f", "s16le", "-ar", str(audio.sample_rate), "-ac", "1",
+           "-i", "pipe:0", "-vn", *API_AUDIO_CODECS[API_AUDIO_FORMAT],
+           "-b:a", API_AUDIO_BITRATE, "-f", API_AUDIO_FORMAT, "pipe:1"]
+    result = subprocess.run(cmd, input=audio.pcm_bytes(start, end), check=True,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    return result.stdout
+
+def api_chunk_seconds():
+    """Duração máxima de um trecho para que o arquivo codificado fique abaixo do limite da API."""
+    bits_per_second = float(API_AUDIO_BITRATE.rstrip("k")) * 1000
+    # Margem de 20% para o contêiner e a variação do codificador
+    return min(API_CHUNK_SECONDS, API_MAX_UPLOAD_BYTES * 8 / bits_per_second * 0.8)
+
+def response_segments(response, offset, end):
+    """Segmentos [texto, início, fim] de uma resposta verbose_json, deslocados em offset."""
+    segments = getattr(response, "segments", None) or []
+    extracted_texts = []
+    for segment in segments:
+        # Conforme a versão do SDK os segmentos chegam como objetos ou dicionários
+        if isinstance(segment, dict):
+            text, start, stop = segment["text"], segment["start"], segment["end"]
+        else:
+            text, start, stop = segment.text, segment.start, segment.end
+        extracted_texts.append([text, start + offset, stop + offset])
+    if not extracted_texts and response.text.strip():
+        # Sem segmentos, o texto inteiro ocupa o trecho enviado
+        extracted_texts.append([response.text, offset, end])
+    return extracted_texts
+
+def transcribe_chunk_api(client, audio, start, end):
+    """Codifica e envia um trecho à API; trechos acima do limite são divididos ao meio."""
+    with span("encode_upload", cat="encode", start=start, end=end):
+        data = encode_for_upload(audio, start, end)
+    if len(data) > API_MAX_UPLOAD_BYTES and end - start > 1.0:
+        middle = (start + end) / 2
+        return (transcribe_chunk_api(client, audio, start, middle)
+                + transcribe_chunk_api(client, audio, middle, end))
+    response = client.transcribe_sync(API_MODEL, (f"chunk_{start:.0f}.{API_AUDIO_FORMAT}", data),
+                                      response_format="verbose_json")
+    return response_segments(response, start, end)
+
+def iter_api_transcription(audio_path, start=0.0):
+    """Gera os segmentos transcritos pela API a partir de start (segundos).
+
+    O áudio (16 kHz mono) é dividido nas pausas da fala em trechos que,
+    codificados em API_AUDIO_FORMAT, ficam abaixo do limite de envio. Até
+    API_CONCURRENCY trechos são enviados ao mesmo tempo e os segmentos saem
+    em ordem, com os tempos globais.
+    """
+    audio = audio_path if isinstance(audio_path, AudioBuffer) else decode_audio(audio_path)
+    if audio is None:
+        raise RuntimeError(f"não foi possível decodificar {audio_path}")
+
+    client = get_openai_client()
+    chunks = audio_chunks(audio, api_chunk_seconds(), start)
+    print(f"Enviando {len(chunks)} trecho(s) de áudio para a API OpenAI Whisper "
+          f"({API_CONCURRENCY} por vez)...")
+    with ThreadPoolExecutor(max_workers=API_CONCURRENCY) as executor:
+        futures = [executor.submit(transcribe_chunk_api, client, audio, chunk_start, chunk_end)
+                   for chunk_start, chunk_end in chunks]
+        try:
+            for index, future in enumerate(futures):
+                yield from future.result()
+                print(f"Trecho {index + 1}/{len(chunks)} transcrito pela API")
+        finally:
+            for future in futures:
+                future.cancel()
+
+def iter_api_with_fallback(audio_path, start=0.0, fallback=None):
+    """iter_api_transcription; se a API falhar, continua localmente do último segmento recebido.
+
+    fallback (um dicionário) recebe em "start" o instante a partir do qual a
+    transcrição passou a ser local.
+    """
+    fallback = {} if fallback is None else fallback
+    if not api_key:
+        print("Erro: Chave da API OpenAI não encontrada no arquivo .env")
+        print("Alternando para transcrição local...")
+        fallback["start"] = start
+        yield from iter_local_transcription(audio_path, start)
+        return
+
+    resume_at = start
     try:
         print("Usando API OpenAI Whisper para transcrição...")
-        
-        # Verificar se a chave API está configurada
-        if not api_key:
-            print("Erro: Chave da API OpenAI não encontrada no arquivo .env")
-            print("Alternando para transcrição local...")
-            return transcribe_locally(audio_path)
-        
-        # Configurar cliente OpenAI com a nova sintaxe
-        client = openai.OpenAI(api_key=api_key)
-        
-        # Abrir o arquivo de áudio
-        with open(audio_path, "rb") as audio_file:
-            # Chamar a API
-            print("Enviando áudio para a API OpenAI Whisper...")
-            try:
-                response = client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio_file,
-                    response_format="verbose_json"
-                )
-                
-                print("Transcrição recebida da API!")
-                
-                # Processar resposta
-                if hasattr(response, 'segments'):
-                    segments = response.segments
-                    extracted_texts = [[segment.text, segment.start, segment.end] for segment in segments]
-                else:
-                    # Extrair apenas o texto completo se não houver segmentos
-                    text = response.text
-                    print(f"Texto recebido: {text[:50]}...")
-                    # Criar segmentos artificiais de 10 segundos para o texto completo
-                    words = text.split()
-                    segment_length = 20  # palavras por segmento
-                    segments = []
-                    
-                    for i in range(0, len(words), segment_length):
-                        segment_text = " ".join(words[i:i+segment_length])
-                        start_time = i/segment_length * 10  # 10 segundos por segmento
-                        end_time = start_time + 10
-                        segments.append([segment_text, start_time, end_time])
-                    
-                    extracted_texts = segments
-                
-                print(f"Transcrição via API concluída: {len(extracted_texts)} segmentos")
-                return extracted_texts
-                
-            except Exception as e:
-                print(f"Erro específico na API Whisper: {e}")
-                print("Tentando método alternativo...")
-                # Tentar com formato diferente
-                response = client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio_file
-                )
-                
-                # Resposta simples sem segmentos
-                text = response.text
-                print(f"Texto recebido (formato simples): {text[:50]}...")
-                # Criar segmentos artificiais
-                words = text.split()
-                segments = []
-                
-                chunk_size = len(words) // 5  # Dividir em 5 partes aproximadamente
-                if chunk_size < 5:
-                    chunk_size = 5
-                
-                for i in range(0, len(words), chunk_size):
-                    segment_text = " ".join(words[i:i+chunk_size])
-                    start_time = i/len(words) * 60  # Estimar 60 segundos para o áudio completo
-                    end_time = (i+chunk_size)/len(words) * 60
-                    segments.append([segment_text, start_time, end_time])
-                
-                print(f"Transcrição processada: {len(segments)} segmentos")
-                return segments
-        
+        for segment in iter_api_transcription(audio_path, start):
+            resume_at = segment[2]
+            yield segment
     except Exception as e:
         print(f"Erro na transcrição via API: {e}")
         print("Alternando para transcrição local...")
-        return transcribe_locally(audio_path)
+        fallback["start"] = resume_at
+        yield from iter_local_transcription(audio_path, resume_at)
 
-def transcribe_locally(audio_path):
-    """Transcreve áudio localmente usando faster-whisper"""
+def transcribe_with_openai_api(audio_path):
+    """Transcreve áudio usando a API OpenAI Whisper (lista completa)."""
     try:
-        # Verificar se CUDA está disponível
-        Device = "cuda" if torch.cuda.is_available() else "cpu"
-        print(f"Usando dispositivo: {Device}")
-        
-        # Carregar modelo
-        try:
-            # Você pode alterar o tamanho do modelo conforme necessário:
-            # - "tiny.en" (mais rápido, menos preciso)
-            # - "base.en" (equilíbrio entre velocidade e precisão)
-            # - "small.en" (mais preciso, mais lento)
-            model_size = "tiny.en"  # Modelo mais leve e rápido para CPUs
-            print(f"Carregando modelo {model_size}...")
-            model = WhisperModel(model_size, device=Device)
-            print(f"Modelo '{model_size}' carregado com sucesso")
-        except Exception as e:
-            print(f"Erro ao carregar o modelo: {e}")
-            print("Tentando usar o modelo 'tiny' como alternativa...")
-            try:
-                model = WhisperModel("tiny", device="cpu")
-                print("Modelo 'tiny' carregado com sucesso")
-            except Exception as e2:
-                print(f"Erro ao carregar modelo alternativo: {e2}")
-                return []
-        
-        # Realizar transcrição
+        extracted_texts = list(iter_api_with_fallback(audio_path))
+        print(f"Transcrição via API concluída: {len(extracted_texts)} segmentos")
+        return extracted_texts
+    except Exception as e:
+        print(f"Erro na transcrição: {e}")
+        return []
+
+def local_device():
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+def local_compute_type(device):
+    """Tipo de cálculo do faster-whisper: LOCAL_COMPUTE_TYPE ou o mais rápido do dispositivo."""
+    if LOCAL_COMPUTE_TYPE:
+        return LOCAL_COMPUTE_TYPE
+    return "float16" if device == "cuda" else "int8"
+
+def load_whisper_model(model_size=None, device=None, compute_type=None, cpu_threads=0):
+    """Carrega o modelo uma vez por processo e o mantém em memória para as próximas chamadas."""
+    model_size = model_size or LOCAL_MODEL_SIZE
+    device = device or local_device()
+    compute_type = compute_type or local_compute_type(device)
+    key = (model_size, device, compute_type, cpu_threads)
+    if key in _WHISPER_MODELS:
+        return _WHISPER_MODELS[key]
+
+    # Você pode alterar o tamanho do modelo conforme necessário:
+    # - "tiny.en" (mais rápido, menos preciso)
+    # - "base.en" (equilíbrio entre velocidade e precisão)
+    # - "small.en" (mais preciso, mais lento)
+    try:
+        print(f"Carregando modelo {model_size} ({device}, {compute_type})...")
+        model = WhisperModel(model_size, device=device, compute_type=compute_type,
+                             cpu_threads=cpu_threads)
+        print(f"Modelo '{model_size}' carregado com sucesso")
+    except Exception as e:
+        print(f"Erro ao carregar o modelo: {e}")
+        print("Tentando usar o modelo 'tiny' como alternativa...")
         try:
-            print("Processando áudio... (Isto pode levar algum tempo)")
-            segments, info = model.transcribe(
-                audio=audio_path, 
-                beam_size=5, 
-                language="en", 
-                max_new_tokens=128, 
-                condition_on_previous_text=False
-            )
-            segments = list(segments)
-            
-            if not segments:
-                print("Aviso: Nenhum segmento transcrito foi encontrado.")
-                return []
-                
-            print(f"Transcrição concluída. {len(segments)} segmentos encontrados.")
-            
-            # Extrair informações dos segmentos
-            extracted_texts = [[segment.text, segment.start, segment.end] for segment in segments]
-            return extracted_texts
-            
-        except Exception as e:
-            print(f"Erro durante a transcrição: {e}")
+            model = WhisperModel("tiny", device="cpu", compute_type="int8", cpu_threads=cpu_threads)
+            print("Modelo 'tiny' carregado com sucesso")
+        except Exception as e2:
+            print(f"Erro ao carregar modelo alternativo: {e2}")
+            return None
+    _WHISPER_MODELS[key] = model
+    return model
+
+def iter_segments(model, samples, offset=0.0):
+    """Gera os segmentos de amostras float32 à medida que o modelo os decodifica.
+
+    Os tempos são deslocados em offset segundos.
+    """
+    segments, info = model.transcribe(
+        audio=samples, 
+        beam_size=5, 
+        language="en", 
+        max_new_tokens=128, 
+        condition_on_previous_text=False
+    )
+    for segment in segments:
+        yield [segment.text, segment.start + offset, segment.end + offset]
+
+def transcribe_samples(model, samples, offset=0.0):
+    return list(iter_segments(model, samples, offset))
+
+def _init_transcribe_worker(model_size, compute_type, cpu_threads):
+    """Inicializador dos processos do pool: carrega o modelo uma única vez."""
+    load_whisper_model(model_size, "cpu", compute_type, cpu_threads)
+
+def _transcribe_chunk(audio, start, end, offset, model_size, compute_type, cpu_threads):
+    model = load_whisper_model(model_size, "cpu", compute_type, cpu_threads)
+    if model is None:
+        raise RuntimeError("modelo Whisper indisponível")
+    samples = audio.as_float32(start, end)
+    seconds = len(samples) / audio.sample_rate
+    with span("transcribe_chunk", cat="transcribe", start=offset, seconds=seconds):
+        segments = transcribe_samples(model, samples, offset)
+    trace_count("audio_seconds_transcribed", seconds)
+    return segments
+
+def get_transcribe_pool(workers, model_size, compute_type, cpu_threads):
+    """Pool de processos com o modelo já carregado, reaproveitado entre transcrições."""
+    global _TRANSCRIBE_POOL
+    config = (workers, model_size, compute_type, cpu_threads)
+    if _TRANSCRIBE_POOL is not None and _TRANSCRIBE_POOL[0] == config:
+        return _TRANSCRIBE_POOL[1]
+    shutdown_transcribe_pool()
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_transcribe_worker,
+                               initargs=(model_size, compute_type, cpu_threads))
+    _TRANSCRIBE_POOL = (config, pool)
+    return pool
+
+def shutdown_transcribe_pool():
+    global _TRANSCRIBE_POOL
+    if _TRANSCRIBE_POOL is not None:
+        _TRANSCRIBE_POOL[1].shutdown()
+        _TRANSCRIBE_POOL = None
+
+def audio_chunks(audio, chunk_seconds=None, start=0.0):
+    """Divide o AudioBuffer a partir de start em trechos [(início, fim)] cortados em pausas da fala."""
+    chunk_seconds = chunk_seconds or CHUNK_SECONDS
+    if audio.duration - start <= chunk_seconds:
+        return [(start, audio.duration)]
+    points = silence_split_points(source_vad_flags(audio), chunk_seconds)
+    bounds = [start] + [p for p in points if p > start] + [audio.duration]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def chunk_source(audio, start, end):
+    """O que vai para o processo: a referência ao .pcm em disco ou só as amostras do trecho."""
+    if audio.path is not None:
+        return audio, start, end
+    return AudioBuffer(np.array(audio.slice(start, end)), audio.sample_rate), None, None
+
+def iter_parallel_transcription(audio, workers, model_size, compute_type, start=0.0):
+    """Transcreve os trechos do áudio em paralelo e gera os segmentos, em ordem, com os tempos globais."""
+    chunks = audio_chunks(audio, start=start)
+    workers = min(workers, len(chunks))
+    cpu_threads = max(1, (os.cpu_count() or 1) // workers)
+    print(f"Transcrevendo {len(chunks)} trechos em {workers} processos ({cpu_threads} threads cada)...")
+    pool = get_transcribe_pool(workers, model_size, compute_type, cpu_threads)
+    futures = [pool.submit(_transcribe_chunk, *chunk_source(audio, chunk_start, chunk_end), chunk_start,
+                           model_size, compute_type, cpu_threads)
+               for chunk_start, chunk_end in chunks]
+
+    try:
+        for index, future in enumerate(futures):
+            yield from future.result()
+            print(f"Trecho {index + 1}/{len(chunks)} transcrito")
+    finally:
+        # Consumidor parou antes do fim: não deixa trechos pendentes ocupando o pool
+        for future in futures:
+            future.cancel()
+
+def iter_local_transcription(audio_path, start=0.0):
+    """Gera os segmentos transcritos localmente a partir de start (segundos).
+
+    Em CPU, um AudioBuffer mais longo que CHUNK_SECONDS é dividido nas pausas
+    da fala e os trechos são transcritos em paralelo (TRANSCRIBE_WORKERS
+    processos, cada um com o modelo carregado uma vez).
+    """
+    # Verificar se CUDA está disponível
+    Device = local_device()
+    compute_type = local_compute_type(Device)
+    print(f"Usando dispositivo: {Device}")
+
+    print("Processando áudio... (Isto pode levar algum tempo)")
+    if isinstance(audio_path, AudioBuffer):
+        if (Device == "cpu" and TRANSCRIBE_WORKERS > 1
+                and audio_path.duration - start > CHUNK_SECONDS):
+            yield from iter_parallel_transcription(audio_path, TRANSCRIBE_WORKERS,
+                                                   LOCAL_MODEL_SIZE, compute_type, start)
+            return
+        # O AudioBuffer vai direto como amostras, sem arquivo intermediário
+        audio_input = audio_path.as_float32(start)
+    elif start > 0:
+        audio_input = whisper_decode_audio(audio_path)[int(start * 16000):]
+    else:
+        audio_input = audio_path
+
+    model = load_whisper_model(LOCAL_MODEL_SIZE, Device, compute_type)
+    if model is None:
+        raise RuntimeError("modelo Whisper indisponível")
+    yield from iter_segments(model, audio_input, start)
+
+def transcribe_locally(audio_path):
+    """Transcreve áudio localmente usando faster-whisper (lista completa)."""
+    try:
+        extracted_texts = list(iter_local_transcription(audio_path))
+        if not extracted_texts:
+            print("Aviso: Nenhum segmento transcrito foi encontrado.")
             return []
             
+        print(f"Transcrição concluída. {len(extracted_texts)} segmentos encontrados.")
+        return extracted_texts
+            
     except Exception as e:
         print(f"Erro na transcrição local: {e}")
         return []
@@ -193,9 +516,7 @@ if __name__ == "__main__":
         
     print(f"Transcrição concluída. {len(transcriptions)} segmentos encontrados.")
     
-    TransText = ""
-    for text, start, end in transcriptions:
-        TransText += (f"{start:.2f} - {end:.2f}: {text}\n")
+    TransText = "".join(f"{start:.2f} - {end:.2f}: {text}\n" for text, start, end in transcriptions)
         
     print("\nResultado da transcrição:")
     print("-" * 40)
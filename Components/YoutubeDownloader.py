@@ -3,14 +3,230 @@ from pytubefix import YouTube
 import subprocess
 import sys
 import shutil
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from Components.Cache import cache_key, get_cache
+from Components.Tracing import count as trace_count, span
+
+# Como o stream de vídeo é escolhido:
+# - "smallest": o menor stream (em bytes) que ainda atinge TARGET_HEIGHT
+# - "largest": o maior stream disponível
+# - "interactive": lista os streams e pergunta ao usuário
+STREAM_POLICY = "smallest"
+
+# Altura mínima do vídeo baixado. O short sai em 9:16 na altura da fonte,
+# então qualquer resolução acima disso é desperdício de banda
+TARGET_HEIGHT = 1080
+
+# Tamanho dos blocos lidos da rede e tempo limite de cada requisição
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_TIMEOUT = 30
+
+# Streams a partir deste tamanho são baixados em várias faixas HTTP Range ao mesmo tempo
+PARALLEL_DOWNLOAD_MIN_SIZE = 32 * 1024 * 1024
+DOWNLOAD_CONNECTIONS = 4
 
 def get_video_size(stream):
     return stream.filesize / (1024 * 1024)
 
-def download_youtube_video(url):
+def stream_height(stream):
+    """Altura do stream em pixels (0 se desconhecida)."""
+    try:
+        return int(str(stream.resolution).rstrip("p"))
+    except (TypeError, ValueError):
+        return 0
+
+def stream_download_size(stream, audio_stream=None):
+    """Bytes a baixar para ter vídeo e áudio: streams adaptativos somam o áudio."""
+    size = stream.filesize or 0
+    if not stream.is_progressive and audio_stream is not None:
+        size += audio_stream.filesize or 0
+    return size
+
+def select_stream(video_streams, audio_stream=None, target_height=None, policy=None):
+    """Escolhe o stream de vídeo segundo a política, sem interação.
+
+    Com "smallest", entre os streams com altura >= target_height fica o que
+    exige menos bytes no total; se nenhum atinge a altura, usa os de maior
+    resolução disponível. Em empate de tamanho, prefere o progressivo (não
+    precisa de mesclagem com FFmpeg).
+    """
+    target_height = TARGET_HEIGHT if target_height is None else target_height
+    policy = policy or STREAM_POLICY
+    streams = list(video_streams)
+    if not streams:
+        return None
+
+    def cost(stream):
+        return (stream_download_size(stream, audio_stream), not stream.is_progressive)
+
+    if policy == "largest":
+        return max(streams, key=cost)
+
+    candidates = [s for s in streams if stream_height(s) >= target_height]
+    if not candidates:
+        best_height = max(stream_height(s) for s in streams)
+        candidates = [s for s in streams if stream_height(s) == best_height]
+    return min(candidates, key=cost)
+
+def choose_stream_interactively(video_streams):
+    """Lista os streams e pergunta qual baixar (comportamento original)."""
+    # Find a progressive stream to avoid needing FFmpeg
+    progressive_streams = [s for s in video_streams if s.is_progressive]
+    
+    if progressive_streams:
+        print("\nRecomendado: Use um stream progressivo para evitar problemas com FFmpeg")
+        print("Streams progressivos disponíveis:")
+        for i, stream in enumerate(progressive_streams):
+            size = get_video_size(stream)
+            print(f"P{i}. Resolution: {stream.resolution}, Size: {size:.2f} MB")
+        
+        print("\nEscolha um stream normal (0, 1, 2...) ou um progressivo (P0, P1, P2...)")
+        choice_input = input("Enter your choice (e.g., '0' or 'P0'): ")
+        
+        if choice_input.startswith('P'):
+            choice = int(choice_input[1:])
+            return progressive_streams[choice]
+        choice = int(choice_input)
+        return video_streams[choice]
+
+    choice = int(input("Enter the number of the video stream to download: "))
+    return video_streams[choice]
+
+def _fetch_to_part(url, part_file, first_byte=0, last_byte=None, chunk_size=None, timeout=None,
+                   headers=None, require_range=False):
+    """Baixa os bytes [first_byte, last_byte] de url para part_file, continuando o que já existir nele."""
+    chunk_size = chunk_size or DOWNLOAD_CHUNK_SIZE
+    timeout = timeout or DOWNLOAD_TIMEOUT
+    have = os.path.getsize(part_file) if os.path.exists(part_file) else 0
+    expected = None if last_byte is None else last_byte - first_byte + 1
+
+    if expected is not None and have > expected:
+        # Parcial maior que o trecho: está corrompido, recomeçar
+        have = 0
+        os.remove(part_file)
+    if expected is not None and have == expected:
+        return
+
+    request = urllib.request.Request(url, headers=dict(headers or {}))
+    start = first_byte + have
+    if start or last_byte is not None:
+        end = "" if last_byte is None else str(last_byte)
+        request.add_header("Range", f"bytes={start}-{end}")
+    try:
+        response = urllib.request.urlopen(request, timeout=timeout)
+    except urllib.error.HTTPError as e:
+        # 416: nada mais a baixar além do que já está no parcial
+        if e.code == 416 and have:
+            return
+        raise
+
+    with response:
+        if response.status != 206:
+            if require_range:
+                raise IOError("O servidor não aceita pedidos HTTP Range")
+            # Range ignorado: o corpo é o arquivo inteiro
+            have = 0
+        with open(part_file, "ab" if have else "wb") as f:
+            while True:
+                chunk = response.read(chunk_size)
+                if not chunk:
+                    break
+                f.write(chunk)
+
+def download_resumable(url, output_file, expected_size=None, chunk_size=None, timeout=None,
+                       headers=None):
+    """Baixa url para output_file, retomando de output_file + ".part" se existir.
+
+    O arquivo parcial é continuado com um pedido HTTP Range; se o servidor
+    ignorar o Range (resposta 200) o download recomeça do zero. O arquivo
+    final só aparece (por renomeação) quando o download termina.
+    """
+    part_file = output_file + ".part"
+    if os.path.exists(part_file) and os.path.getsize(part_file):
+        print(f"Retomando download a partir de {os.path.getsize(part_file) / (1024 * 1024):.1f} MB...")
+    last_byte = expected_size - 1 if expected_size else None
+    _fetch_to_part(url, part_file, 0, last_byte, chunk_size, timeout, headers)
+
+    final_size = os.path.getsize(part_file)
+    if expected_size and final_size != expected_size:
+        raise IOError(f"Download incompleto: {final_size} de {expected_size} bytes")
+    os.replace(part_file, output_file)
+    return output_file
+
+def download_parallel(url, output_file, size, connections=None, chunk_size=None, timeout=None,
+                      headers=None):
+    """Baixa url em `connections` faixas HTTP Range simultâneas e junta as partes.
+
+    Cada faixa tem seu próprio arquivo parcial (output_file.part0, .part1...),
+    então uma interrupção retoma cada faixa de onde parou.
+    """
+    connections = max(1, min(connections or DOWNLOAD_CONNECTIONS, size // DOWNLOAD_CHUNK_SIZE or 1))
+    step = -(-size // connections)
+    ranges = [(i * step, min(size, (i + 1) * step) - 1) for i in range(connections)]
+    parts = [f"{output_file}.part{i}" for i in range(connections)]
+
+    with ThreadPoolExecutor(max_workers=connections) as executor:
+        futures = [executor.submit(_fetch_to_part, url, part, first, last, chunk_size, timeout,
+                                   headers, True)
+                   for part, (first, last) in zip(parts, ranges)]
+        for future in futures:
+            future.result()
+
+    for part, (first, last) in zip(parts, ranges):
+        if os.path.getsize(part) != last - first + 1:
+            raise IOError(f"Faixa incompleta em {part}")
+
+    tmp_file = output_file + ".part"
+    with open(tmp_file, "wb") as out:
+        for part in parts:
+            with open(part, "rb") as f:
+                shutil.copyfileobj(f, out, DOWNLOAD_CHUNK_SIZE)
+    os.replace(tmp_file, output_file)
+    for part in parts:
+        os.remove(part)
+    return output_file
+
+def download_stream(stream, output_path, filename):
+    """Baixa um stream do YouTube com retomada; usa o download do pytubefix se falhar."""
+    with span("download_stream", cat="download", resolution=stream.resolution) as info:
+        output_file = _download_stream(stream, output_path, filename)
+        downloaded = os.path.getsize(output_file) if output_file and os.path.exists(output_file) else 0
+        info["bytes"] = downloaded
+        trace_count("bytes_downloaded", downloaded)
+    return output_file
+
+def _download_stream(stream, output_path, filename):
+    output_file = os.path.join(output_path, f"{filename}.{stream.subtype or 'mp4'}")
+    size = stream.filesize
     try:
+        if size and size >= PARALLEL_DOWNLOAD_MIN_SIZE and DOWNLOAD_CONNECTIONS > 1:
+            try:
+                return download_parallel(stream.url, output_file, size)
+            except Exception as e:
+                print(f"Aviso: Download em faixas paralelas falhou ({e}). Usando uma conexão...")
+        return download_resumable(stream.url, output_file, expected_size=size)
+    except Exception as e:
+        print(f"Aviso: Download com retomada falhou ({e}). Usando o download padrão...")
+        return stream.download(output_path=output_path, filename=os.path.basename(output_file))
+
+def download_youtube_video(url, policy=None, target_height=None):
+    try:
+        policy = policy or STREAM_POLICY
+        target_height = TARGET_HEIGHT if target_height is None else target_height
         yt = YouTube(url)
 
+        # Vídeo já baixado antes? Usa a cópia do cache
+        cache = get_cache()
+        key = cache_key("download", yt.video_id, policy, target_height)
+        if cache and policy != "interactive":
+            for ext in (".mp4", ".webm"):
+                cached = cache.get(key, ext)
+                if cached:
+                    print(f"Vídeo encontrado no cache: {cached}")
+                    return cached
+
         video_streams = yt.streams.filter(type="video").order_by('resolution').desc()
         audio_stream = yt.streams.filter(only_audio=True).first()
 
@@ -20,28 +236,12 @@ def download_youtube_video(url):
             stream_type = "Progressive" if stream.is_progressive else "Adaptive"
             print(f"{i}. Resolution: {stream.resolution}, Size: {size:.2f} MB, Type: {stream_type}")
 
-        # Find a progressive stream to avoid needing FFmpeg
-        progressive_streams = [s for s in video_streams if s.is_progressive]
-        
-        if progressive_streams:
-            print("\nRecomendado: Use um stream progressivo para evitar problemas com FFmpeg")
-            print("Streams progressivos disponíveis:")
-            for i, stream in enumerate(progressive_streams):
-                size = get_video_size(stream)
-                print(f"P{i}. Resolution: {stream.resolution}, Size: {size:.2f} MB")
-            
-            print("\nEscolha um stream normal (0, 1, 2...) ou um progressivo (P0, P1, P2...)")
-            choice_input = input("Enter your choice (e.g., '0' or 'P0'): ")
-            
-            if choice_input.startswith('P'):
-                choice = int(choice_input[1:])
-                selected_stream = progressive_streams[choice]
-            else:
-                choice = int(choice_input)
-                selected_stream = video_streams[choice]
+        if policy == "interactive":
+            selected_stream = choose_stream_interactively(video_streams)
         else:
-            choice = int(input("Enter the number of the video stream to download: "))
-            selected_stream = video_streams[choice]
+            selected_stream = select_stream(video_streams, audio_stream, target_height, policy)
+            print(f"Stream escolhido ({policy}, alvo {target_height}p): {selected_stream.resolution}, "
+                  f"{stream_download_size(selected_stream, audio_stream) / (1024 * 1024):.2f} MB no total")
 
         if not os.path.exists('videos'):
             os.makedirs('videos')
@@ -53,12 +253,15 @@ def download_youtube_video(url):
         if not safe_title:
             safe_title = "youtube_video"
             
-        video_file = selected_stream.download(output_path='videos', filename=f"video_{safe_title}")
-
         # If it's not progressive, we need to merge with audio
         if not selected_stream.is_progressive:
-            print("Downloading audio...")
-            audio_file = audio_stream.download(output_path='videos', filename=f"audio_{safe_title}")
+            # Vídeo e áudio são baixados ao mesmo tempo
+            print("Downloading video and audio...")
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                video_future = executor.submit(download_stream, selected_stream, 'videos', f"video_{safe_title}")
+                audio_future = executor.submit(download_stream, audio_stream, 'videos', f"audio_{safe_title}")
+                video_file = video_future.result()
+                audio_file = audio_future.result()
 
             # Output file name
             output_file = os.path.join('videos', f"{safe_title}.mp4")
@@ -91,10 +294,18 @@ def download_youtube_video(url):
                 print("E adicione-o ao PATH do sistema.")
                 output_file = video_file
         else:
-            output_file = video_file
+            output_file = download_stream(selected_stream, 'videos', f"video_{safe_title}")
 
         print(f"Downloaded: {yt.title} to 'videos' folder")
         print(f"File path: {output_file}")
+
+        if cache and policy != "interactive":
+            try:
+                ext = os.path.splitext(output_file)[1] or ".mp4"
+                output_file = cache.put_file(key, output_file, ext, move=True)
+                print(f"Vídeo guardado no cache: {output_file}")
+            except Exception as e:
+                print(f"Aviso: Não foi possível guardar o vídeo no cache: {e}")
         return output_file
 
     except Exception as e:
@@ -0,0 +1,164 @@
+"""Processa uma lista de vídeos (manifesto) sem interação.
+
+Uso:
+    python batch.py videos.txt --workers 4
+
+O manifesto pode ser:
+- .txt: uma URL do YouTube ou caminho de vídeo local por linha (# comenta)
+- .jsonl: um objeto por linha
+- .json: uma lista de objetos
+
+Cada objeto tem "source" e, opcionalmente, "clips", "profile" e "name".
+Cada item roda em um processo próprio (main.py --source ...), com o log em
+<pasta>/<nome>/job.log; o resumo de todos os itens vai para <pasta>/summary.json.
+Os limites por estágio (downloads, transcrições, renders simultâneos) valem
+para todos os processos: veja Components/Concurrency.py.
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from Components.Render import RENDER_PROFILES
+
+# Quantos itens do manifesto são processados ao mesmo tempo
+BATCH_WORKERS = 4
+
+# Pasta onde cada item ganha uma subpasta com os clipes, o log e o resultado
+BATCH_OUTPUT_DIR = "outputs/batch"
+
+DEFAULT_CLIPS = 1
+
+
+def read_manifest(path):
+    """Lista de itens {"source", "clips", "profile", "name"} do manifesto."""
+    with open(path, encoding="utf-8") as f:
+        content = f.read()
+
+    if path.endswith(".json"):
+        entries = json.loads(content)
+    elif path.endswith(".jsonl"):
+        entries = [json.loads(line) for line in content.splitlines() if line.strip()]
+    else:
+        entries = [line.strip() for line in content.splitlines()
+                   if line.strip() and not line.strip().startswith("#")]
+
+    items = []
+    for index, entry in enumerate(entries):
+        if isinstance(entry, str):
+            entry = {"source": entry}
+        if not entry.get("source"):
+            print(f"Aviso: Item {index + 1} do manifesto sem 'source', ignorado.")
+            continue
+        profile = entry.get("profile") or "default"
+        if profile not in RENDER_PROFILES:
+            print(f"Aviso: Perfil '{profile}' desconhecido no item {index + 1}; usando 'default'.")
+            profile = "default"
+        items.append({
+            "source": entry["source"],
+            "clips": int(entry.get("clips") or DEFAULT_CLIPS),
+            "profile": profile,
+            "name": entry.get("name") or item_name(index, entry["source"]),
+        })
+    return items
+
+
+def item_name(index, source):
+    """Nome da pasta do item: posição no manifesto + trecho legível da fonte."""
+    tail = re.sub(r"[^\w-]+", "_", os.path.basename(source.rstrip("/")) or source)[-40:]
+    return f"{index + 1:04d}_{tail.strip('_') or 'video'}"
+
+
+def run_item(item, output_dir):
+    """Roda um item em um processo main.py e devolve o resultado (com o caminho do log)."""
+    item_dir = os.path.join(output_dir, item["name"])
+    os.makedirs(item_dir, exist_ok=True)
+    log_path = os.path.join(item_dir, "job.log")
+    result_path = os.path.join(item_dir, "result.json")
+    if os.path.exists(result_path):
+        os.remove(result_path)
+
+    command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py"),
+               "--source", item["source"], "--clips", str(item["clips"]),
+               "--profile", item["profile"], "--output-dir", item_dir, "--result", result_path]
+    start = time.time()
+    env = dict(os.environ, PYTHONUNBUFFERED="1")
+    with open(log_path, "w", encoding="utf-8") as log:
+        returncode = subprocess.call(command, stdout=log, stderr=subprocess.STDOUT,
+                                     stdin=subprocess.DEVNULL, env=env)
+
+    try:
+        with open(result_path, encoding="utf-8") as f:
+            result = json.load(f)
+    except (OSError, ValueError):
+        result = {"source": item["source"], "status": "failed", "clips": [],
+                  "error": f"Processo terminou com código {returncode} sem resultado (veja o log)."}
+    result.update(name=item["name"], log=log_path, returncode=returncode,
+                  seconds=round(time.time() - start, 1))
+    return result
+
+
+def write_summary(path, results, started):
+    counts = {}
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    summary = {"items": len(results), "counts": counts,
+               "seconds": round(time.time() - started, 1), "results": results}
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+    return summary
+
+
+def run_batch(manifest_path, workers=None, output_dir=None):
+    """Processa todos os itens do manifesto; o resumo é regravado a cada item concluído."""
+    output_dir = output_dir or BATCH_OUTPUT_DIR
+    items = read_manifest(manifest_path)
+    if not items:
+        print("❌ Erro: Manifesto vazio.")
+        return None
+
+    os.makedirs(output_dir, exist_ok=True)
+    summary_path = os.path.join(output_dir, "summary.json")
+    workers = max(1, min(workers or BATCH_WORKERS, len(items)))
+    print(f"Processando {len(items)} vídeos com {workers} workers. Resumo em: {summary_path}")
+
+    started = time.time()
+    results = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(run_item, item, output_dir): item for item in items}
+        for future in as_completed(futures):
+            item = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"source": item["source"], "name": item["name"], "status": "failed",
+                          "clips": [], "error": f"Erro inesperado: {e}"}
+            results.append(result)
+            icon = {"ok": "✅", "partial": "⚠️"}.get(result["status"], "❌")
+            print(f"{icon} [{len(results)}/{len(items)}] {item['name']}: {result['status']} "
+                  f"({result.get('seconds', 0):.0f}s)" + (f" - {result['error']}" if result.get("error") else ""))
+            write_summary(summary_path, results, started)
+
+    # Ordem do manifesto no resumo final
+    order = {item["name"]: index for index, item in enumerate(items)}
+    results.sort(key=lambda result: order.get(result["name"], len(order)))
+    summary = write_summary(summary_path, results, started)
+    print(f"\nConcluído em {summary['seconds']:.0f}s: " +
+          ", ".join(f"{count} {status}" for status, count in sorted(summary["counts"].items())))
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera shorts de uma lista de vídeos.")
+    parser.add_argument("manifest", help="arquivo .txt, .json ou .jsonl com os vídeos")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS, help="itens processados ao mesmo tempo")
+    parser.add_argument("--output-dir", default=BATCH_OUTPUT_DIR)
+    args = parser.parse_args()
+    summary = run_batch(args.manifest, args.workers, args.output_dir)
+    sys.exit(0 if summary and not summary["counts"].get("failed") else 1)
@@ -1,13 +1,41 @@
 from Components.YoutubeDownloader import download_youtube_video
 from Components.Edit import extractAudio, crop_video
-from Components.Transcription import transcribeAudio
+from Components.Transcription import transcribeAudio, transcript_key
 from Components.LanguageTasks import GetHighlight, GetMultipleHighlights
-from Components.FaceCrop import crop_to_vertical, combine_videos
+from Components.FaceCrop import crop_to_vertical, combine_videos, render_short
+from Components.Media import find_ffmpeg, probe_duration
+from Components.FaceTrack import analyze_video, cached_track
+from Components.AudioBuffer import AudioBuffer, decode_audio, open_pcm
+from Components.TranscriptCompactor import compact_transcript
+from Components.LocalScorer import LocalHighlights
+from Components import Render
+from Components.Concurrency import stage_slot
+from Components.Checkpoint import JobManifest
+from Components.Fingerprint import file_fingerprint
+from Components.Tracing import finish_run, span, start_run
+import argparse
+import json
 import os
 import sys
 import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
-def check_prerequisites():
+# Quantos clipes são renderizados ao mesmo tempo (1 = um de cada vez)
+RENDER_WORKERS = max(1, (os.cpu_count() or 1) // 4)
+
+# Threads do OpenCV por processo de render, para não disputar núcleos
+RENDER_THREADS_PER_WORKER = 4
+
+# Fração mínima do vídeo coberta pelos clipes para analisar rostos e fala do vídeo
+# inteiro antes do render; abaixo dela cada clipe detecta rostos só no seu trecho
+ANALYZE_MIN_COVERAGE = 0.5
+
+# Quem escolhe os destaques: "llm" (a pontuação local entra se o LLM falhar
+# ou não houver chave) ou "local" (sem rede)
+HIGHLIGHT_SCORER = "llm"
+
+def check_prerequisites(interactive=True):
     missing = []
     
     # Verificar se os diretórios necessários existem
@@ -35,17 +63,40 @@ def check_prerequisites():
         for item in missing:
             print(f"  - {item}")
         print("\nVocê pode continuar, mas algumas funcionalidades podem não funcionar corretamente.")
-        input("Pressione Enter para continuar...")
+        if interactive:
+            input("Pressione Enter para continuar...")
     
     return len(missing) == 0
 
-def process_single_highlight(Vid, Audio, transcriptions, start, end, index=1):
-    """Processa um único destaque e retorna o caminho do arquivo final."""
+def process_single_highlight(Vid, start, end, index=1, track=None, output_dir="outputs", profile=None):
+    """Processa um único destaque e retorna o caminho do arquivo final.
+
+    track é o trecho [start, end) do rastro de rostos do vídeo inteiro, se já calculado.
+    profile é o nome de um perfil de Render.RENDER_PROFILES.
+    """
+    with stage_slot("render"), span(f"clip_{index}", cat="clip", start=start, end=end):
+        return _process_single_highlight(Vid, start, end, index, track, output_dir,
+                                         Render.RENDER_PROFILES.get(profile or "default", {}))
+
+def _process_single_highlight(Vid, start, end, index, track, output_dir, settings):
     try:
         # Definir nomes de arquivos para este clipe
-        Output = f"outputs/Out_{index}.mp4"
-        croped = f"outputs/Croped_{index}.mp4"
-        final_output = f"outputs/Final_{index}.mp4"
+        Output = os.path.join(output_dir, f"Out_{index}.mp4")
+        croped = os.path.join(output_dir, f"Croped_{index}.mp4")
+        final_output = os.path.join(output_dir, f"Final_{index}.mp4")
+
+        # Render direto: uma única codificação, sem arquivos intermediários
+        if uses_direct_render():
+            print(f"\nProcessando Clipe {index} - Renderizando de {start}s até {end}s...")
+            if not render_short(Vid, final_output, start, end, track=track,
+                                detection_mode=settings.get("detection_mode"),
+                                preset=settings.get("preset"), crf=settings.get("crf")):
+                print(f"❌ Erro: Não foi possível renderizar o clipe {index}.")
+                return None
+
+            print(f"🎬 Clipe {index} concluído: {final_output}")
+            print(f"   Duração: {end-start:.1f} segundos")
+            return final_output
         
         # Cortar vídeo
         print(f"\nProcessando Clipe {index} - Cortando o vídeo de {start}s até {end}s...")
@@ -57,7 +108,7 @@ def process_single_highlight(Vid, Audio, transcriptions, start, end, index=1):
 
         # Corte vertical
         print(f"Criando corte vertical (identificando faces) para o clipe {index}...")
-        if not crop_to_vertical(Output, croped):
+        if not crop_to_vertical(Output, croped, detection_mode=settings.get("detection_mode")):
             print(f"❌ Erro: Não foi possível criar o corte vertical para o clipe {index}.")
             return None
             
@@ -77,6 +128,320 @@ def process_single_highlight(Vid, Audio, transcriptions, start, end, index=1):
         print(f"Erro ao processar o clipe {index}: {e}")
         return None
 
+def _init_render_worker(cv_threads):
+    """Limita as threads de OpenCV/BLAS de cada processo de render."""
+    for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[var] = str(cv_threads)
+    import cv2
+    cv2.setNumThreads(cv_threads)
+
+def uses_direct_render():
+    return Render.RENDER_BACKEND == "ffmpeg" and find_ffmpeg() is not None
+
+def source_duration(Vid, Audio=None):
+    if isinstance(Audio, AudioBuffer):
+        return Audio.duration
+    return probe_duration(Vid)
+
+def analyze_source(Vid, Audio=None, profile=None, highlights=None):
+    """Analisa rostos e fala do vídeo inteiro uma vez (apenas no render direto).
+
+    Com highlights, a análise só é feita se os clipes cobrirem pelo menos
+    ANALYZE_MIN_COVERAGE da fonte; abaixo disso cada clipe detecta os rostos
+    no próprio trecho, que sai muito mais barato (um clipe de 60 s de um
+    vídeo de 2 h não precisa analisar as 2 h). Um índice já gravado é sempre usado.
+    """
+    if not uses_direct_render():
+        return None
+    settings = Render.RENDER_PROFILES.get(profile or "default", {})
+    if highlights is not None:
+        duration = source_duration(Vid, Audio)
+        covered = sum(end - start for start, end, content in highlights)
+        if duration and covered < ANALYZE_MIN_COVERAGE * duration:
+            track = cached_track(Vid, settings.get("detection_mode"))
+            if track is None:
+                print(f"Clipes cobrem {covered / duration:.0%} do vídeo: rostos detectados só nos trechos dos clipes.")
+            return track
+    with span("analyze"):
+        track = analyze_video(Vid, settings.get("detection_mode"),
+                              audio=Audio if isinstance(Audio, AudioBuffer) else None)
+    if track is None:
+        print("Aviso: Análise do vídeo inteiro falhou. Cada clipe será analisado separadamente.")
+    return track
+
+def local_highlights(Audio, transcriptions, num_parts, track=None):
+    """Destaques da pontuação local (fala, volume, rostos e palavras-chave)."""
+    print("\nEscolhendo destaques com a pontuação local...")
+    return LocalHighlights(transcriptions, num_parts,
+                           audio=Audio if isinstance(Audio, AudioBuffer) else None, track=track)
+
+def slice_track(track, start, end):
+    return track.slice(start, end) if track is not None else None
+
+def process_highlights_parallel(Vid, highlights, max_workers=None, cv_threads=None, track=None,
+                                output_dir="outputs", profile=None, indices=None, on_clip=None):
+    """Renderiza vários destaques em um pool de processos.
+
+    Retorna a lista de caminhos finais na ordem dos destaques, com None para
+    os clipes que falharam; a falha de um clipe não afeta os demais. Cada
+    processo recebe só o caminho do vídeo, o intervalo e o trecho do rastro
+    (track) do seu destaque. Se um processo morrer (falta de memória, crash
+    no OpenCV) o pool inteiro quebra: os clipes que não terminaram são
+    refeitos, cada um em um processo próprio.
+    indices são os números dos clipes (nomes dos arquivos), padrão 1..N;
+    on_clip(posição, caminho) é chamado conforme cada clipe termina.
+    """
+    indices = indices or list(range(1, len(highlights) + 1))
+    max_workers = min(max_workers or RENDER_WORKERS, len(highlights))
+    tasks = [(Vid, start, end, indices[idx], slice_track(track, start, end), output_dir, profile)
+             for idx, (start, end, content) in enumerate(highlights)]
+    if max_workers <= 1:
+        results = []
+        for idx, task in enumerate(tasks):
+            results.append(process_single_highlight(*task))
+            if on_clip:
+                on_clip(idx, results[-1])
+        return results
+
+    cv_threads = cv_threads or max(1, (os.cpu_count() or 1) // max_workers)
+    print(f"\nRenderizando {len(highlights)} clipes em {max_workers} processos "
+          f"({cv_threads} threads cada)...")
+
+    results = [None] * len(tasks)
+    broken = []
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_render_worker,
+                             initargs=(cv_threads,)) as executor:
+        futures = [executor.submit(process_single_highlight, *task) for task in tasks]
+        for idx, future in enumerate(futures):
+            try:
+                results[idx] = future.result()
+            except BrokenProcessPool:
+                broken.append(idx)
+                continue
+            except Exception as e:
+                print(f"Erro ao processar o clipe {indices[idx]}: {e}")
+            if on_clip:
+                on_clip(idx, results[idx])
+
+    if broken:
+        print(f"Aviso: Um processo de render terminou inesperadamente. "
+              f"Refazendo {len(broken)} clipe(s) em processos separados...")
+    for idx in broken:
+        with ProcessPoolExecutor(max_workers=1, initializer=_init_render_worker,
+                                 initargs=(cv_threads,)) as executor:
+            try:
+                results[idx] = executor.submit(process_single_highlight, *tasks[idx]).result()
+            except Exception as e:
+                print(f"Erro ao processar o clipe {indices[idx]}: {e}")
+        if on_clip:
+            on_clip(idx, results[idx])
+    return results
+
+def choose_highlights(Vid, Audio, transcriptions, num_parts, profile=None):
+    """Destaques [(início, fim, conteúdo)] e o rastro de rostos, se já calculado para a pontuação local."""
+    # Preparar texto da transcrição (compactado para caber no orçamento de tokens)
+    compact = compact_transcript(transcriptions)
+    TransText = compact.text
+
+    print(f"\nIdentificando {num_parts} momento(s) de destaque...")
+    highlights = []
+    if HIGHLIGHT_SCORER == "llm":
+        with stage_slot("highlights"), span("highlights"):
+            if num_parts == 1:
+                # Modo original - um único destaque
+                start, end = GetHighlight(TransText)
+                highlights = [(start, end, "")] if (start, end) != (0, 0) else []
+            else:
+                highlights = GetMultipleHighlights(TransText, num_parts)
+        if highlights:
+            # Tempos do prompt (arredondados) -> tempos exatos da transcrição
+            return compact.map_highlights(highlights), None
+
+    # Rostos entram na nota só se o vídeo já tiver sido analisado antes
+    track = cached_track(Vid, Render.RENDER_PROFILES.get(profile or "default", {}).get("detection_mode"))
+    with span("local_highlights"):
+        return local_highlights(Audio, transcriptions, num_parts, track), track
+
+def get_source_video(source, job):
+    """Caminho local do vídeo: o próprio arquivo ou o download do YouTube (uma vez por job)."""
+    if os.path.exists(source):
+        return source
+    inputs = {"source": source}
+    done = job.done("download", inputs)
+    if done:
+        print(f"\nVídeo já baixado neste job: {done['video']}")
+        return done["video"]
+
+    print("\nBaixando vídeo do YouTube...")
+    with stage_slot("download"), span("download"):
+        Vid = download_youtube_video(source)
+    Vid = Vid.replace(".webm", ".mp4") if Vid else None
+    if Vid and os.path.exists(Vid):
+        job.complete("download", inputs, {"video": Vid}, files=[Vid])
+    else:
+        job.fail("download")
+    return Vid
+
+def get_source_audio(Vid, video_key, job):
+    """Áudio do vídeo: AudioBuffer de 16 kHz (ou um WAV, se o FFmpeg não estiver disponível)."""
+    inputs = {"video": video_key}
+    done = job.done("audio", inputs)
+    if done:
+        if done.get("pcm"):
+            return open_pcm(done["pcm"], key=done["key"])
+        return done["wav"]
+
+    # Extrair áudio (16 kHz mono, decodificado uma vez para transcrição e VAD)
+    print("\nExtraindo áudio do vídeo...")
+    with span("audio"):
+        Audio = decode_audio(Vid)
+        if Audio is None:
+            Audio = extractAudio(Vid)
+    if isinstance(Audio, AudioBuffer) and Audio.path:
+        job.complete("audio", inputs, {"pcm": Audio.path, "key": Audio.key}, files=[Audio.path])
+    elif Audio and not isinstance(Audio, AudioBuffer):
+        job.complete("audio", inputs, {"wav": Audio}, files=[Audio])
+    return Audio
+
+def run_job(source, num_parts=1, output_dir="outputs", profile=None, resume=True):
+    """Gera os shorts de uma fonte (URL do YouTube ou arquivo local) sem interação.
+
+    Devolve um dicionário com source, status ("ok", "partial" ou "failed"),
+    clips (início, fim, caminho de cada destaque), error e seconds. Cada
+    estágio concluído fica registrado em <output_dir>/job.json: rodar de novo
+    pula o que já foi feito e refaz só os clipes que faltaram (resume=False
+    recomeça do zero). O trace da execução (tempos de cada estágio, contadores
+    e pico de memória) é gravado em Tracing.TRACE_DIR.
+    """
+    job_start = time.time()
+    trace_path = start_run()
+    result = {"source": source, "status": "failed", "clips": [], "error": None,
+              "output_dir": output_dir, "profile": profile or "default"}
+    try:
+        os.makedirs(output_dir, exist_ok=True)
+        job = JobManifest.for_output(output_dir, source)
+        if not resume:
+            job.stages = {}
+
+        Vid = get_source_video(source, job)
+        if not Vid:
+            result["error"] = "Não foi possível baixar o vídeo."
+            return result
+        print(f"\n✅ Vídeo disponível em: {Vid}")
+        video_key = file_fingerprint(Vid)
+
+        Audio = get_source_audio(Vid, video_key, job)
+        if not Audio:
+            job.fail("audio")
+            result["error"] = "Não foi possível extrair o áudio do vídeo."
+            return result
+            
+        print(f"✅ Áudio extraído em: {getattr(Audio, 'path', None) or Audio}")
+
+        # Transcrever áudio
+        transcript_inputs = {"transcript": transcript_key(Audio)}
+        transcriptions = job.done("transcription", transcript_inputs)
+        if transcriptions:
+            print(f"\nTranscrição já concluída neste job ({len(transcriptions)} segmentos).")
+        else:
+            print("\nTranscrevendo áudio (isso pode levar alguns minutos)...")
+            start_time = time.time()
+            transcript_info = {}
+            with stage_slot("transcribe"), span("transcription"):
+                transcriptions = transcribeAudio(Audio, transcript_info)
+
+            if not transcriptions:
+                job.fail("transcription")
+                result["error"] = "Não foi possível transcrever o áudio."
+                return result
+
+            # Registrada com o método que de fato transcreveu: se a API falhou e o
+            # modelo local assumiu, a próxima execução tenta a API de novo
+            transcript_inputs = {"transcript": transcript_key(Audio, transcript_info.get("method"))}
+            job.complete("transcription", transcript_inputs, transcriptions)
+            print(f"✅ Transcrição concluída em {time.time() - start_time:.1f} segundos")
+
+        highlight_inputs = dict(transcript_inputs, clips=num_parts, scorer=HIGHLIGHT_SCORER,
+                                profile=profile or "default")
+        highlights = job.done("highlights", highlight_inputs)
+        track = None
+        if highlights:
+            highlights = [tuple(highlight) for highlight in highlights]
+            print("\nDestaques já escolhidos neste job.")
+        else:
+            highlights, track = choose_highlights(Vid, Audio, transcriptions, num_parts, profile)
+            if not highlights:
+                job.fail("highlights")
+                result["error"] = "Não foi possível identificar destaques no vídeo."
+                return result
+            job.complete("highlights", highlight_inputs, highlights)
+        
+        print(f"✅ {len(highlights)} destaques identificados para processamento")
+        
+        for idx, (start, end, content) in enumerate(highlights):
+            print(f"\n--- Clipe {idx+1}/{len(highlights)} ---")
+            print(f"Intervalo: {start:.2f}s - {end:.2f}s (Duração: {end-start:.1f}s)")
+            print(f"Conteúdo: {content[:100]}...")
+
+        # Clipes já renderizados (com os mesmos tempos e configurações) não são refeitos
+        render_settings = {"video": video_key, "profile": Render.RENDER_PROFILES.get(profile or "default"),
+                           "direct": uses_direct_render()}
+        clip_inputs = [dict(render_settings, start=start, end=end) for start, end, content in highlights]
+        paths = [(job.done(f"clip_{idx + 1}", inputs) or {}).get("path")
+                 for idx, inputs in enumerate(clip_inputs)]
+        pending = [idx for idx, path in enumerate(paths) if not path]
+        if len(pending) < len(paths):
+            print(f"\n{len(paths) - len(pending)} clipe(s) já concluído(s) neste job; "
+                  f"{len(pending)} a processar.")
+
+        def record_clip(idx, path):
+            if path:
+                job.complete(f"clip_{idx + 1}", clip_inputs[idx], {"path": path}, files=[path])
+            else:
+                job.fail(f"clip_{idx + 1}")
+
+        if pending:
+            # Rostos e fala do vídeo inteiro são analisados uma única vez
+            if track is None:
+                track = analyze_source(Vid, Audio, profile, [highlights[idx] for idx in pending])
+
+            # Processar cada destaque (em paralelo quando RENDER_WORKERS > 1)
+            with span("render", clips=len(pending)):
+                rendered = process_highlights_parallel(Vid, [highlights[idx] for idx in pending], track=track,
+                                                       output_dir=output_dir, profile=profile,
+                                                       indices=[idx + 1 for idx in pending],
+                                                       on_clip=lambda n, path: record_clip(pending[n], path))
+            for idx, path in zip(pending, rendered):
+                paths[idx] = path
+
+        result["clips"] = [{"index": idx + 1, "start": start, "end": end, "content": content, "path": path}
+                           for idx, ((start, end, content), path) in enumerate(zip(highlights, paths))]
+        done = sum(1 for path in paths if path)
+        result["status"] = "ok" if done == len(paths) else ("partial" if done else "failed")
+        if not done:
+            result["error"] = "Nenhum clipe foi gerado com sucesso."
+        return result
+
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        result["error"] = f"Erro inesperado: {e}"
+        return result
+    finally:
+        result["seconds"] = round(time.time() - job_start, 1)
+        if finish_run(trace_path):
+            result["trace"] = trace_path
+
+def print_job_summary(result):
+    successful_clips = [clip["path"] for clip in result["clips"] if clip["path"]]
+    if successful_clips:
+        print(f"\n🎉 Processo concluído! {len(successful_clips)}/{len(result['clips'])} clipes gerados com sucesso!")
+        print("\nClipes gerados:")
+        for idx, path in enumerate(successful_clips):
+            print(f"  📱 Clipe {idx+1}: {path}")
+    else:
+        print(f"\n❌ {result['error'] or 'Nenhum clipe foi gerado com sucesso.'}")
+
 def main():
     print("\n=== AI YouTube Shorts Generator ===\n")
     print("Este programa baixa um vídeo do YouTube, identifica os destaques, e cria")
@@ -89,44 +454,9 @@ def main():
     # Verificar pré-requisitos
     check_prerequisites()
     
-    # Entrada do URL do YouTube
     try:
+        # Entrada do URL do YouTube (ou caminho de um vídeo local)
         url = input("\nDigite o URL do vídeo do YouTube: ")
-        print("\nBaixando vídeo do YouTube...")
-        Vid = download_youtube_video(url)
-        
-        if not Vid:
-            print("\n❌ Erro: Não foi possível baixar o vídeo.")
-            return
-            
-        Vid = Vid.replace(".webm", ".mp4")
-        print(f"\n✅ Vídeo baixado com sucesso em: {Vid}")
-
-        # Extrair áudio
-        print("\nExtraindo áudio do vídeo...")
-        Audio = extractAudio(Vid)
-        
-        if not Audio:
-            print("\n❌ Erro: Não foi possível extrair o áudio do vídeo.")
-            return
-            
-        print(f"✅ Áudio extraído em: {Audio}")
-
-        # Transcrever áudio
-        print("\nTranscrevendo áudio (isso pode levar alguns minutos)...")
-        start_time = time.time()
-        transcriptions = transcribeAudio(Audio)
-        
-        if not transcriptions or len(transcriptions) == 0:
-            print("\n❌ Erro: Não foi possível transcrever o áudio.")
-            return
-            
-        print(f"✅ Transcrição concluída em {time.time() - start_time:.1f} segundos")
-
-        # Preparar texto da transcrição
-        TransText = ""
-        for text, start, end in transcriptions:
-            TransText += (f"{start} - {end}: {text}\n")
 
         # Perguntar ao usuário quantas partes ele deseja
         while True:
@@ -139,63 +469,33 @@ def main():
                     print("Por favor, escolha um número entre 1 e 5.")
             except ValueError:
                 print("Por favor, digite um número válido.")
-        
-        # Processar de acordo com o número de partes
-        if num_parts == 1:
-            # Modo original - um único destaque
-            print("\nIdentificando o momento de destaque...")
-            start, end = GetHighlight(TransText)
-            
-            if start == 0 and end == 0:
-                print("\n❌ Erro: Não foi possível identificar destaques no vídeo.")
-                return
-                
-            print(f"✅ Destaque identificado: {start}s até {end}s")
-            
-            # Processar o único destaque
-            final_path = process_single_highlight(Vid, Audio, transcriptions, start, end)
-            
-            if final_path:
-                print(f"\n🎉 Processo concluído com sucesso!")
-                print(f"📱 Seu vídeo vertical está pronto em: {final_path}")
-            
-        else:
-            # Modo múltiplos destaques
-            print(f"\nIdentificando {num_parts} momentos de destaque...")
-            highlights = GetMultipleHighlights(TransText, num_parts)
-            
-            if not highlights:
-                print("\n❌ Erro: Não foi possível identificar destaques no vídeo.")
-                return
-            
-            print(f"✅ {len(highlights)} destaques identificados para processamento")
-            
-            # Processar cada destaque
-            successful_clips = []
-            for idx, (start, end, content) in enumerate(highlights):
-                print(f"\n--- Processando Clipe {idx+1}/{len(highlights)} ---")
-                print(f"Intervalo: {start}s - {end}s (Duração: {end-start}s)")
-                print(f"Conteúdo: {content[:100]}...")
-                
-                final_path = process_single_highlight(Vid, Audio, transcriptions, start, end, idx+1)
-                if final_path:
-                    successful_clips.append(final_path)
-            
-            # Resumo final
-            if successful_clips:
-                print(f"\n🎉 Processo concluído! {len(successful_clips)}/{len(highlights)} clipes gerados com sucesso!")
-                print("\nClipes gerados:")
-                for idx, path in enumerate(successful_clips):
-                    print(f"  📱 Clipe {idx+1}: {path}")
-            else:
-                print("\n❌ Nenhum clipe foi gerado com sucesso.")
+
+        print_job_summary(run_job(url, num_parts))
 
     except KeyboardInterrupt:
         print("\n\nOperação cancelada pelo usuário.")
-    except Exception as e:
-        print(f"\n❌ Erro inesperado: {e}")
-        import traceback
-        traceback.print_exc()
+
+def run_cli(argv):
+    """Modo sem interação, usado pelo processamento em lote (batch.py)."""
+    parser = argparse.ArgumentParser(description="Gera shorts de um vídeo sem interação.")
+    parser.add_argument("--source", required=True, help="URL do YouTube ou caminho de um vídeo local")
+    parser.add_argument("--clips", type=int, default=1, help="quantidade de clipes")
+    parser.add_argument("--profile", default="default", choices=sorted(Render.RENDER_PROFILES))
+    parser.add_argument("--output-dir", default="outputs")
+    parser.add_argument("--result", help="arquivo JSON onde gravar o resultado")
+    parser.add_argument("--fresh", action="store_true",
+                        help="ignora os estágios já concluídos (job.json) e refaz tudo")
+    args = parser.parse_args(argv)
+
+    check_prerequisites(interactive=False)
+    result = run_job(args.source, args.clips, args.output_dir, args.profile, resume=not args.fresh)
+    print_job_summary(result)
+    if args.result:
+        with open(args.result, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    return 0 if result["status"] != "failed" else 1
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if len(sys.argv) > 1:
+        sys.exit(run_cli(sys.argv[1:]))
+    main()
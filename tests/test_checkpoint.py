@@ -0,0 +1,31 @@
+import os
+
+from Components import Checkpoint
+from Components.Cache import ArtifactCache
+from Components.Checkpoint import JobManifest
+
+
+def test_cached_artifact_read_keeps_stage_done(tmp_path, monkeypatch):
+    cache = ArtifactCache(str(tmp_path / "cache"), min_evict_age=0)
+    monkeypatch.setattr(Checkpoint, "get_cache", lambda: cache)
+    artifact = cache.put_bytes("ab" * 32, b"pcm", ".pcm")
+    os.utime(artifact, (1, 1))
+
+    job = JobManifest.for_output(str(tmp_path / "out"), "video.mp4")
+    job.complete("audio", {"video": "k"}, {"pcm": artifact}, files=[artifact])
+    # Outro job lê o artefato: o LRU atualiza o mtime
+    assert cache.get("ab" * 32, ".pcm") == artifact
+
+    resumed = JobManifest.for_output(str(tmp_path / "out"), "video.mp4")
+    assert resumed.done("audio", {"video": "k"}) == {"pcm": artifact}
+
+
+def test_changed_output_file_redoes_stage(tmp_path, monkeypatch):
+    monkeypatch.setattr(Checkpoint, "get_cache", lambda: None)
+    clip = tmp_path / "clip.mp4"
+    clip.write_bytes(b"a")
+    job = JobManifest.for_output(str(tmp_path), "video.mp4")
+    job.complete("clip_1", {"start": 0}, {"path": str(clip)}, files=[str(clip)])
+
+    clip.write_bytes(b"bb")
+    assert JobManifest.for_output(str(tmp_path), "video.mp4").done("clip_1", {"start": 0}) is None
@@ -0,0 +1,85 @@
+import asyncio
+import json
+
+import pytest
+
+from Components import LanguageTasks
+from Components.Cache import ArtifactCache
+
+
+class MockChatClient:
+    """Cliente de chat falso: o modelo principal falha nas janelas que começam em fail_starts."""
+
+    def __init__(self, fail_starts=()):
+        self.fail_starts = set(fail_starts)
+        self.calls = []
+
+    async def chat(self, model, messages, temperature=None):
+        window = messages[1]["content"]
+        start = float(window.split(" - ", 1)[0])
+        self.calls.append((model, start))
+        if model == LanguageTasks.PRIMARY_MODEL and start in self.fail_starts:
+            raise RuntimeError("falha simulada")
+        return json.dumps([{"start": start + 10, "end": start + 40, "content": f"trecho {start:g}",
+                            "score": 7}])
+
+    def run(self, coroutine):
+        return asyncio.run(coroutine)
+
+
+@pytest.fixture
+def windowed(tmp_path, monkeypatch):
+    cache = ArtifactCache(str(tmp_path / "llm"), min_evict_age=0)
+    monkeypatch.setattr(LanguageTasks, "get_llm_cache", lambda: cache)
+    monkeypatch.setattr(LanguageTasks, "api_key", "test")
+    # 25 minutos de transcrição: janelas em 0, 540 e 1080 s
+    return "\n".join(f"{t:.2f} - {t + 10:.2f}: fala {t}" for t in range(0, 1500, 10))
+
+
+def test_windowed_highlights_come_from_cache_on_second_run(windowed, monkeypatch):
+    client = MockChatClient()
+    monkeypatch.setattr(LanguageTasks, "get_openai_client", lambda: client)
+
+    first = LanguageTasks.GetHighlightsWindowed(windowed, num_clips=5)
+    calls = len(client.calls)
+    second = LanguageTasks.GetHighlightsWindowed(windowed, num_clips=5)
+
+    assert first == [(10, 40, "trecho 0"), (550, 580, "trecho 540"), (1090, 1120, "trecho 1080")]
+    assert calls == 3
+    assert second == first
+    assert len(client.calls) == calls
+
+
+def test_windowed_highlights_from_mixed_models_are_cached(windowed, monkeypatch):
+    client = MockChatClient(fail_starts={540.0})
+    monkeypatch.setattr(LanguageTasks, "get_openai_client", lambda: client)
+
+    model, highlights = client.run(LanguageTasks.map_reduce_highlights(
+        client, LanguageTasks.transcript_windows(LanguageTasks.parse_transcript(windowed)), 5))
+    assert model == f"{LanguageTasks.PRIMARY_MODEL}+{LanguageTasks.FALLBACK_MODEL}"
+
+    client.calls.clear()
+    first = LanguageTasks.GetHighlightsWindowed(windowed, num_clips=5)
+    calls = len(client.calls)
+    second = LanguageTasks.GetHighlightsWindowed(windowed, num_clips=5)
+
+    assert len(first) == 3
+    assert second == first
+    assert len(client.calls) == calls
+
+
+def test_windowed_reduce_picks_num_clips(windowed, monkeypatch):
+    client = MockChatClient()
+    chat = client.chat
+
+    async def chat_with_reduce(model, messages, temperature=None):
+        if "candidatos" in messages[0]["content"] and "(7)" in messages[1]["content"]:
+            client.calls.append((model, "reduce"))
+            return json.dumps([{"start": 550, "end": 580, "content": "trecho 540"}])
+        return await chat(model, messages, temperature)
+
+    client.chat = chat_with_reduce
+    monkeypatch.setattr(LanguageTasks, "get_openai_client", lambda: client)
+
+    assert LanguageTasks.GetHighlightsWindowed(windowed, num_clips=1) == [(550, 580, "trecho 540")]
+    assert client.calls[-1] == (LanguageTasks.PRIMARY_MODEL, "reduce")
@@ -0,0 +1,156 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import openai
+import pytest
+
+from Components import OpenAIClient as client_module
+from Components.OpenAIClient import OpenAIClient, RateLimitExceeded, SharedRateLimiter, backoff_delay
+
+
+def rate_limit_error(retry_after=None):
+    headers = {"retry-after": retry_after} if retry_after is not None else {}
+    response = httpx.Response(429, headers=headers, request=httpx.Request("POST", "http://test/v1/chat"))
+    return openai.RateLimitError("limite", response=response, body=None)
+
+
+def test_limiter_allows_burst_then_spaces_requests(tmp_path):
+    limiter = SharedRateLimiter(str(tmp_path / "rate.json"), requests_per_minute=60,
+                                tokens_per_minute=10 ** 6, burst_seconds=1.0)
+    assert limiter.reserve() == 0.0
+    assert limiter.reserve() == 0.0
+    assert limiter.reserve() == pytest.approx(1.0, abs=0.05)
+
+
+def test_limiter_counts_tokens(tmp_path):
+    limiter = SharedRateLimiter(str(tmp_path / "rate.json"), requests_per_minute=10 ** 6,
+                                tokens_per_minute=600)
+    assert limiter.reserve(100) == 0.0
+    # 100 tokens ocupam 10 s da cota; mais 600 só cabem quando esses 10 s passarem
+    assert limiter.reserve(600) == pytest.approx(10.0, abs=0.05)
+    # Um pedido maior que a cota de um minuto passa quando a cota está livre
+    fresh = SharedRateLimiter(str(tmp_path / "other.json"), requests_per_minute=10 ** 6,
+                              tokens_per_minute=600)
+    assert fresh.reserve(1000) == 0.0
+
+
+def test_limiter_state_is_shared_through_the_file(tmp_path):
+    path = str(tmp_path / "rate.json")
+    first = SharedRateLimiter(path, requests_per_minute=60, burst_seconds=0.0)
+    second = SharedRateLimiter(path, requests_per_minute=60, burst_seconds=0.0)
+    assert first.reserve() == 0.0
+    assert second.reserve() == pytest.approx(1.0, abs=0.05)
+
+
+def test_limiter_acquire_waits(tmp_path):
+    limiter = SharedRateLimiter(str(tmp_path / "rate.json"), requests_per_minute=600, burst_seconds=0.0)
+    started = time.monotonic()
+    asyncio.run(limiter.acquire())
+    asyncio.run(limiter.acquire())
+    assert time.monotonic() - started >= 0.09
+
+
+def test_backoff_uses_retry_after_with_cap():
+    assert backoff_delay(0, rate_limit_error("2")) == 2.0
+    assert backoff_delay(0, rate_limit_error("9999")) == client_module.BACKOFF_MAX
+
+
+def test_backoff_jitter_grows_exponentially(monkeypatch):
+    monkeypatch.setattr(client_module.random, "uniform", lambda low, high: high)
+    assert [backoff_delay(attempt) for attempt in range(4)] == [1.0, 2.0, 4.0, 8.0]
+    assert backoff_delay(20, rate_limit_error()) == client_module.BACKOFF_MAX
+
+
+@pytest.fixture
+def api_client(tmp_path, monkeypatch):
+    # Só o caminho de call(): sem loop próprio nem conexão
+    client = OpenAIClient.__new__(OpenAIClient)
+    client.limiter = SharedRateLimiter(str(tmp_path / "rate.json"), requests_per_minute=10 ** 6)
+    monkeypatch.setattr(client_module, "backoff_delay", lambda attempt, error=None: 0.0)
+    return client
+
+
+def test_call_retries_rate_limits_until_success(api_client):
+    attempts = []
+
+    async def request():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise rate_limit_error("0")
+        return "ok"
+
+    assert asyncio.run(api_client.call(request)) == "ok"
+    assert len(attempts) == 3
+
+
+def test_call_gives_up_after_max_retries(api_client, monkeypatch):
+    monkeypatch.setattr(client_module, "MAX_RETRIES", 2)
+    attempts = []
+
+    async def request():
+        attempts.append(1)
+        raise rate_limit_error("0")
+
+    with pytest.raises(RateLimitExceeded):
+        asyncio.run(api_client.call(request))
+    assert len(attempts) == 3
+
+
+def test_call_does_not_retry_other_errors(api_client):
+    attempts = []
+
+    async def request():
+        attempts.append(1)
+        raise ValueError("erro do cliente")
+
+    with pytest.raises(ValueError):
+        asyncio.run(api_client.call(request))
+    assert len(attempts) == 1
+
+
+class ChatHandler(BaseHTTPRequestHandler):
+    """Servidor de chat local: responde 429 nas primeiras `server.failures` chamadas."""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.server.calls += 1
+        if self.server.calls <= self.server.failures:
+            body = json.dumps({"error": {"message": "limite", "type": "rate_limit"}}).encode()
+            self.send_response(429)
+            self.send_header("Retry-After", "0")
+        else:
+            body = json.dumps({
+                "id": "x", "object": "chat.completion", "created": 0, "model": "m",
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "resposta"}}],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+            }).encode()
+            self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_chat_against_local_server_retries_429(tmp_path, monkeypatch):
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), ChatHandler)
+    httpd.calls, httpd.failures = 0, 2
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    monkeypatch.setattr(client_module, "api_key", "test")
+    monkeypatch.setattr(client_module, "API_BASE_URL", f"http://127.0.0.1:{httpd.server_address[1]}/v1")
+    monkeypatch.setattr(client_module, "RATE_LIMIT_FILE", str(tmp_path / "rate.json"))
+    try:
+        client = OpenAIClient()
+        messages = [{"role": "system", "content": "s"}, {"role": "user", "content": "u"}]
+        assert client.chat_sync("m", messages) == "resposta"
+        assert httpd.calls == 3
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
@@ -0,0 +1,26 @@
+import numpy as np
+
+from Components.AudioBuffer import AudioBuffer
+from Components.SpeechTimeline import SpeechTimeline, source_vad_flags
+
+
+def tone(seconds, loud_from, loud_to, sample_rate=16000):
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    samples = (np.random.default_rng(0).normal(0, 30, len(t))).astype(np.int16)
+    loud = (t >= loud_from) & (t < loud_to)
+    samples[loud] = (8000 * np.sin(2 * np.pi * 220 * t[loud])).astype(np.int16)
+    return AudioBuffer(samples, sample_rate)
+
+
+def test_buffers_without_key_are_not_memoized_together(monkeypatch):
+    from Components import Speaker
+    monkeypatch.setattr(Speaker, "WEBRTCVAD_AVAILABLE", False)
+    first = source_vad_flags(tone(4, 0, 2))
+    second = source_vad_flags(tone(4, 2, 4))
+    assert first[:60].mean() > 0.9 and first[70:].mean() < 0.1
+    assert second[:60].mean() < 0.1 and second[70:].mean() > 0.9
+
+
+def test_at_time_uses_frame_index():
+    timeline = SpeechTimeline(10, np.array([False, True, False]))
+    assert timeline.at_time(0.06) == timeline.at(timeline.frame_index(0.06)) is True
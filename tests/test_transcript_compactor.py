@@ -0,0 +1,21 @@
+from Components import TranscriptCompactor
+from Components.TranscriptCompactor import MAX_BLOCK_SECONDS, compact_transcript, merge_segments
+
+
+def test_merge_segments_never_exceeds_max_block():
+    transcriptions = [(f"fala {i}", i * 4.0, i * 4.0 + 3.5) for i in range(100)]
+    blocks = merge_segments(transcriptions, min_seconds=1000)
+    assert max(end - start for start, end, _ in blocks) <= MAX_BLOCK_SECONDS
+    assert len(blocks) > 1
+
+
+def test_compact_transcript_keeps_blocks_within_max_under_tight_budget(monkeypatch):
+    monkeypatch.setattr(TranscriptCompactor, "count_tokens", lambda text: (len(text) + 3) // 4)
+    transcriptions = [(f"segmento {i} com algumas palavras", i * 3.0, i * 3.0 + 2.5) for i in range(92)]
+    compact = compact_transcript(transcriptions, token_budget=500)
+    assert len(compact) > 2
+    assert max(compact.ends - compact.starts) <= MAX_BLOCK_SECONDS
+
+
+def test_strip_filler_keeps_portuguese_words():
+    assert TranscriptCompactor.strip_filler("uh, um eh hum ah ok") == "um eh hum ah ok"
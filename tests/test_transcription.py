@@ -0,0 +1,188 @@
+import json
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+pytest.importorskip("faster_whisper")
+pytest.importorskip("torch")
+
+from Components import Transcription
+from Components.AudioBuffer import AudioBuffer
+from Components.Cache import ArtifactCache
+
+
+def fake_engine(name, segments, fail_after=None):
+    """Gerador no lugar de iter_api_transcription/iter_local_transcription."""
+    calls = []
+
+    def engine(audio_path, start=0.0):
+        calls.append(start)
+        for index, (segment_start, segment_end) in enumerate(segments):
+            if fail_after is not None and index == fail_after:
+                raise RuntimeError("falha simulada")
+            if segment_start >= start:
+                yield [f"{name} {segment_start:g}", segment_start, segment_end]
+
+    engine.calls = calls
+    return engine
+
+
+@pytest.fixture
+def audio(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    cache = ArtifactCache(str(tmp_path / "cache"), min_evict_age=0)
+    monkeypatch.setattr(Transcription, "get_cache", lambda: cache)
+    monkeypatch.setattr(Transcription, "TRANSCRIPTION_METHOD", "api")
+    monkeypatch.setattr(Transcription, "api_key", "test")
+    path = tmp_path / "audio.wav"
+    path.write_bytes(b"RIFF" + os.urandom(64))
+    return str(path), cache
+
+
+def log_path(audio_path):
+    return os.path.join(Transcription.TRANSCRIPT_LOG_DIR, Transcription.transcript_key(audio_path) + ".jsonl")
+
+
+def test_fallback_after_crash_is_not_cached_as_api(audio, monkeypatch):
+    audio_path, cache = audio
+    api = fake_engine("api", [(0, 10), (10, 20), (20, 30)], fail_after=1)
+    local = fake_engine("local", [(0, 10), (10, 20), (20, 30)])
+    monkeypatch.setattr(Transcription, "iter_api_transcription", api)
+    monkeypatch.setattr(Transcription, "iter_local_transcription", local)
+
+    # Primeira execução: a API falha no segundo trecho e a queda vem depois do primeiro segmento local
+    run = Transcription.iter_transcription(audio_path)
+    assert [next(run)[0], next(run)[0]] == ["api 0", "local 10"]
+    run.close()
+
+    # Retomada: continua localmente, sem tentar a API, e não guarda sob a chave da API
+    api.calls.clear()
+    segments = list(Transcription.iter_transcription(audio_path))
+    assert [s[0] for s in segments] == ["api 0", "local 10", "local 20"]
+    assert api.calls == []
+    assert cache.get_json(Transcription.transcript_key(audio_path)) is None
+    assert cache.get_json(Transcription.transcript_key(audio_path, "local")) is None
+    assert not os.path.exists(log_path(audio_path))
+
+
+def test_full_local_fallback_is_cached_under_local_key(audio, monkeypatch):
+    audio_path, cache = audio
+    monkeypatch.setattr(Transcription, "api_key", None)
+    monkeypatch.setattr(Transcription, "iter_local_transcription", fake_engine("local", [(0, 10), (10, 20)]))
+
+    segments = list(Transcription.iter_transcription(audio_path))
+    assert cache.get_json(Transcription.transcript_key(audio_path)) is None
+    assert cache.get_json(Transcription.transcript_key(audio_path, "local")) == segments
+
+
+def test_log_removed_without_cache(audio, monkeypatch):
+    audio_path, _ = audio
+    monkeypatch.setattr(Transcription, "get_cache", lambda: None)
+    monkeypatch.setattr(Transcription, "iter_api_transcription", fake_engine("api", [(0, 10), (10, 20)]))
+
+    assert len(list(Transcription.iter_transcription(audio_path))) == 2
+    assert not os.path.exists(log_path(audio_path))
+    # Uma nova execução transcreve de novo em vez de "retomar" o log antigo
+    assert len(list(Transcription.iter_transcription(audio_path))) == 2
+
+
+def test_log_marker_survives_rewrite(tmp_path):
+    path = str(tmp_path / "log.jsonl")
+    Transcription.write_transcript_log(path, [["a", 0, 1]], fallback_start=1.0)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(["b", 1, 2]) + "\n" + '["c", 2')
+    assert Transcription.read_transcript_log(path) == ([["a", 0, 1], ["b", 1, 2]], 1.0)
+
+
+def test_info_reports_the_engine_that_transcribed(audio, monkeypatch):
+    audio_path, _ = audio
+    monkeypatch.setattr(Transcription, "iter_api_transcription",
+                        fake_engine("api", [(0, 10), (10, 20)], fail_after=1))
+    monkeypatch.setattr(Transcription, "iter_local_transcription", fake_engine("local", [(0, 10), (10, 20)]))
+
+    info = {}
+    assert len(Transcription.transcribeAudio(audio_path, info)) == 2
+    assert info["method"] == "mixed"
+    assert Transcription.transcript_key(audio_path, info["method"]) != Transcription.transcript_key(audio_path)
+
+
+class MockWhisperClient:
+    """transcribe_sync falso: cada trecho vira dois segmentos com tempos relativos ao trecho."""
+
+    def __init__(self, delays=None):
+        self.uploads = []
+        self.delays = delays or {}
+        self.lock = threading.Lock()
+
+    def transcribe_sync(self, model, file, response_format="verbose_json"):
+        name, data = file
+        start, end = (float(v) for v in data.split(b"|")[0].decode().split(":"))
+        with self.lock:
+            self.uploads.append((name, len(data)))
+        time.sleep(self.delays.get(round(start), 0))
+        length = end - start
+        return SimpleNamespace(text="...", segments=[
+            {"text": f"a {start:g}", "start": 0.0, "end": length / 2},
+            SimpleNamespace(text=f"b {start:g}", start=length / 2, end=length),
+        ])
+
+
+def speech_with_pauses(seconds, pauses, sample_rate=16000):
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    samples = (8000 * np.sin(2 * np.pi * 220 * t)).astype(np.int16)
+    for first, last in pauses:
+        samples[(t >= first) & (t < last)] = 0
+    return AudioBuffer(samples, sample_rate)
+
+
+@pytest.fixture
+def whisper_api(monkeypatch):
+    from Components import Speaker
+    monkeypatch.setattr(Speaker, "WEBRTCVAD_AVAILABLE", False)
+    # Bytes "enviados": o intervalo do trecho + 100 bytes por segundo de áudio
+    monkeypatch.setattr(Transcription, "encode_for_upload",
+                        lambda audio, start, end: f"{start}:{end}|".encode() + b"x" * int((end - start) * 100))
+    monkeypatch.setattr(Transcription, "API_CHUNK_SECONDS", 10)
+    client = MockWhisperClient(delays={0: 0.2})
+    monkeypatch.setattr(Transcription, "get_openai_client", lambda: client)
+    return client
+
+
+def test_api_chunks_split_on_pauses_and_merge_with_offsets(whisper_api):
+    audio = speech_with_pauses(40, [(9.5, 10.5), (19, 21), (30, 31)])
+    segments = list(Transcription.iter_api_transcription(audio))
+
+    starts = [segment[1] for segment in segments[::2]]
+    assert len(whisper_api.uploads) == len(starts) >= 4
+    # Cortes no meio das pausas, segmentos em ordem apesar do primeiro trecho ser o mais lento
+    assert [round(s) for s in starts[1:4]] == [10, 20, 30]
+    assert [segment[0] for segment in segments[:2]] == ["a 0", "b 0"]
+    assert all(a[2] <= b[1] + 1e-9 for a, b in zip(segments, segments[1:]))
+    assert segments[-1][2] == pytest.approx(40)
+
+
+def test_api_chunk_over_upload_limit_is_halved(whisper_api, monkeypatch):
+    monkeypatch.setattr(Transcription, "API_MAX_UPLOAD_BYTES", 700)
+    monkeypatch.setattr(Transcription, "api_chunk_seconds", lambda: 10)
+    audio = speech_with_pauses(10, [])
+    segments = list(Transcription.iter_api_transcription(audio))
+
+    assert [name for name, _ in whisper_api.uploads if _ <= 700] == ["chunk_0.ogg", "chunk_5.ogg"]
+    assert [(s[0], s[1], s[2]) for s in segments] == [("a 0", 0, 2.5), ("b 0", 2.5, 5),
+                                                    ("a 5", 5, 7.5), ("b 5", 7.5, 10)]
+
+
+def test_api_transcription_resumes_at_offset(whisper_api):
+    audio = speech_with_pauses(40, [(9.5, 10.5), (19, 21), (30, 31)])
+    segments = list(Transcription.iter_api_transcription(audio, start=25.0))
+    assert segments[0][1] == pytest.approx(25.0)
+    assert segments[-1][2] == pytest.approx(40)
+
+
+def test_response_without_segments_spans_the_chunk():
+    response = SimpleNamespace(text=" tudo ", segments=None)
+    assert Transcription.response_segments(response, 30.0, 42.0) == [[" tudo ", 30.0, 42.0]]
@@ -0,0 +1,124 @@
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("pytubefix")
+
+from Components import YoutubeDownloader
+from Components.YoutubeDownloader import download_parallel, download_resumable, select_stream
+
+PAYLOAD = os.urandom(300 * 1024 + 7)
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """Servidor de teste com HTTP Range; pode ignorar o Range ou cortar a primeira resposta."""
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(self.headers.get("Range"))
+        first, last = 0, len(PAYLOAD) - 1
+        match = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range") or "")
+        if match and server.ranges:
+            first = int(match.group(1))
+            last = int(match.group(2)) if match.group(2) else last
+            if first >= len(PAYLOAD):
+                self.send_response(416)
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {first}-{last}/{len(PAYLOAD)}")
+        else:
+            self.send_response(200)
+        body = PAYLOAD[first:last + 1]
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if server.cut_after:
+            # Queda no meio do download: metade do corpo e a conexão é fechada
+            cut, server.cut_after = server.cut_after, None
+            self.wfile.write(body[:cut])
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+    httpd.requests, httpd.ranges, httpd.cut_after = [], True, None
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    httpd.url = f"http://127.0.0.1:{httpd.server_address[1]}/video.mp4"
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_resumable_download_continues_partial_file(server, tmp_path):
+    output = str(tmp_path / "video.mp4")
+    with open(output + ".part", "wb") as f:
+        f.write(PAYLOAD[:1000])
+
+    download_resumable(server.url, output, expected_size=len(PAYLOAD), chunk_size=4096)
+
+    assert open(output, "rb").read() == PAYLOAD
+    assert server.requests == [f"bytes=1000-{len(PAYLOAD) - 1}"]
+    assert not os.path.exists(output + ".part")
+
+
+def test_resumable_download_after_dropped_connection(server, tmp_path):
+    output = str(tmp_path / "video.mp4")
+    server.cut_after = 50000
+    with pytest.raises(Exception):
+        download_resumable(server.url, output, expected_size=len(PAYLOAD), chunk_size=4096, timeout=5)
+    assert 0 < os.path.getsize(output + ".part") < len(PAYLOAD)
+
+    download_resumable(server.url, output, expected_size=len(PAYLOAD), chunk_size=4096, timeout=5)
+    assert open(output, "rb").read() == PAYLOAD
+    assert server.requests[-1].startswith("bytes=") and server.requests[-1] != "bytes=0-"
+
+
+def test_resumable_download_restarts_when_range_is_ignored(server, tmp_path):
+    server.ranges = False
+    output = str(tmp_path / "video.mp4")
+    with open(output + ".part", "wb") as f:
+        f.write(b"x" * 1000)
+
+    download_resumable(server.url, output, expected_size=len(PAYLOAD))
+    assert open(output, "rb").read() == PAYLOAD
+
+
+def test_parallel_download_joins_ranges(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(YoutubeDownloader, "DOWNLOAD_CHUNK_SIZE", 64 * 1024)
+    output = str(tmp_path / "video.mp4")
+
+    download_parallel(server.url, output, len(PAYLOAD), connections=4, chunk_size=8192)
+
+    assert open(output, "rb").read() == PAYLOAD
+    assert len(server.requests) == 4 and all(r.startswith("bytes=") for r in server.requests)
+    assert not [name for name in os.listdir(tmp_path) if ".part" in name]
+
+
+def test_parallel_download_requires_range_support(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(YoutubeDownloader, "DOWNLOAD_CHUNK_SIZE", 64 * 1024)
+    server.ranges = False
+    with pytest.raises(IOError):
+        download_parallel(server.url, str(tmp_path / "video.mp4"), len(PAYLOAD), connections=4)
+
+
+def stream(resolution, size, progressive=False):
+    return SimpleNamespace(resolution=resolution, filesize=size, is_progressive=progressive)
+
+
+def test_select_stream_smallest_reaching_target_height():
+    streams = [stream("2160p", 900), stream("1080p", 400), stream("1080p", 300, True), stream("720p", 100)]
+    audio = stream(None, 50)
+    assert select_stream(streams, audio, target_height=1080) is streams[2]
+    assert select_stream(streams, audio, target_height=4320) is streams[0]
+    assert select_stream(streams, audio, policy="largest") is streams[0]